@@ -0,0 +1,363 @@
+"""
+API baca versi 1 untuk dashboard dan aplikasi mobile (/api/v1/...).
+
+Semua endpoint hanya membaca data, memakai aturan akses yang sama dengan
+get_user_properties, dan mendukung ETag (http_cache). Endpoint yang
+membutuhkan beberapa agregat (dashboard, ringkasan keuangan) menjalankan
+query-query tersebut bersamaan (database.run_concurrently), sehingga waktu
+respons mengikuti query paling lambat.
+
+    GET /api/v1/properties
+    GET /api/v1/properties/<id>/rooms
+    GET /api/v1/occupancy?month=YYYY-MM[&property_id=]
+    GET /api/v1/payment_status?month=YYYY-MM[&property_id=]
+    GET /api/v1/finance/summary?year=YYYY[&property_id=]
+    GET /api/v1/dashboard?month=YYYY-MM[&property_id=]
+    GET /api/v1/forecast?months=N[&lookback=N][&property_id=]
+"""
+from datetime import datetime
+
+from flask import request, jsonify
+from flask_login import login_required
+from sqlalchemy import select, func, case, extract
+
+from app import app, db
+from models import Property, Room, OccupancyRecord, FinancialRecord, Receivable, month_to_ordinal
+from auth_helpers import get_user_properties
+from calendar_service import month_range
+from due_dates import late_payments_for_month, overdue_ids
+from database import read_replica, read_engine, run_concurrently
+from http_cache import etag_cached
+from forecasting import forecast_revenue, DEFAULT_MONTHS, DEFAULT_LOOKBACK
+
+API_VERSION = 1
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+@app.errorhandler(ApiError)
+def handle_api_error(error):
+    return jsonify({'success': False, 'message': error.message}), error.status
+
+
+def _property_ids():
+    """
+    Properti yang diminta (?property_id=) atau semua properti yang dapat diakses
+    """
+    accessible = [prop.id for prop in get_user_properties()]
+    property_id = request.args.get('property_id', type=int)
+    if property_id is None:
+        return accessible
+    if property_id not in accessible:
+        raise ApiError('Anda tidak memiliki akses ke properti ini', 403)
+    return [property_id]
+
+
+def _scoped_property_ids(**view_args):
+    # Dipakai etag_cached: ETag hanya bergantung pada properti yang diminta
+    if 'property_id' in view_args:
+        return [view_args['property_id']]
+    return _property_ids()
+
+
+def _month_arg():
+    month = request.args.get('month', datetime.now().strftime('%Y-%m'))
+    try:
+        return month, month_to_ordinal(month)
+    except ValueError:
+        raise ApiError('Format bulan tidak valid. Gunakan format YYYY-MM.')
+
+
+def _payment_counts(rows, late_records):
+    """
+    {property_id: {'paid': n, 'unpaid': n, 'late': n, 'overdue': n}} dari baris
+    (id, property_id, status); belum bayar yang lewat jatuh tempo dihitung
+    terlambat, dan yang terlambat lebih dari OVERDUE_AFTER_DAYS juga dihitung
+    menunggak (overdue adalah bagian dari late)
+    """
+    overdue = overdue_ids(late_records)
+    counts = {}
+    for record_id, property_id, payment_status in rows:
+        if payment_status != 'paid' and record_id in late_records:
+            payment_status = 'late'
+        property_counts = counts.setdefault(property_id, {'paid': 0, 'unpaid': 0, 'late': 0, 'overdue': 0})
+        if payment_status in property_counts:
+            property_counts[payment_status] += 1
+        if payment_status != 'paid' and record_id in overdue:
+            property_counts['overdue'] += 1
+    return counts
+
+
+def _room_counts_statement(property_ids):
+    return select(
+        Room.property_id,
+        func.count(Room.id),
+        func.sum(case((Room.status == 'occupied', 1), else_=0))
+    ).where(Room.property_id.in_(property_ids)).group_by(Room.property_id)
+
+
+def _month_payments_statement(property_ids, month_ordinal):
+    return select(
+        OccupancyRecord.id, Room.property_id, OccupancyRecord.payment_status
+    ).join(Room, OccupancyRecord.room_id == Room.id).where(
+        Room.property_id.in_(property_ids),
+        OccupancyRecord.month_ordinal == month_ordinal,
+        OccupancyRecord.is_occupied == True
+    )
+
+
+@app.route('/api/v1/properties')
+@login_required
+@read_replica
+@etag_cached(_scoped_property_ids)
+def api_v1_properties():
+    property_ids = _property_ids()
+    results = run_concurrently(read_engine(db), {
+        'properties': select(Property.id, Property.name, Property.address, Property.total_rooms)
+        .where(Property.id.in_(property_ids)).order_by(Property.name),
+        'rooms': _room_counts_statement(property_ids),
+    })
+    rooms = {property_id: (total, int(occupied or 0)) for property_id, total, occupied in results['rooms']}
+    return jsonify({
+        'api_version': API_VERSION,
+        'properties': [{
+            'id': property_id,
+            'name': name,
+            'address': address,
+            'total_rooms': total_rooms,
+            'room_count': rooms.get(property_id, (0, 0))[0],
+            'occupied_rooms': rooms.get(property_id, (0, 0))[1]
+        } for property_id, name, address, total_rooms in results['properties']]
+    })
+
+
+@app.route('/api/v1/properties/<int:property_id>/rooms')
+@login_required
+@read_replica
+@etag_cached(_scoped_property_ids)
+def api_v1_rooms(property_id):
+    if property_id not in [prop.id for prop in get_user_properties()]:
+        raise ApiError('Anda tidak memiliki akses ke properti ini', 403)
+    with read_engine(db).connect() as connection:
+        rows = connection.execute(
+            select(Room.id, Room.number, Room.room_type, Room.monthly_rate, Room.status)
+            .where(Room.property_id == property_id).order_by(Room.number)
+        ).all()
+    return jsonify({
+        'api_version': API_VERSION,
+        'property_id': property_id,
+        'rooms': [{
+            'id': room_id,
+            'number': number,
+            'room_type': room_type,
+            'monthly_rate': monthly_rate or 0,
+            'status': status
+        } for room_id, number, room_type, monthly_rate, status in rows]
+    })
+
+
+@app.route('/api/v1/occupancy')
+@login_required
+@read_replica
+@etag_cached(_scoped_property_ids)
+def api_v1_occupancy():
+    property_ids = _property_ids()
+    month, month_ordinal = _month_arg()
+    results = run_concurrently(read_engine(db), {
+        'records': select(
+            OccupancyRecord.id, Room.property_id, Room.id, Room.number, Room.room_type,
+            OccupancyRecord.tenant_name, OccupancyRecord.is_occupied,
+            OccupancyRecord.payment_status, OccupancyRecord.payment_months
+        ).join(Room, OccupancyRecord.room_id == Room.id).where(
+            Room.property_id.in_(property_ids),
+            OccupancyRecord.month_ordinal == month_ordinal
+        ).order_by(Room.property_id, Room.number),
+        'rooms': _room_counts_statement(property_ids),
+    })
+
+    summary = {property_id: {'property_id': property_id, 'total_rooms': total, 'occupied': 0}
+               for property_id, total, _ in results['rooms']}
+    records = []
+    for record_id, property_id, room_id, number, room_type, tenant_name, is_occupied, payment_status, payment_months in results['records']:
+        if is_occupied and property_id in summary:
+            summary[property_id]['occupied'] += 1
+        records.append({
+            'id': record_id,
+            'property_id': property_id,
+            'room_id': room_id,
+            'room_number': number,
+            'room_type': room_type,
+            'tenant_name': tenant_name,
+            'is_occupied': bool(is_occupied),
+            'payment_status': payment_status,
+            'payment_months': payment_months
+        })
+    for item in summary.values():
+        item['vacant'] = item['total_rooms'] - item['occupied']
+        item['occupancy_rate'] = round(item['occupied'] / item['total_rooms'] * 100, 1) if item['total_rooms'] else 0
+
+    return jsonify({
+        'api_version': API_VERSION,
+        'month': month,
+        'summary': list(summary.values()),
+        'records': records
+    })
+
+
+@app.route('/api/v1/payment_status')
+@login_required
+@read_replica
+@etag_cached(_scoped_property_ids)
+def api_v1_payment_status():
+    property_ids = _property_ids()
+    month, month_ordinal = _month_arg()
+    results = run_concurrently(
+        read_engine(db),
+        {'payments': _month_payments_statement(property_ids, month_ordinal)},
+        main_thread_work=lambda: late_payments_for_month(month_ordinal, property_ids)
+    )
+    counts = _payment_counts(results['payments'], results['_main'])
+    return jsonify({
+        'api_version': API_VERSION,
+        'month': month,
+        'properties': [dict(property_id=property_id, **counts.get(property_id, {'paid': 0, 'unpaid': 0, 'late': 0, 'overdue': 0}))
+                       for property_id in property_ids]
+    })
+
+
+@app.route('/api/v1/finance/summary')
+@login_required
+@read_replica
+@etag_cached(_scoped_property_ids)
+def api_v1_finance_summary():
+    property_ids = _property_ids()
+    year = request.args.get('year', datetime.now().year, type=int)
+    start, end = month_range(year, 1)[0], month_range(year, 12)[1]
+    in_year = (
+        FinancialRecord.property_id.in_(property_ids),
+        FinancialRecord.transaction_date >= start,
+        FinancialRecord.transaction_date < end
+    )
+    transaction_month = extract('month', FinancialRecord.transaction_date)
+
+    results = run_concurrently(read_engine(db), {
+        'by_month': select(transaction_month, FinancialRecord.transaction_type, func.sum(FinancialRecord.amount))
+        .where(*in_year).group_by(transaction_month, FinancialRecord.transaction_type),
+        'by_category': select(FinancialRecord.transaction_type, FinancialRecord.category, func.sum(FinancialRecord.amount))
+        .where(*in_year).group_by(FinancialRecord.transaction_type, FinancialRecord.category),
+        'by_property': select(FinancialRecord.property_id, FinancialRecord.transaction_type, func.sum(FinancialRecord.amount))
+        .where(*in_year).group_by(FinancialRecord.property_id, FinancialRecord.transaction_type),
+    })
+
+    months = [{'month': f'{year:04d}-{i:02d}', 'income': 0, 'expense': 0} for i in range(1, 13)]
+    for month_number, transaction_type, amount in results['by_month']:
+        months[int(month_number) - 1][transaction_type] = int(amount or 0)
+
+    categories = {'income': {}, 'expense': {}}
+    for transaction_type, category, amount in results['by_category']:
+        categories.setdefault(transaction_type, {})[category] = int(amount or 0)
+
+    properties = {property_id: {'property_id': property_id, 'income': 0, 'expense': 0} for property_id in property_ids}
+    for property_id, transaction_type, amount in results['by_property']:
+        properties[property_id][transaction_type] = int(amount or 0)
+    for item in properties.values():
+        item['net_profit'] = item['income'] - item['expense']
+
+    income = sum(item['income'] for item in months)
+    expense = sum(item['expense'] for item in months)
+    return jsonify({
+        'api_version': API_VERSION,
+        'year': year,
+        'income': income,
+        'expense': expense,
+        'net_profit': income - expense,
+        'months': months,
+        'categories': categories,
+        'properties': list(properties.values())
+    })
+
+
+@app.route('/api/v1/dashboard')
+@login_required
+@read_replica
+@etag_cached(_scoped_property_ids)
+def api_v1_dashboard():
+    """
+    Ringkasan satu bulan per properti: kamar, hunian, status pembayaran,
+    pendapatan/pengeluaran dan sisa tagihan. Lima agregat dijalankan bersamaan.
+    """
+    property_ids = _property_ids()
+    month, month_ordinal = _month_arg()
+    start, end = month_range(month_ordinal // 12, month_ordinal % 12 + 1)
+
+    results = run_concurrently(read_engine(db), {
+        'rooms': _room_counts_statement(property_ids),
+        'payments': _month_payments_statement(property_ids, month_ordinal),
+        'finance': select(FinancialRecord.property_id, FinancialRecord.transaction_type, func.sum(FinancialRecord.amount))
+        .where(
+            FinancialRecord.property_id.in_(property_ids),
+            FinancialRecord.transaction_date >= start,
+            FinancialRecord.transaction_date < end
+        ).group_by(FinancialRecord.property_id, FinancialRecord.transaction_type),
+        'outstanding': select(Receivable.property_id, func.sum(Receivable.outstanding))
+        .where(Receivable.property_id.in_(property_ids), Receivable.outstanding > 0)
+        .group_by(Receivable.property_id),
+    }, main_thread_work=lambda: late_payments_for_month(month_ordinal, property_ids))
+
+    properties = {property_id: {
+        'property_id': property_id,
+        'total_rooms': 0,
+        'occupied_rooms': 0,
+        'occupancy_rate': 0,
+        'payment_status': {'paid': 0, 'unpaid': 0, 'late': 0, 'overdue': 0},
+        'income': 0,
+        'expense': 0,
+        'outstanding': 0
+    } for property_id in property_ids}
+
+    for property_id, total, occupied in results['rooms']:
+        item = properties[property_id]
+        item['total_rooms'] = total
+        item['occupied_rooms'] = int(occupied or 0)
+        item['occupancy_rate'] = round(item['occupied_rooms'] / total * 100, 1) if total else 0
+    for property_id, counts in _payment_counts(results['payments'], results['_main']).items():
+        properties[property_id]['payment_status'] = counts
+    for property_id, transaction_type, amount in results['finance']:
+        properties[property_id][transaction_type] = int(amount or 0)
+    for property_id, outstanding in results['outstanding']:
+        properties[property_id]['outstanding'] = int(outstanding or 0)
+
+    totals = {key: sum(item[key] for item in properties.values())
+              for key in ('total_rooms', 'occupied_rooms', 'income', 'expense', 'outstanding')}
+    totals['payment_status'] = {status: sum(item['payment_status'][status] for item in properties.values())
+                                for status in ('paid', 'unpaid', 'late', 'overdue')}
+    totals['net_profit'] = totals['income'] - totals['expense']
+    totals['occupancy_rate'] = round(totals['occupied_rooms'] / totals['total_rooms'] * 100, 1) if totals['total_rooms'] else 0
+
+    return jsonify({
+        'api_version': API_VERSION,
+        'month': month,
+        'totals': totals,
+        'properties': list(properties.values())
+    })
+
+
+@app.route('/api/v1/forecast')
+@login_required
+@read_replica
+@etag_cached(_scoped_property_ids)
+def api_v1_forecast():
+    """
+    Proyeksi pendapatan sewa per properti dan per bulan (lihat forecasting.py)
+    """
+    forecast = forecast_revenue(
+        _property_ids(),
+        months=request.args.get('months', DEFAULT_MONTHS, type=int),
+        lookback=request.args.get('lookback', DEFAULT_LOOKBACK, type=int)
+    )
+    return jsonify(dict(forecast, api_version=API_VERSION))
@@ -2,9 +2,11 @@ import os
 import logging
 from datetime import datetime
 from flask import Flask, g
+from jinja2 import FileSystemBytecodeCache
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
+from database import engine_options, RoutingSession, REPLICA_BIND
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -27,11 +29,45 @@ if not database_url:
 
 app.config["SQLALCHEMY_DATABASE_URI"] = database_url
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    'pool_pre_ping': True,
-    "pool_recycle": 300,
-}
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(database_url)
+
+# Database replika opsional untuk route baca berat (lihat database.read_replica)
+read_database_url = os.environ.get("READ_DATABASE_URL")
+if read_database_url:
+    app.config["SQLALCHEMY_BINDS"] = {
+        REPLICA_BIND: {"url": read_database_url, **engine_options(read_database_url)}
+    }
+
+# Konfigurasi profiling request (khusus admin)
+app.config["PROFILE_DIR"] = os.environ.get("PROFILE_DIR", os.path.join(app.instance_path, "profiles"))
+app.config["PROFILE_MAX_FILES"] = int(os.environ.get("PROFILE_MAX_FILES", 20))
+
+# Konfigurasi arsip laporan PDF yang dibuat terjadwal
+app.config["REPORT_ARCHIVE_DIR"] = os.environ.get("REPORT_ARCHIVE_DIR", os.path.join(app.instance_path, "reports"))
+
+# Cache data bersama (lihat cache_backend.py): memory, sqlite (dibagi antar worker) atau redis
+app.config["CACHE_BACKEND"] = os.environ.get("CACHE_BACKEND", "memory").lower()
+app.config["CACHE_URL"] = os.environ.get("CACHE_URL", os.path.join(app.instance_path, "cache.sqlite3"))
+app.config["CACHE_DEFAULT_TTL"] = int(os.environ.get("CACHE_DEFAULT_TTL", 3600))
+app.config["CACHE_MAX_ENTRIES"] = int(os.environ.get("CACHE_MAX_ENTRIES", 1000))
+# Kunci HMAC untuk nilai cache sqlite/redis; samakan di semua server yang memakai cache yang sama
+app.config["CACHE_SECRET"] = os.environ.get("CACHE_SECRET", app.secret_key)
+
+# Cache template: bytecode Jinja di disk (mempercepat start worker) dan cache potongan template
+app.config["JINJA_CACHE_DIR"] = os.environ.get("JINJA_CACHE_DIR", os.path.join(app.instance_path, "jinja_cache"))
+app.config["FRAGMENT_CACHE"] = os.environ.get("FRAGMENT_CACHE", "true").lower() == "true"
+try:
+    os.makedirs(app.config["JINJA_CACHE_DIR"], exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config["JINJA_CACHE_DIR"])
+except OSError as e:
+    logging.warning(f"Bytecode cache Jinja tidak aktif: {e}")
+
+# Kompresi respons dinamis (brotli jika terpasang, selain itu gzip)
+app.config["COMPRESS_ENABLED"] = os.environ.get("COMPRESS_ENABLED", "true").lower() == "true"
+app.config["COMPRESS_MIN_SIZE"] = int(os.environ.get("COMPRESS_MIN_SIZE", 1024))
+app.config["COMPRESS_LEVEL"] = int(os.environ.get("COMPRESS_LEVEL", 6))
+app.config["COMPRESS_BROTLI_QUALITY"] = int(os.environ.get("COMPRESS_BROTLI_QUALITY", 5))
 
 # Initialize SQLAlchemy with the app
-db = SQLAlchemy(model_class=Base)
+db = SQLAlchemy(model_class=Base, session_options={'class_': RoutingSession})
 db.init_app(app)
@@ -0,0 +1,170 @@
+"""
+Uji kiriman pembayaran bersamaan (payments.py) pada database SQLite sementara.
+
+Beberapa proses (seperti worker gunicorn), masing-masing dengan beberapa
+thread, mengirim form yang sama pada saat yang sama:
+
+- input hunian lunas dengan kunci idempotensi yang sama  -> 1 hunian, 1 pemasukan
+- ubah status ke paid, kunci sama                         -> 1 pemasukan
+- ubah status ke paid, kunci berbeda (tanpa klik ganda)   -> tetap 1 pemasukan
+- kamar baru, kunci berbeda                               -> setiap kiriman mendapat
+  nomor kamar sendiri (room_number_sequences, lihat rooms.py)
+
+    python benchmark_payments.py [proses] [thread]
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import tempfile
+import threading
+import subprocess
+
+TENANT = 'Uji Bersamaan'
+
+
+def _client(app):
+    from models import User
+    with app.app_context():
+        admin_id = User.query.filter_by(role='admin').first().id
+    test_client = app.test_client()
+    with test_client.session_transaction() as session:
+        session['_user_id'] = str(admin_id)
+    return test_client
+
+
+def setup():
+    """
+    Membuat skema dan satu hunian belum bayar; mengembalikan id hunian tersebut
+    """
+    from main import app
+    test_client = _client(app)
+    test_client.post('/input_occupancy', data={
+        'property_id': '1', 'room_type': 'Standard', 'room_id': 'new', 'month': '2025-05', 'is_occupied': 'on',
+        'tenant_name': TENANT, 'monthly_rate': '500000', 'payment_status': 'unpaid'
+    })
+    from models import OccupancyRecord
+    with app.app_context():
+        return OccupancyRecord.query.filter_by(tenant_name=TENANT).first().id
+
+
+def run_load(scenario, record_id, threads, start_at):
+    from main import app
+
+    results = {'ok': 0, 'errors': 0}
+    lock = threading.Lock()
+
+    def submit(i):
+        test_client = _client(app)
+        key = scenario if scenario not in ('different-keys', 'new-rooms') else f'{scenario}-{os.getpid()}-{i}'
+        if scenario == 'new-rooms':
+            url, data = '/input_occupancy', {
+                'property_id': '1', 'room_type': 'Standard', 'room_id': 'new', 'month': '2025-07',
+                'monthly_rate': '500000'
+            }
+        elif scenario == 'new-occupancy':
+            url, data = '/input_occupancy', {
+                'property_id': '1', 'room_type': 'Eksekutif', 'room_id': 'new', 'month': '2025-06', 'is_occupied': 'on',
+                'tenant_name': TENANT, 'monthly_rate': '700000', 'payment_status': 'paid', 'payment_months': '2'
+            }
+        else:
+            url, data = f'/update_payment_status/{record_id}', {
+                'status': 'paid', 'payment_date': '2025-05-20', 'payment_months': '3'
+            }
+        data['idempotency_key'] = key
+        time.sleep(max(0, start_at - time.time()))
+        response = test_client.post(url, data=data)
+        with lock:
+            results['ok' if response.status_code == 302 else 'errors'] += 1
+
+    workers = [threading.Thread(target=submit, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results
+
+
+def _count(database, scenario, record_id):
+    connection = sqlite3.connect(database)
+    try:
+        if scenario == 'new-rooms':
+            numbers = [row[0] for row in connection.execute(
+                "SELECT r.number FROM rooms r JOIN occupancy_records o ON o.room_id = r.id WHERE o.month = '2025-07'"
+            )]
+            return {'kamar': len(numbers), 'nomor_ganda': len(numbers) - len(set(numbers))}
+        if scenario == 'new-occupancy':
+            occupancies = connection.execute(
+                "SELECT id FROM occupancy_records WHERE tenant_name = ? AND month = '2025-06'", (TENANT,)
+            ).fetchall()
+            incomes = connection.execute(
+                f"SELECT COUNT(*) FROM financial_records WHERE occupancy_id IN ({','.join('?' * len(occupancies)) or 'NULL'})",
+                [row[0] for row in occupancies]
+            ).fetchone()[0]
+            return {'hunian': len(occupancies), 'pemasukan': incomes}
+        incomes = connection.execute(
+            'SELECT COUNT(*) FROM financial_records WHERE occupancy_id = ?', (record_id,)
+        ).fetchone()[0]
+        return {'pemasukan': incomes}
+    finally:
+        connection.close()
+
+
+def _run_scenario(scenario, processes, threads):
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, 'payments.db')
+        env = dict(os.environ, DATABASE_URL=f'sqlite:///{database}', REPORT_SCHEDULER='false')
+        output = subprocess.run([sys.executable, __file__, '--setup'],
+                                env=env, capture_output=True, text=True, check=True).stdout
+        record_id = json.loads(output.strip().splitlines()[-1])
+
+        # Semua proses mulai mengirim pada detik yang sama
+        start_at = time.time() + 5
+        children = [
+            subprocess.Popen([sys.executable, __file__, '--run', scenario, str(record_id), str(threads), str(start_at)],
+                             env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+            for _ in range(processes)
+        ]
+        totals = {'ok': 0, 'errors': 0}
+        for child in children:
+            output, _ = child.communicate()
+            result = json.loads(output.strip().splitlines()[-1])
+            for key in totals:
+                totals[key] += result[key]
+        totals.update(_count(database, scenario, record_id))
+    return totals
+
+
+SCENARIOS = [
+    ('new-occupancy', 'Input hunian, kunci sama', {'hunian': 1, 'pemasukan': 1}),
+    ('same-key', 'Status paid, kunci sama', {'pemasukan': 1}),
+    ('different-keys', 'Status paid, kunci berbeda', {'pemasukan': 1}),
+    ('new-rooms', 'Kamar baru, kunci berbeda', {'nomor_ganda': 0}),
+]
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--setup':
+        print(json.dumps(setup()))
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == '--run':
+        scenario, record_id, threads, start_at = sys.argv[2], int(sys.argv[3]), int(sys.argv[4]), float(sys.argv[5])
+        print(json.dumps(run_load(scenario, record_id, threads, start_at)))
+        sys.exit(0)
+
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    print(f'{processes} proses x {threads} thread mengirim form yang sama bersamaan')
+    print(f'{"Skenario":<28} {"terkirim":>9} {"gagal":>6}  hasil')
+    failed = False
+    for scenario, label, expected in SCENARIOS:
+        if scenario == 'new-rooms':
+            expected = dict(expected, kamar=processes * threads)
+        result = _run_scenario(scenario, processes, threads)
+        counts = {key: result[key] for key in expected}
+        ok = counts == expected and result['errors'] == 0
+        failed |= not ok
+        print(f'{label:<28} {result["ok"]:>9} {result["errors"]:>6}  {counts} {"OK" if ok else "GAGAL"}')
+    sys.exit(1 if failed else 0)
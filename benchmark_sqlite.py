@@ -0,0 +1,114 @@
+"""
+Benchmark baca/tulis bersamaan pada SQLite, dengan dan tanpa mode produksi
+(SQLITE_WAL). Setiap mode memakai database sementara yang baru dan beberapa
+proses sekaligus (seperti worker gunicorn); di setiap proses:
+
+- thread penulis mengirim POST /input_finance
+- thread pembaca membuka /manage_finance dan /dashboard
+
+    python benchmark_sqlite.py [proses] [penulis] [pembaca] [detik]
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+import subprocess
+
+MODES = [('rollback journal', 'false'), ('WAL + pragma', 'true')]
+
+
+def run_load(writers, readers, duration):
+    from main import app
+    from models import User, Property
+
+    with app.app_context():
+        admin_id = User.query.filter_by(role='admin').first().id
+        property_id = Property.query.first().id
+
+    results = {'writes': 0, 'reads': 0, 'errors': 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client():
+        test_client = app.test_client()
+        with test_client.session_transaction() as session:
+            session['_user_id'] = str(admin_id)
+        return test_client
+
+    def record(name, ok):
+        with lock:
+            results[name if ok else 'errors'] += 1
+
+    def writer():
+        test_client = client()
+        while time.monotonic() < deadline:
+            response = test_client.post('/input_finance', data={
+                'property_id': str(property_id),
+                'transaction_date': '2025-05-10',
+                'amount': 'Rp 25.000',
+                'transaction_type': 'expense',
+                'category': 'Lainnya',
+                'description': 'benchmark'
+            })
+            record('writes', response.status_code == 302)
+
+    def reader():
+        test_client = client()
+        urls = ['/manage_finance', '/dashboard']
+        i = 0
+        while time.monotonic() < deadline:
+            response = test_client.get(urls[i % len(urls)])
+            record('reads', response.status_code == 200)
+            i += 1
+
+    threads = [threading.Thread(target=writer) for _ in range(writers)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def _run_mode(wal, processes, writers, readers, duration):
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ,
+                   DATABASE_URL=f'sqlite:///{os.path.join(directory, "bench.db")}',
+                   SQLITE_WAL=wal,
+                   REPORT_SCHEDULER='false')
+        # Buat skema dan data awal sekali sebelum beban dimulai
+        subprocess.run([sys.executable, __file__, '--run', '0', '0', '0'],
+                       env=env, capture_output=True, check=True)
+        children = [
+            subprocess.Popen([sys.executable, __file__, '--run', str(writers), str(readers), str(duration)],
+                             env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+            for _ in range(processes)
+        ]
+        totals = {'writes': 0, 'reads': 0, 'errors': 0}
+        for child in children:
+            output, _ = child.communicate()
+            result = json.loads(output.strip().splitlines()[-1])
+            for key in totals:
+                totals[key] += result[key]
+    return totals
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--run':
+        # Proses anak: jalankan beban dan cetak hasil dalam JSON
+        writers, readers, duration = map(int, sys.argv[2:5])
+        print(json.dumps(run_load(writers, readers, duration)))
+        sys.exit(0)
+
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    writers = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    readers = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+    duration = int(sys.argv[4]) if len(sys.argv) > 4 else 10
+
+    print(f'{processes} proses x ({writers} penulis + {readers} pembaca), {duration} detik')
+    print(f'{"Mode":<20} {"tulis/detik":>12} {"baca/detik":>11} {"gagal":>6}')
+    for label, wal in MODES:
+        result = _run_mode(wal, processes, writers, readers, duration)
+        print(f'{label:<20} {result["writes"] / duration:>12.1f} {result["reads"] / duration:>11.1f} {result["errors"]:>6}')
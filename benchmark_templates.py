@@ -0,0 +1,101 @@
+"""
+Benchmark waktu render halaman berat dengan dan tanpa cache template.
+
+Menjalankan request ke dashboard, status pembayaran dan kelola hunian sebagai
+admin terhadap database yang dikonfigurasi (DATABASE_URL), lalu membandingkan:
+- cache potongan template mati vs hidup
+- format rupiah tanpa cache vs dengan cache
+- kompilasi template tanpa vs dengan bytecode cache (simulasi start worker baru)
+
+    python benchmark_templates.py [jumlah_request]
+"""
+import sys
+import time
+import statistics
+from datetime import datetime
+
+from jinja2 import FileSystemBytecodeCache
+
+from main import app
+from models import User
+from cache_backend import cache
+import routes
+
+PAGES = [
+    '/dashboard',
+    f'/payment_status?year={datetime.now().year}&month={datetime.now().month:02d}',
+    '/manage_occupancy',
+]
+
+TEMPLATES = ['dashboard.html', 'payment_status.html', 'manage_occupancy.html',
+             'pdf/occupancy_report.html', 'pdf/finance_report.html']
+
+
+def _time_requests(client, url, repeat):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url)
+        durations.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, f'{url}: {response.status_code}'
+    return statistics.median(durations)
+
+
+def benchmark_pages(repeat):
+    with app.app_context():
+        admin = User.query.filter_by(role='admin').first()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(admin.id)
+
+    print(f'{"Halaman":<45} {"tanpa cache":>12} {"dengan cache":>13}')
+    for url in PAGES:
+        app.config['FRAGMENT_CACHE'] = False
+        without_cache = _time_requests(client, url, repeat)
+        app.config['FRAGMENT_CACHE'] = True
+        cache.clear()
+        client.get(url)  # isi cache
+        with_cache = _time_requests(client, url, repeat)
+        print(f'{url:<45} {without_cache:>10.1f}ms {with_cache:>11.1f}ms')
+
+
+def benchmark_rupiah(repeat):
+    values = [500000, 750000, 1000000, 1500000, 2250000] * 200
+
+    def uncached(value):
+        return f"Rp {value:,.0f}".replace(",", ".")
+
+    for label, formatter in (('format rupiah tanpa cache', uncached), ('format rupiah dengan cache', routes.format_rupiah)):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for value in values:
+                formatter(value)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f'{label:<45} {elapsed / repeat:>10.2f}ms per 1000 nilai')
+
+
+def benchmark_compile():
+    env = app.jinja_env
+    original_cache = env.bytecode_cache
+
+    def compile_all():
+        env.cache.clear()
+        start = time.perf_counter()
+        for name in TEMPLATES:
+            env.get_template(name)
+        return (time.perf_counter() - start) * 1000
+
+    env.bytecode_cache = None
+    without_bytecode = compile_all()
+    env.bytecode_cache = original_cache or FileSystemBytecodeCache(app.config['JINJA_CACHE_DIR'])
+    compile_all()  # tulis bytecode
+    with_bytecode = compile_all()
+    env.bytecode_cache = original_cache
+    print(f'{"kompilasi template (worker baru)":<45} {without_bytecode:>10.1f}ms {with_bytecode:>11.1f}ms')
+
+
+if __name__ == '__main__':
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    benchmark_pages(repeat)
+    benchmark_rupiah(repeat)
+    benchmark_compile()
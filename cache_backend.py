@@ -0,0 +1,439 @@
+"""
+Cache bersama untuk data yang mahal dihitung (potongan template, grafik
+statistik, total kalender, data laporan akhir bulan).
+
+Backend dipilih dengan CACHE_BACKEND:
+- memory : LRU di memori proses (bawaan); setiap worker punya cache sendiri
+- sqlite : file SQLite di CACHE_URL, dipakai bersama semua worker di satu server
+           dan tetap ada setelah restart
+- redis  : server berprotokol Redis di CACHE_URL (redis://[:password@]host:6379/0)
+
+Kunci sebaiknya memuat versi data (data_version.version_token) sehingga entri
+lama tidak perlu dihapus: begitu data berubah, kunci baru dipakai dan entri lama
+kedaluwarsa sendiri (TTL/LRU). Ini juga berlaku untuk semua worker sekaligus.
+
+get_or_set() mencegah stampede: jika banyak request meminta kunci yang sama
+saat kosong, hanya satu yang menghitung, sisanya menunggu hasilnya. Gangguan
+pada backend tidak menggagalkan request; nilai dihitung langsung dan kejadian
+dicatat di statistik 'errors'.
+
+Nilai di backend sqlite dan redis disimpan sebagai pickle yang ditandatangani
+HMAC-SHA256 dengan CACHE_SECRET. Data yang tandatangannya tidak cocok (misalnya
+ditulis pihak lain yang bisa mengakses server Redis) tidak pernah di-unpickle
+dan diperlakukan sebagai kunci kosong.
+"""
+import os
+import hmac
+import time
+import pickle
+import hashlib
+import socket
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+from app import app
+
+_MISSING = object()
+
+# Batas waktu (detik) satu perhitungan ulang; setelah itu request lain boleh menghitung sendiri
+LOCK_TIMEOUT = 30
+LOCK_POLL_INTERVAL = 0.05
+LOCK_STRIPES = 64
+
+# Panjang tanda tangan HMAC-SHA256 di depan setiap nilai sqlite/redis
+SIGNATURE_SIZE = hashlib.sha256().digest_size
+
+
+class CacheError(Exception):
+    pass
+
+
+class BaseCache:
+    """
+    Antarmuka cache. Subclass mengimplementasikan _get/_set/_add/_delete/_clear;
+    _get mengembalikan _MISSING jika kunci tidak ada atau sudah kedaluwarsa.
+    Backend yang menyimpan di luar proses memakai _dumps/_loads (pickle bertanda tangan).
+    """
+    name = 'base'
+
+    def __init__(self, default_ttl=3600, secret=None):
+        self.default_ttl = default_ttl
+        self._secret = (secret or '').encode('utf-8')
+        self._counters = {'hits': 0, 'misses': 0, 'computes': 0, 'waits': 0, 'errors': 0}
+        self._counter_lock = threading.Lock()
+        # Kunci per kunci-cache dibagi ke sejumlah tetap lock agar memori tidak bertambah
+        self._stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, value, ttl):
+        raise NotImplementedError
+
+    def _add(self, key, value, ttl):
+        raise NotImplementedError
+
+    def _delete(self, key):
+        raise NotImplementedError
+
+    def _clear(self):
+        raise NotImplementedError
+
+    def _dumps(self, value):
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        return hmac.new(self._secret, payload, hashlib.sha256).digest() + payload
+
+    def _loads(self, data):
+        signature, payload = data[:SIGNATURE_SIZE], data[SIGNATURE_SIZE:]
+        if not hmac.compare_digest(signature, hmac.new(self._secret, payload, hashlib.sha256).digest()):
+            raise CacheError('tanda tangan nilai cache tidak valid')
+        return pickle.loads(payload)
+
+    def _count(self, name):
+        with self._counter_lock:
+            self._counters[name] += 1
+
+    def _safe(self, operation, *args, fallback=None):
+        try:
+            return operation(*args)
+        except Exception as e:
+            self._count('errors')
+            logging.warning(f"Cache {self.name} gagal ({operation.__name__}): {e}")
+            return fallback
+
+    def _ttl(self, ttl):
+        return self.default_ttl if ttl is None else ttl
+
+    def get(self, key, default=None):
+        value = self._safe(self._get, key, fallback=_MISSING)
+        self._count('misses' if value is _MISSING else 'hits')
+        return default if value is _MISSING else value
+
+    def set(self, key, value, ttl=None):
+        """
+        Menyimpan nilai; ttl dalam detik (None = CACHE_DEFAULT_TTL, 0 = tanpa batas)
+        """
+        self._safe(self._set, key, value, self._ttl(ttl))
+
+    def delete(self, key):
+        self._safe(self._delete, key)
+
+    def clear(self):
+        self._safe(self._clear)
+
+    def get_or_set(self, key, compute, ttl=None):
+        """
+        Mengembalikan nilai di cache, atau menghitungnya dengan compute() sekali
+        saja meskipun diminta bersamaan oleh banyak thread/worker
+        """
+        value = self._safe(self._get, key, fallback=_MISSING)
+        if value is not _MISSING:
+            self._count('hits')
+            return value
+        self._count('misses')
+
+        lock_key = f'lock:{key}'
+        # Stripe hanya dipegang selama cek ulang dan pengambilan lock, bukan selama
+        # compute() atau menunggu, agar kunci lain di stripe yang sama tidak ikut tertahan
+        with self._stripes[hash(key) % LOCK_STRIPES]:
+            # Thread lain di proses ini mungkin baru selesai menghitung
+            value = self._safe(self._get, key, fallback=_MISSING)
+            if value is not _MISSING:
+                self._count('waits')
+                return value
+            acquired = self._safe(self._add, lock_key, os.getpid(), LOCK_TIMEOUT, fallback=False)
+
+        if not acquired:
+            value = self._wait_for(key, lock_key)
+            if value is not _MISSING:
+                self._count('waits')
+                return value
+
+        try:
+            value = compute()
+            self._count('computes')
+            self._safe(self._set, key, value, self._ttl(ttl))
+        finally:
+            if acquired:
+                self._safe(self._delete, lock_key)
+        return value
+
+    def _wait_for(self, key, lock_key):
+        # Worker lain sedang menghitung: tunggu hasilnya sampai lock dilepas atau kedaluwarsa
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            value = self._safe(self._get, key, fallback=_MISSING)
+            if value is not _MISSING:
+                return value
+            if self._safe(self._get, lock_key, fallback=_MISSING) is _MISSING:
+                break
+        return _MISSING
+
+    def stats(self):
+        with self._counter_lock:
+            stats = dict(self._counters)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups * 100, 1) if lookups else 0
+        stats['backend'] = self.name
+        return stats
+
+
+class MemoryCache(BaseCache):
+    """
+    LRU di memori proses, aman dipakai beberapa thread
+    """
+    name = 'memory'
+
+    def __init__(self, max_entries=1000, default_ttl=3600):
+        super().__init__(default_ttl)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, value = entry
+            if expires_at and expires_at <= time.time():
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl if ttl else None, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _add(self, key, value, ttl):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not (entry[0] and entry[0] <= time.time()):
+                return False
+            self._entries[key] = (time.time() + ttl if ttl else None, value)
+            return True
+
+    def _delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def _clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCache(BaseCache):
+    """
+    Cache di file SQLite (mode WAL) yang dipakai bersama semua worker di satu server
+    """
+    name = 'sqlite'
+    CULL_EVERY = 100
+
+    def __init__(self, path, max_entries=1000, default_ttl=3600, secret=None):
+        super().__init__(default_ttl, secret)
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _connection(self):
+        # Satu koneksi per thread; dibuat ulang setelah fork (worker gunicorn)
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache_entries '
+                '(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)'
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _get(self, key):
+        row = self._connection().execute(
+            'SELECT value, expires_at FROM cache_entries WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None or (row[1] and row[1] <= time.time()):
+            return _MISSING
+        return self._loads(row[0])
+
+    def _set(self, key, value, ttl):
+        self._connection().execute(
+            'INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)',
+            (key, self._dumps(value), time.time() + ttl if ttl else None)
+        )
+        self._writes += 1
+        if self._writes % self.CULL_EVERY == 0:
+            self._cull()
+
+    def _add(self, key, value, ttl):
+        connection = self._connection()
+        connection.execute('DELETE FROM cache_entries WHERE key = ? AND expires_at <= ?', (key, time.time()))
+        cursor = connection.execute(
+            'INSERT OR IGNORE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)',
+            (key, self._dumps(value), time.time() + ttl if ttl else None)
+        )
+        return cursor.rowcount == 1
+
+    def _delete(self, key):
+        self._connection().execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+
+    def _clear(self):
+        self._connection().execute('DELETE FROM cache_entries')
+
+    def _cull(self):
+        # Hapus entri kedaluwarsa, lalu entri tertua (rowid terkecil) jika melebihi batas
+        connection = self._connection()
+        connection.execute('DELETE FROM cache_entries WHERE expires_at <= ?', (time.time(),))
+        excess = connection.execute('SELECT COUNT(*) FROM cache_entries').fetchone()[0] - self.max_entries
+        if excess > 0:
+            connection.execute(
+                'DELETE FROM cache_entries WHERE rowid IN '
+                '(SELECT rowid FROM cache_entries ORDER BY rowid LIMIT ?)', (excess,)
+            )
+
+
+class _RespConnection:
+    """
+    Klien minimal protokol Redis (RESP2): cukup untuk GET/SET/DEL/SCAN
+    """
+
+    def __init__(self, host, port, db=0, password=None, timeout=2):
+        self._sock = socket.create_connection((host, port), timeout=timeout)
+        self._file = self._sock.makefile('rb')
+        if password:
+            self.command('AUTH', password)
+        if db:
+            self.command('SELECT', db)
+
+    def close(self):
+        try:
+            self._file.close()
+            self._sock.close()
+        except OSError:
+            pass
+
+    def command(self, *args):
+        parts = [f'*{len(args)}\r\n'.encode()]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode('utf-8')
+            parts.append(f'${len(arg)}\r\n'.encode() + arg + b'\r\n')
+        self._sock.sendall(b''.join(parts))
+        return self._read()
+
+    def _read(self):
+        line = self._file.readline()
+        if not line:
+            raise CacheError('koneksi ditutup oleh server')
+        prefix, body = line[:1], line[1:-2]
+        if prefix == b'+':
+            return body.decode()
+        if prefix == b'-':
+            raise CacheError(body.decode())
+        if prefix == b':':
+            return int(body)
+        if prefix == b'$':
+            length = int(body)
+            if length < 0:
+                return None
+            return self._file.read(length + 2)[:-2]
+        if prefix == b'*':
+            length = int(body)
+            if length < 0:
+                return None
+            return [self._read() for _ in range(length)]
+        raise CacheError(f'balasan tidak dikenal: {line!r}')
+
+
+class RedisCache(BaseCache):
+    """
+    Cache di server berprotokol Redis (Redis, Valkey, KeyDB), dipakai bersama
+    semua worker di semua server
+    """
+    name = 'redis'
+
+    def __init__(self, url, default_ttl=3600, prefix='kos:', secret=None):
+        super().__init__(default_ttl, secret)
+        parsed = urlparse(url)
+        self._params = {
+            'host': parsed.hostname or 'localhost',
+            'port': parsed.port or 6379,
+            'db': int(parsed.path.lstrip('/') or 0),
+            'password': parsed.password,
+        }
+        self.prefix = prefix
+        self._local = threading.local()
+
+    def _command(self, *args):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = _RespConnection(**self._params)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        try:
+            return connection.command(*args)
+        except (OSError, CacheError):
+            # Koneksi dibuat ulang pada pemanggilan berikutnya
+            connection.close()
+            self._local.connection = None
+            raise
+
+    def _get(self, key):
+        data = self._command('GET', self.prefix + key)
+        return _MISSING if data is None else self._loads(data)
+
+    def _set(self, key, value, ttl):
+        args = ['SET', self.prefix + key, self._dumps(value)]
+        if ttl:
+            args += ['PX', int(ttl * 1000)]
+        self._command(*args)
+
+    def _add(self, key, value, ttl):
+        args = ['SET', self.prefix + key, self._dumps(value), 'NX']
+        if ttl:
+            args += ['PX', int(ttl * 1000)]
+        return self._command(*args) == 'OK'
+
+    def _delete(self, key):
+        self._command('DEL', self.prefix + key)
+
+    def _clear(self):
+        cursor = b'0'
+        while True:
+            cursor, keys = self._command('SCAN', cursor, 'MATCH', self.prefix + '*', 'COUNT', 500)
+            if keys:
+                self._command('DEL', *keys)
+            if cursor in (b'0', '0'):
+                break
+
+
+def create_cache(config):
+    """
+    Membuat backend cache sesuai konfigurasi aplikasi
+    """
+    backend = config['CACHE_BACKEND']
+    ttl = config['CACHE_DEFAULT_TTL']
+    if backend == 'sqlite':
+        return SQLiteCache(config['CACHE_URL'], config['CACHE_MAX_ENTRIES'], ttl, secret=config['CACHE_SECRET'])
+    if backend == 'redis':
+        return RedisCache(config['CACHE_URL'], ttl, secret=config['CACHE_SECRET'])
+    if backend != 'memory':
+        logging.warning(f"CACHE_BACKEND '{backend}' tidak dikenal, memakai memory")
+    return MemoryCache(config['CACHE_MAX_ENTRIES'], ttl)
+
+
+cache = create_cache(app.config)
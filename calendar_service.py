@@ -0,0 +1,68 @@
+from datetime import date
+
+from app import db
+from models import FinancialRecord
+from cache_backend import cache
+from data_version import version_token
+
+
+def month_range(year, month):
+    """
+    Mendapatkan tanggal awal (inklusif) dan akhir (eksklusif) untuk satu bulan
+    """
+    start_date = date(year, month, 1)
+    if month == 12:
+        end_date = date(year + 1, 1, 1)
+    else:
+        end_date = date(year, month + 1, 1)
+    return start_date, end_date
+
+
+def _query_daily_totals(property_ids, year, month):
+    start_date, end_date = month_range(year, month)
+    rows = db.session.query(
+        FinancialRecord.transaction_date,
+        db.func.sum(db.case((FinancialRecord.transaction_type == 'income', FinancialRecord.amount), else_=0)),
+        db.func.sum(db.case((FinancialRecord.transaction_type == 'expense', FinancialRecord.amount), else_=0)),
+        db.func.count(FinancialRecord.id)
+    ).filter(
+        FinancialRecord.property_id.in_(property_ids),
+        FinancialRecord.transaction_date >= start_date,
+        FinancialRecord.transaction_date < end_date
+    ).group_by(FinancialRecord.transaction_date).all()
+
+    totals = {}
+    for transaction_date, income, expense, count in rows:
+        totals[transaction_date.day] = {
+            'income': int(income or 0),
+            'expense': int(expense or 0),
+            'count': count
+        }
+    return totals
+
+
+def get_daily_totals(property_ids, year, month):
+    """
+    Mendapatkan total pendapatan/pengeluaran per hari dalam satu bulan
+    untuk properti yang diberikan dengan satu query GROUP BY.
+    Hasil disimpan di cache dengan kunci versi data properti, jadi otomatis
+    dihitung ulang setelah ada transaksi baru.
+    """
+    if not property_ids:
+        return {}
+
+    key = f'calendar:{year}-{month:02d}:{version_token(property_ids)}'
+    return cache.get_or_set(key, lambda: _query_daily_totals(property_ids, year, month))
+
+
+def get_day_transactions(property_ids, day_date):
+    """
+    Mendapatkan detail transaksi untuk satu tanggal (dipakai oleh modal kalender)
+    """
+    if not property_ids:
+        return []
+    records = FinancialRecord.query.filter(
+        FinancialRecord.property_id.in_(property_ids),
+        FinancialRecord.transaction_date == day_date
+    ).order_by(FinancialRecord.id).all()
+    return [record.to_dict() for record in records]
@@ -0,0 +1,75 @@
+"""
+Kompresi respons dinamis (brotli/gzip).
+
+Halaman HTML (terutama statistik dengan grafik base64) dan respons JSON
+dikompresi sebelum dikirim jika ukurannya melewati COMPRESS_MIN_SIZE dan
+browser mendukungnya. Brotli dipakai jika paket brotli terpasang, selain itu
+gzip. Respons streaming (ekspor CSV/XLSX) dan file (PDF, static) dilewati.
+"""
+import gzip
+
+from flask import request
+
+from app import app
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/csv',
+    'application/json',
+    'application/javascript',
+    'image/svg+xml',
+}
+
+
+def _choose_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress_body(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=app.config['COMPRESS_BROTLI_QUALITY'])
+    return gzip.compress(data, compresslevel=app.config['COMPRESS_LEVEL'])
+
+
+@app.after_request
+def compress_response(response):
+    """
+    Mengompresi isi respons sesuai Accept-Encoding
+    """
+    if (not app.config['COMPRESS_ENABLED']
+            or response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or 'Content-Encoding' in response.headers):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < app.config['COMPRESS_MIN_SIZE']:
+        return response
+
+    encoding = _choose_encoding()
+    if encoding is None:
+        return response
+
+    response.set_data(compress_body(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+
+    # Isi terkompresi berbeda byte-nya, jadi ETag kuat diturunkan menjadi ETag lemah
+    etag, is_weak = response.get_etag()
+    if etag and not is_weak:
+        response.set_etag(etag, weak=True)
+    return response
@@ -0,0 +1,149 @@
+"""
+Laporan akhir bulan gabungan untuk beberapa properti sekaligus.
+
+Data semua properti dikumpulkan dengan beberapa query agregat (GROUP BY
+property_id), bukan satu rangkaian query per properti. Setiap bagian properti
+lalu dirender sebagai potongan PDF terpisah di process pool dan digabung
+dengan halaman ringkasan di depan.
+"""
+from collections import defaultdict
+from datetime import date
+
+from app import db
+from models import Property, Room, OccupancyRecord, FinancialRecord, Receivable
+from calendar_service import month_range
+from due_dates import late_payments_for_month, overdue_ids
+from cache_backend import cache
+from data_version import version_token
+
+# Status terlambat juga bergantung pada hari libur yang tidak ikut versi data,
+# jadi hasil cache dibatasi umurnya
+MONTH_END_CACHE_TTL = 600
+
+
+def _empty_section(prop):
+    return {
+        'property_id': prop.id,
+        'property_name': prop.name,
+        'total_rooms': 0,
+        'occupied_rooms': 0,
+        'vacant_rooms': 0,
+        'occupancy_rate': 0,
+        'room_types': {},
+        'payment_status': {'paid': 0, 'unpaid': 0, 'late': 0, 'overdue': 0},
+        'income': 0,
+        'expense': 0,
+        'net_profit': 0,
+        'income_by_category': {},
+        'expense_by_category': {},
+        'outstanding': 0
+    }
+
+
+def gather_month_end_data(property_ids, year, month):
+    """
+    Mengumpulkan data laporan akhir bulan untuk semua properti yang diberikan.
+    Mengembalikan (sections, totals); sections terurut sesuai nama properti.
+    """
+    month_ordinal = year * 12 + month - 1
+    start, end = month_range(year, month)
+
+    properties = Property.query.filter(Property.id.in_(property_ids)).order_by(Property.name).all()
+    sections = {prop.id: _empty_section(prop) for prop in properties}
+    if not sections:
+        return [], _totals([])
+
+    # Kamar per tipe dan status
+    for property_id, room_type, total, occupied in db.session.query(
+        Room.property_id,
+        Room.room_type,
+        db.func.count(Room.id),
+        db.func.sum(db.case((Room.status == 'occupied', 1), else_=0))
+    ).filter(Room.property_id.in_(sections)).group_by(Room.property_id, Room.room_type).all():
+        section = sections[property_id]
+        section['room_types'][room_type] = total
+        section['total_rooms'] += total
+        section['occupied_rooms'] += int(occupied or 0)
+
+    # Status pembayaran hunian bulan ini; belum bayar yang lewat jatuh tempo dihitung terlambat
+    late_records = late_payments_for_month(month_ordinal, list(sections))
+    overdue = overdue_ids(late_records)
+    for record_id, property_id, payment_status in db.session.query(
+        OccupancyRecord.id, Room.property_id, OccupancyRecord.payment_status
+    ).join(Room, OccupancyRecord.room_id == Room.id).filter(
+        Room.property_id.in_(sections),
+        OccupancyRecord.month_ordinal == month_ordinal,
+        OccupancyRecord.is_occupied == True
+    ).all():
+        if payment_status == 'unpaid' and record_id in late_records:
+            payment_status = 'late'
+        counts = sections[property_id]['payment_status']
+        if payment_status in counts:
+            counts[payment_status] += 1
+        if payment_status != 'paid' and record_id in overdue:
+            counts['overdue'] += 1
+
+    # Pendapatan dan pengeluaran per kategori
+    for property_id, transaction_type, category, amount in db.session.query(
+        FinancialRecord.property_id,
+        FinancialRecord.transaction_type,
+        FinancialRecord.category,
+        db.func.sum(FinancialRecord.amount)
+    ).filter(
+        FinancialRecord.property_id.in_(sections),
+        FinancialRecord.transaction_date >= start,
+        FinancialRecord.transaction_date < end
+    ).group_by(FinancialRecord.property_id, FinancialRecord.transaction_type, FinancialRecord.category).all():
+        section = sections[property_id]
+        amount = int(amount or 0)
+        if transaction_type == 'income':
+            section['income'] += amount
+            section['income_by_category'][category] = amount
+        else:
+            section['expense'] += amount
+            section['expense_by_category'][category] = amount
+
+    # Sisa tagihan sewa dari buku piutang
+    for property_id, outstanding in db.session.query(
+        Receivable.property_id, db.func.sum(Receivable.outstanding)
+    ).filter(
+        Receivable.property_id.in_(sections),
+        Receivable.outstanding > 0
+    ).group_by(Receivable.property_id).all():
+        sections[property_id]['outstanding'] = int(outstanding or 0)
+
+    for section in sections.values():
+        section['vacant_rooms'] = section['total_rooms'] - section['occupied_rooms']
+        if section['total_rooms']:
+            section['occupancy_rate'] = section['occupied_rooms'] / section['total_rooms'] * 100
+        section['net_profit'] = section['income'] - section['expense']
+
+    ordered = [sections[prop.id] for prop in properties]
+    return ordered, _totals(ordered)
+
+
+def cached_month_end_data(property_ids, year, month):
+    """
+    gather_month_end_data dengan cache bersama; dihitung ulang jika data properti berubah
+    """
+    key = f'month-end:{year}-{month:02d}:{date.today().isoformat()}:{version_token(property_ids)}'
+    return cache.get_or_set(key, lambda: gather_month_end_data(property_ids, year, month), ttl=MONTH_END_CACHE_TTL)
+
+
+def _totals(sections):
+    totals = {
+        'total_rooms': sum(s['total_rooms'] for s in sections),
+        'occupied_rooms': sum(s['occupied_rooms'] for s in sections),
+        'income': sum(s['income'] for s in sections),
+        'expense': sum(s['expense'] for s in sections),
+        'outstanding': sum(s['outstanding'] for s in sections),
+        'payment_status': defaultdict(int)
+    }
+    for section in sections:
+        for status, count in section['payment_status'].items():
+            totals['payment_status'][status] += count
+    totals['payment_status'] = dict(totals['payment_status'])
+    totals['vacant_rooms'] = totals['total_rooms'] - totals['occupied_rooms']
+    totals['occupancy_rate'] = (totals['occupied_rooms'] / totals['total_rooms'] * 100) if totals['total_rooms'] else 0
+    totals['net_profit'] = totals['income'] - totals['expense']
+    return totals
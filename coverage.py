@@ -0,0 +1,41 @@
+from app import db
+from models import Room, OccupancyRecord, month_to_ordinal
+
+
+def paid_coverage_for_month(month_ordinal, property_ids):
+    """
+    Mendapatkan kamar yang sudah dibayar untuk bulan tertentu, termasuk yang
+    tercakup pembayaran beberapa bulan sekaligus dari bulan sebelumnya.
+    Mengembalikan {room_id: (occupancy_id, coverage_end)} dengan satu query rentang.
+    """
+    if not property_ids:
+        return {}
+
+    rows = db.session.query(
+        OccupancyRecord.room_id,
+        OccupancyRecord.id,
+        OccupancyRecord.coverage_end
+    ).join(Room).filter(
+        Room.property_id.in_(property_ids),
+        OccupancyRecord.payment_status == 'paid',
+        OccupancyRecord.coverage_start <= month_ordinal,
+        OccupancyRecord.coverage_end >= month_ordinal
+    ).order_by(OccupancyRecord.coverage_end).all()
+
+    # Jika ada beberapa catatan, simpan yang cakupannya paling panjang
+    return {room_id: (record_id, coverage_end) for room_id, record_id, coverage_end in rows}
+
+
+def is_room_paid(room_id, month_key):
+    """
+    Mengecek apakah kamar sudah dibayar untuk bulan tertentu
+    """
+    month_ordinal = month_to_ordinal(month_key)
+    return db.session.query(
+        db.session.query(OccupancyRecord.id).filter(
+            OccupancyRecord.room_id == room_id,
+            OccupancyRecord.payment_status == 'paid',
+            OccupancyRecord.coverage_start <= month_ordinal,
+            OccupancyRecord.coverage_end >= month_ordinal
+        ).exists()
+    ).scalar()
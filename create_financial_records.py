@@ -2,6 +2,7 @@ import os
 from datetime import datetime
 from app import app, db
 from models import OccupancyRecord, Room, FinancialRecord
+from room_rates import rates_for
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 
@@ -11,6 +12,9 @@ def create_financial_records_for_existing_payments():
         paid_occupancies = OccupancyRecord.query.filter_by(payment_status='paid').all()
         print(f'Menemukan {len(paid_occupancies)} catatan pembayaran dengan status paid')
         
+        # Tarif yang berlaku di bulan masing-masing hunian, dalam satu query
+        rates = rates_for((occupancy.room_id, occupancy.month_ordinal) for occupancy in paid_occupancies)
+        
         # 2. Untuk setiap catatan paid, buat catatan finansial
         for occupancy in paid_occupancies:
             room = Room.query.get(occupancy.room_id)
@@ -19,11 +23,12 @@ def create_financial_records_for_existing_payments():
                 continue
                 
             # Hitung jumlah pembayaran
-            amount = room.monthly_rate * occupancy.payment_months
+            amount = rates[(room.id, occupancy.month_ordinal)] * occupancy.payment_months
             payment_date = occupancy.payment_date or datetime.now().date()
             
             # Cek apakah sudah ada catatan finansial untuk occupancy ini
             existing_record = FinancialRecord.query.filter(
+                (FinancialRecord.occupancy_id == occupancy.id) |
                 FinancialRecord.description.like(f'%occupancy_id={occupancy.id}%')
             ).first()
             
@@ -38,7 +43,8 @@ def create_financial_records_for_existing_payments():
                     transaction_type='income',
                     category='Sewa',
                     description=f'Pembayaran sewa oleh {occupancy.tenant_name} untuk {occupancy.payment_months} bulan (occupancy_id={occupancy.id})',
-                    created_by=1  # admin user
+                    created_by=1,  # admin user
+                    occupancy_id=occupancy.id
                 )
                 db.session.add(financial_record)
                 print(f'Membuat catatan finansial untuk occupancy_id={occupancy.id}, jumlah={amount}')
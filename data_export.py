@@ -0,0 +1,232 @@
+"""
+Ekspor data hunian dan keuangan ke CSV/XLSX secara streaming.
+
+Baris dibaca dari database sedikit demi sedikit (yield_per, memakai server-side
+cursor jika didukung driver) dan langsung ditulis ke response, sehingga ekspor
+rentang bertahun-tahun mulai terunduh seketika dengan pemakaian memori tetap.
+"""
+import io
+import csv
+import zipfile
+from datetime import date, datetime
+from xml.sax.saxutils import escape
+
+from app import db
+from models import Room, OccupancyRecord, FinancialRecord
+
+# Jumlah baris yang diambil dari database per batch
+EXPORT_BATCH_SIZE = 500
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',  # Werkzeug menambahkan charset=utf-8
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+OCCUPANCY_HEADER = ['Bulan', 'Nomor Kamar', 'Tipe Kamar', 'Status', 'Nama Penyewa',
+                    'Tarif Bulanan', 'Status Pembayaran', 'Jumlah Bulan', 'Tanggal Bayar',
+                    'Jatuh Tempo', 'Catatan']
+
+FINANCE_HEADER = ['Tanggal', 'Jenis', 'Kategori', 'Jumlah', 'Deskripsi']
+
+
+def _stream(statement):
+    # Baris dibaca per batch; hanya kolom yang dibutuhkan, tanpa membuat objek ORM
+    result = db.session.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    for partition in result.partitions():
+        yield from partition
+
+
+def occupancy_rows(property_id, start_ordinal, end_ordinal):
+    """
+    Baris ekspor hunian untuk satu properti dan rentang nomor urut bulan
+    """
+    statement = db.select(
+        OccupancyRecord.month, Room.number, Room.room_type, OccupancyRecord.is_occupied,
+        OccupancyRecord.tenant_name, Room.monthly_rate, OccupancyRecord.payment_status,
+        OccupancyRecord.payment_months, OccupancyRecord.payment_date,
+        OccupancyRecord.payment_due_date, OccupancyRecord.notes
+    ).join(Room, OccupancyRecord.room_id == Room.id).where(
+        Room.property_id == property_id,
+        OccupancyRecord.month_ordinal >= start_ordinal,
+        OccupancyRecord.month_ordinal <= end_ordinal
+    ).order_by(OccupancyRecord.month_ordinal, Room.number)
+
+    for (month, number, room_type, is_occupied, tenant_name, monthly_rate, payment_status,
+         payment_months, payment_date, payment_due_date, notes) in _stream(statement):
+        yield [
+            month, number, room_type,
+            'Terisi' if is_occupied else 'Kosong',
+            tenant_name or '',
+            monthly_rate,
+            'Lunas' if payment_status == 'paid' else 'Belum Lunas',
+            payment_months or 1,
+            payment_date, payment_due_date,
+            notes or ''
+        ]
+
+
+def finance_rows(property_id, start_date, end_date):
+    """
+    Baris ekspor keuangan untuk satu properti dan rentang tanggal
+    """
+    statement = db.select(
+        FinancialRecord.transaction_date, FinancialRecord.transaction_type,
+        FinancialRecord.category, FinancialRecord.amount, FinancialRecord.description
+    ).where(
+        FinancialRecord.property_id == property_id,
+        FinancialRecord.transaction_date >= start_date,
+        FinancialRecord.transaction_date <= end_date
+    ).order_by(FinancialRecord.transaction_date, FinancialRecord.id)
+
+    for transaction_date, transaction_type, category, amount, description in _stream(statement):
+        yield [
+            transaction_date,
+            'Pendapatan' if transaction_type == 'income' else 'Pengeluaran',
+            category or '', amount, description or ''
+        ]
+
+
+def _format_cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, (date, datetime)):
+        return value.strftime('%Y-%m-%d')
+    return value
+
+
+def stream_csv(header, rows):
+    """
+    Menghasilkan file CSV sepotong demi sepotong (satu potongan per baris)
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    # BOM agar Excel membaca UTF-8 dengan benar
+    buffer.write('\ufeff')
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow([_format_cell(value) for value in row])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+class _ChunkWriter(io.RawIOBase):
+    """
+    Tujuan tulis zipfile yang tidak bisa di-seek; potongan yang sudah ditulis
+    diambil dengan drain() lalu dikirim ke client
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+
+_XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+
+def _xlsx_workbook(sheet_name):
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(sheet_name[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+
+
+def _xlsx_row(values):
+    cells = []
+    for value in values:
+        value = _format_cell(value)
+        if isinstance(value, bool):
+            value = int(value)
+        if isinstance(value, (int, float)):
+            cells.append(f'<c><v>{value}</v></c>')
+        else:
+            cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{escape(str(value))}</t></is></c>')
+    return f'<row>{"".join(cells)}</row>'
+
+
+def stream_xlsx(header, rows, sheet_name='Data'):
+    """
+    Menghasilkan file XLSX secara streaming tanpa dependensi tambahan.
+    Lembar kerja ditulis baris demi baris ke arsip zip dengan inline string,
+    sehingga tidak perlu menyimpan seluruh data di memori.
+    """
+    output = _ChunkWriter()
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _XLSX_CONTENT_TYPES)
+        archive.writestr('_rels/.rels', _XLSX_ROOT_RELS)
+        archive.writestr('xl/workbook.xml', _xlsx_workbook(sheet_name))
+        archive.writestr('xl/_rels/workbook.xml.rels', _XLSX_WORKBOOK_RELS)
+        yield output.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b'<sheetData>'
+            )
+            sheet.write(_xlsx_row(header).encode('utf-8'))
+            for row in rows:
+                sheet.write(_xlsx_row(row).encode('utf-8'))
+                chunk = output.drain()
+                if chunk:
+                    yield chunk
+            sheet.write(b'</sheetData></worksheet>')
+    yield output.drain()
+
+
+def stream_export(export_format, header, rows, sheet_name='Data'):
+    """
+    Memilih penulis sesuai format ekspor ('csv' atau 'xlsx')
+    """
+    if export_format == 'xlsx':
+        return stream_xlsx(header, rows, sheet_name=sheet_name)
+    return (chunk.encode('utf-8') for chunk in stream_csv(header, rows))
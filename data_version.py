@@ -0,0 +1,37 @@
+"""
+Versi data per properti.
+
+Setiap flush yang menambah, mengubah atau menghapus kamar, catatan hunian atau
+catatan keuangan menaikkan versi properti yang bersangkutan (lihat
+models._bump_versions_after_flush) dalam transaksi yang sama. Versi ini dipakai
+sebagai kunci cache: jika versi tidak berubah, data properti tidak berubah.
+"""
+from flask import g, has_app_context
+
+from app import db
+from models import DataVersion
+
+
+def get_data_versions(property_ids):
+    """
+    Mendapatkan {property_id: versi} (0 jika properti belum pernah berubah).
+    Hasil disimpan selama request berjalan.
+    """
+    property_ids = sorted(set(property_ids))
+    cache = g.setdefault('_data_versions', {}) if has_app_context() else {}
+    missing = [property_id for property_id in property_ids if property_id not in cache]
+    if missing:
+        versions = dict(db.session.query(DataVersion.property_id, DataVersion.version).filter(
+            DataVersion.property_id.in_(missing)
+        ).all())
+        for property_id in missing:
+            cache[property_id] = versions.get(property_id, 0)
+    return {property_id: cache[property_id] for property_id in property_ids}
+
+
+def version_token(property_ids):
+    """
+    Versi gabungan beberapa properti dalam bentuk string, misalnya '1.5-2.0-3.12'
+    """
+    return '-'.join(f'{property_id}.{version}' for property_id, version in get_data_versions(property_ids).items())
+
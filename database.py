@@ -0,0 +1,249 @@
+"""
+Pengaturan koneksi database.
+
+- Ukuran pool diatur dari environment (DB_POOL_SIZE, DB_MAX_OVERFLOW,
+  DB_POOL_TIMEOUT, DB_POOL_RECYCLE). pool_pre_ping menambah satu round trip di
+  setiap checkout, jadi bawaannya mati; pool_recycle sudah mencegah koneksi
+  yang diputus server (wait_timeout MySQL).
+- Statistik pool (connect/checkout/checkin, koneksi yang sedang dipakai) untuk
+  setiap engine, lihat pool_stats().
+- Jika READ_DATABASE_URL diisi, route baca berat (statistik, PDF, kalender,
+  ekspor) yang diberi @read_replica mengirim SELECT ke database replika.
+  Penulisan (flush, INSERT/UPDATE/DELETE) tetap ke database utama.
+- run_concurrently() menjalankan beberapa query agregat yang saling lepas
+  secara bersamaan, masing-masing dengan koneksi sendiri dari pool.
+- Mode produksi SQLite (SQLITE_WAL=true, bawaan): WAL, synchronous=NORMAL,
+  busy_timeout, mmap_size dan cache_size di setiap koneksi baru. Transaksi di
+  request POST dibuka dengan BEGIN IMMEDIATE sehingga penulis mengantre lewat
+  busy_timeout, bukan langsung gagal 'database is locked' saat snapshot baca
+  sudah usang. View penulisan diberi @retry_on_locked sebagai lapisan terakhir.
+"""
+import os
+import time
+import random
+import sqlite3
+import threading
+from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
+
+import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from flask import g, request, has_request_context, current_app
+from flask_sqlalchemy.session import Session
+
+REPLICA_BIND = 'replica'
+
+
+def engine_options(url):
+    """
+    Opsi engine SQLAlchemy untuk URL database yang diberikan
+    """
+    options = {
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', 'false').lower() == 'true',
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 300)),
+    }
+    # Pool SQLite tidak dibatasi ukuran (koneksi murah, satu file lokal)
+    if not url.startswith('sqlite'):
+        options.update({
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+            'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        })
+    return options
+
+
+SQLITE_WAL = os.environ.get('SQLITE_WAL', 'true').lower() == 'true'
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -20000)),  # negatif = KiB
+    'temp_store': 'MEMORY',
+}
+
+WRITE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+WRITE_RETRIES = int(os.environ.get('DB_WRITE_RETRIES', 5))
+WRITE_RETRY_DELAY = 0.05
+
+# Kode error MySQL yang aman diulang: lock wait timeout, deadlock
+_MYSQL_RETRY_CODES = {1205, 1213}
+
+
+@event.listens_for(sa.engine.Engine, 'connect')
+def _configure_sqlite(dbapi_connection, connection_record):
+    if not SQLITE_WAL or not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+    # BEGIN dikirim sendiri di _begin_sqlite, bukan oleh driver sqlite3
+    dbapi_connection.isolation_level = None
+
+
+@event.listens_for(sa.engine.Engine, 'begin')
+def _begin_sqlite(connection):
+    if not SQLITE_WAL or connection.dialect.name != 'sqlite':
+        return
+    if has_request_context() and request.method in WRITE_METHODS:
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+    else:
+        connection.exec_driver_sql('BEGIN')
+
+
+def is_lock_error(error):
+    """
+    True jika error database disebabkan lock/konflik sementara yang aman diulang
+    """
+    orig = getattr(error, 'orig', None)
+    if isinstance(orig, sqlite3.OperationalError):
+        message = str(orig).lower()
+        return 'locked' in message or 'busy' in message
+    args = getattr(orig, 'args', ())
+    return bool(args) and args[0] in _MYSQL_RETRY_CODES
+
+
+def retry_on_locked(view):
+    """
+    Decorator untuk view penulisan: jika transaksi gagal karena database terkunci,
+    session di-rollback lalu view dijalankan ulang (backoff eksponensial).
+    Dipasang tepat di bawah @app.route agar pemuatan pengguna oleh
+    @login_required (query pertama, yang membuka transaksi) ikut diulang.
+    """
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        for attempt in range(WRITE_RETRIES):
+            try:
+                return view(*args, **kwargs)
+            except OperationalError as e:
+                if not is_lock_error(e) or attempt == WRITE_RETRIES - 1:
+                    raise
+                current_app.extensions['sqlalchemy'].session.rollback()
+                current_app.logger.warning(f"Database terkunci di {request.path}, percobaan ulang {attempt + 1}")
+                time.sleep(WRITE_RETRY_DELAY * (2 ** attempt) * (1 + random.random()))
+    return wrapped
+
+
+def _replica_requested():
+    return has_request_context() and g.get('read_replica', False)
+
+
+class RoutingSession(Session):
+    """
+    Session yang mengarahkan SELECT ke replika selama request @read_replica
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None
+                and not self._flushing
+                and isinstance(clause, (sa.Select, sa.CompoundSelect))
+                and _replica_requested()):
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_replica(view):
+    """
+    Decorator untuk view GET yang hanya membaca data; dipasang di bawah @login_required.
+    Tanpa READ_DATABASE_URL tidak berpengaruh.
+    """
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if request.method == 'GET':
+            g.read_replica = True
+        return view(*args, **kwargs)
+    return wrapped
+
+
+QUERY_WORKERS = int(os.environ.get('DB_QUERY_WORKERS', 4))
+_query_executor = ThreadPoolExecutor(max_workers=QUERY_WORKERS, thread_name_prefix='db-query')
+
+
+def read_engine(db):
+    """
+    Engine untuk query baca: replika selama request @read_replica, selain itu utama
+    """
+    if _replica_requested():
+        return db.engines.get(REPLICA_BIND, db.engine)
+    return db.engine
+
+
+def run_concurrently(engine, statements, main_thread_work=None):
+    """
+    Menjalankan {nama: select} bersamaan di thread pool, masing-masing dengan
+    koneksinya sendiri, dan mengembalikan {nama: daftar baris}. Waktu totalnya
+    mengikuti query paling lambat, bukan jumlah semua query.
+    main_thread_work (opsional) dijalankan di thread request selama query
+    berjalan (misalnya fungsi yang memakai db.session); hasilnya dikembalikan
+    dengan nama '_main'.
+    """
+    def run(statement):
+        with engine.connect() as connection:
+            return connection.execute(statement).all()
+
+    # SQLite di memori hanya terlihat dari satu koneksi, jadi dijalankan berurutan
+    if engine.dialect.name == 'sqlite' and engine.url.database in (None, '', ':memory:'):
+        results = {name: run(statement) for name, statement in statements.items()}
+        if main_thread_work is not None:
+            results['_main'] = main_thread_work()
+        return results
+
+    futures = {name: _query_executor.submit(run, statement) for name, statement in statements.items()}
+    results = {}
+    if main_thread_work is not None:
+        results['_main'] = main_thread_work()
+    for name, future in futures.items():
+        results[name] = future.result()
+    return results
+
+
+# Statistik pool per bind: {nama: (engine, counters)}
+_pool_metrics = {}
+_pool_lock = threading.Lock()
+
+
+def _track(counters, name, pool=None):
+    def listener(*args):
+        with _pool_lock:
+            counters[name] += 1
+            if pool is not None and hasattr(pool, 'checkedout'):
+                counters['peak_checked_out'] = max(counters['peak_checked_out'], pool.checkedout())
+    return listener
+
+
+def register_pool_metrics(db):
+    """
+    Memasang penghitung event pool pada semua engine (dipanggil dalam app context)
+    """
+    for key, engine in db.engines.items():
+        name = key or 'primary'
+        if name in _pool_metrics:
+            continue
+        counters = {'connects': 0, 'checkouts': 0, 'checkins': 0, 'invalidated': 0, 'peak_checked_out': 0}
+        event.listen(engine, 'connect', _track(counters, 'connects'))
+        event.listen(engine, 'checkout', _track(counters, 'checkouts', engine.pool))
+        event.listen(engine, 'checkin', _track(counters, 'checkins'))
+        event.listen(engine, 'invalidate', _track(counters, 'invalidated'))
+        _pool_metrics[name] = (engine, counters)
+
+
+def pool_stats():
+    """
+    Statistik pool semua engine untuk proses (worker) ini
+    """
+    stats = {}
+    for name, (engine, counters) in _pool_metrics.items():
+        pool = engine.pool
+        with _pool_lock:
+            entry = dict(counters)
+        entry['url'] = engine.url.render_as_string(hide_password=True)
+        entry['pool'] = type(pool).__name__
+        for attr in ('size', 'checkedin', 'checkedout', 'overflow'):
+            if hasattr(pool, attr):
+                entry[attr] = getattr(pool, attr)()
+        stats[name] = entry
+    return stats
@@ -22,15 +22,49 @@ CREATE TABLE IF NOT EXISTS properties (
 -- Tabel Rooms
 CREATE TABLE IF NOT EXISTS rooms (
     id INT AUTO_INCREMENT PRIMARY KEY,
-    number VARCHAR(10) NOT NULL,
+    number VARCHAR(20) NOT NULL,
     property_id INT NOT NULL,
     room_type VARCHAR(50) NOT NULL,
     monthly_rate INT DEFAULT 0,
     status VARCHAR(20) DEFAULT 'available',
+    version INT NOT NULL DEFAULT 1,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_rooms_property_number (property_id, number),
     FOREIGN KEY (property_id) REFERENCES properties(id)
 );
 
+-- Tabel Nomor Urut Kamar Baru (per properti dan awalan nomor, lihat rooms.py)
+CREATE TABLE IF NOT EXISTS room_number_sequences (
+    property_id INT NOT NULL,
+    prefix VARCHAR(20) NOT NULL,
+    next_value INT NOT NULL DEFAULT 1,
+    PRIMARY KEY (property_id, prefix),
+    FOREIGN KEY (property_id) REFERENCES properties(id)
+);
+
+-- Tabel Riwayat Tarif Kamar (effective_from = nomor urut bulan, tahun * 12 + bulan - 1)
+CREATE TABLE IF NOT EXISTS room_rates (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    room_id INT NOT NULL,
+    rate INT NOT NULL,
+    previous_rate INT,
+    effective_from INT NOT NULL,
+    changed_by INT,
+    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (room_id) REFERENCES rooms(id),
+    FOREIGN KEY (changed_by) REFERENCES users(id)
+);
+
+-- Tabel Tenants (Penyewa)
+CREATE TABLE IF NOT EXISTS tenants (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    normalized_name VARCHAR(100) NOT NULL UNIQUE,
+    phone VARCHAR(30),
+    email VARCHAR(120),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Tabel Occupancy Records
 CREATE TABLE IF NOT EXISTS occupancy_records (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -38,6 +72,7 @@ CREATE TABLE IF NOT EXISTS occupancy_records (
     month VARCHAR(7) NOT NULL,
     is_occupied BOOLEAN DEFAULT TRUE,
     tenant_name VARCHAR(100),
+    tenant_id INT,
     payment_status VARCHAR(20) DEFAULT 'unpaid',
     payment_date DATE,
     payment_due_date DATE,
@@ -45,7 +80,10 @@ CREATE TABLE IF NOT EXISTS occupancy_records (
     notes TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     created_by INT,
+    coverage_start INT,
+    coverage_end INT,
     FOREIGN KEY (room_id) REFERENCES rooms(id),
+    FOREIGN KEY (tenant_id) REFERENCES tenants(id),
     FOREIGN KEY (created_by) REFERENCES users(id)
 );
 
@@ -60,7 +98,22 @@ CREATE TABLE IF NOT EXISTS financial_records (
     description TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     created_by INT,
+    occupancy_id INT,
+    UNIQUE KEY ix_financial_records_occupancy_id (occupancy_id),
     FOREIGN KEY (property_id) REFERENCES properties(id),
+    FOREIGN KEY (created_by) REFERENCES users(id),
+    FOREIGN KEY (occupancy_id) REFERENCES occupancy_records(id)
+);
+
+-- Tabel Kunci Idempotensi Pembayaran (mencegah pembayaran tercatat dua kali)
+CREATE TABLE IF NOT EXISTS payment_requests (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    idempotency_key VARCHAR(64) NOT NULL UNIQUE,
+    action VARCHAR(30),
+    occupancy_id INT,
+    financial_record_id INT,
+    created_by INT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (created_by) REFERENCES users(id)
 );
 
@@ -72,12 +125,68 @@ CREATE TABLE IF NOT EXISTS national_holidays (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Tabel Receivables (Piutang Sewa)
+CREATE TABLE IF NOT EXISTS receivables (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    occupancy_id INT NOT NULL UNIQUE,
+    property_id INT NOT NULL,
+    room_id INT NOT NULL,
+    tenant_name VARCHAR(100),
+    month VARCHAR(7) NOT NULL,
+    due_date DATE NOT NULL,
+    amount_due INT NOT NULL DEFAULT 0,
+    amount_paid INT NOT NULL DEFAULT 0,
+    outstanding INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (occupancy_id) REFERENCES occupancy_records(id),
+    FOREIGN KEY (property_id) REFERENCES properties(id),
+    FOREIGN KEY (room_id) REFERENCES rooms(id)
+);
+
+-- Tabel Arsip Laporan PDF (dibuat terjadwal, lihat report_archive.py)
+CREATE TABLE IF NOT EXISTS report_archives (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    report_type VARCHAR(30) NOT NULL,
+    property_id INT NOT NULL DEFAULT 0,
+    period VARCHAR(7) NOT NULL,
+    filename VARCHAR(255) NOT NULL,
+    size INT NOT NULL DEFAULT 0,
+    generated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_report_archives_report (report_type, property_id, period)
+);
+
+-- Tabel Versi Data per Properti (naik setiap ada perubahan kamar, hunian atau keuangan)
+CREATE TABLE IF NOT EXISTS data_versions (
+    property_id INT PRIMARY KEY,
+    version INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (property_id) REFERENCES properties(id)
+);
+
+-- Tabel Indeks Pencarian Teks Penuh (diisi otomatis oleh aplikasi, lihat search.py)
+CREATE TABLE IF NOT EXISTS search_documents (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    kind VARCHAR(20) NOT NULL,
+    record_id INT NOT NULL,
+    property_id INT NOT NULL,
+    body TEXT,
+    UNIQUE KEY uq_search_documents_record (kind, record_id),
+    KEY idx_search_documents_property (property_id),
+    FULLTEXT KEY ft_search_documents_body (body)
+) ENGINE=InnoDB;
+
 -- Indeks untuk Pencarian Cepat
 CREATE INDEX idx_rooms_property_id ON rooms(property_id);
 CREATE INDEX idx_occupancy_room_id ON occupancy_records(room_id);
 CREATE INDEX idx_occupancy_month ON occupancy_records(month);
+CREATE INDEX idx_occupancy_coverage ON occupancy_records(room_id, coverage_start, coverage_end);
+CREATE INDEX idx_occupancy_month_ordinal ON occupancy_records(coverage_start);
+CREATE INDEX ix_occupancy_records_tenant_id ON occupancy_records(tenant_id);
 CREATE INDEX idx_financial_property_id ON financial_records(property_id);
 CREATE INDEX idx_financial_transaction_date ON financial_records(transaction_date);
+CREATE INDEX idx_receivables_property_outstanding ON receivables(property_id, outstanding, due_date);
+CREATE INDEX ix_receivables_room_id ON receivables(room_id);
+CREATE INDEX idx_room_rates_room_effective ON room_rates(room_id, effective_from);
 
 -- Data Awal (Opsional) - Admin User
 INSERT IGNORE INTO users (username, password_hash, role)
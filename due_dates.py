@@ -0,0 +1,78 @@
+from datetime import date
+
+from flask import g, has_app_context
+
+from app import db
+from models import Room, OccupancyRecord
+from holiday_service import next_business_day
+
+# Pembayaran yang terlambat lebih dari jumlah hari ini dianggap menunggak (overdue)
+OVERDUE_AFTER_DAYS = 30
+
+
+def effective_due_date(due_date):
+    """
+    Jatuh tempo efektif: jika jatuh tempo pada akhir pekan atau hari libur nasional,
+    penyewa masih boleh membayar pada hari kerja berikutnya
+    """
+    return next_business_day(due_date)
+
+
+def evaluate_late_payments(records, today=None):
+    """
+    Menghitung keterlambatan untuk sekumpulan catatan hunian sekaligus.
+    `records` berisi objek/row dengan atribut id, payment_status dan payment_due_date.
+    Mengembalikan {record_id: jumlah_hari_terlambat} hanya untuk catatan yang terlambat.
+    """
+    today = today or date.today()
+    effective_dates = {}
+    late = {}
+    for record in records:
+        due_date = record.payment_due_date
+        if record.payment_status == 'paid' or not due_date:
+            continue
+        # Jatuh tempo efektif cukup dihitung sekali untuk setiap tanggal yang sama
+        if due_date not in effective_dates:
+            effective_dates[due_date] = effective_due_date(due_date)
+        days_late = (today - effective_dates[due_date]).days
+        if days_late > 0:
+            late[record.id] = days_late
+    return late
+
+
+def overdue_ids(late, days=OVERDUE_AFTER_DAYS):
+    """
+    Mendapatkan id catatan yang terlambat lebih dari `days` hari
+    """
+    return {record_id for record_id, days_late in late.items() if days_late > days}
+
+
+def late_payments_for_month(month_ordinal, property_ids, today=None):
+    """
+    Mendapatkan {record_id: jumlah_hari_terlambat} untuk satu bulan (nomor urut bulan)
+    dengan satu query. Hasilnya disimpan selama request berjalan sehingga
+    dashboard, halaman status pembayaran dan PDF memakai hasil yang sama.
+    """
+    if not property_ids:
+        return {}
+
+    key = (month_ordinal, tuple(sorted(property_ids)), today)
+    cache = g.setdefault('_late_payments', {}) if has_app_context() else {}
+    if key in cache:
+        return cache[key]
+
+    rows = db.session.query(
+        OccupancyRecord.id,
+        OccupancyRecord.payment_status,
+        OccupancyRecord.payment_due_date
+    ).join(Room).filter(
+        Room.property_id.in_(property_ids),
+        OccupancyRecord.month_ordinal == month_ordinal,
+        OccupancyRecord.is_occupied == True,
+        OccupancyRecord.payment_status != 'paid',
+        OccupancyRecord.payment_due_date.isnot(None)
+    ).all()
+
+    late = evaluate_late_payments(rows, today=today)
+    cache[key] = late
+    return late
@@ -0,0 +1,114 @@
+from flask import request, flash, redirect, url_for, Response, stream_with_context
+from datetime import datetime
+import re
+from flask_login import login_required
+
+from app import app
+from models import month_to_ordinal
+from auth_helpers import property_access_required, get_user_properties
+from database import read_replica
+from data_export import (EXPORT_FORMATS, OCCUPANCY_HEADER, FINANCE_HEADER,
+                         occupancy_rows, finance_rows, stream_export)
+
+
+def _export_response(export_format, header, rows, filename, sheet_name):
+    """
+    Response streaming: data dikirim ke client sambil dibaca dari database
+    """
+    safe_filename = re.sub(r'[^A-Za-z0-9_.-]+', '_', filename)
+    response = Response(
+        stream_with_context(stream_export(export_format, header, rows, sheet_name=sheet_name)),
+        mimetype=EXPORT_FORMATS[export_format]
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename="{safe_filename}.{export_format}"'
+    # Jangan ditahan proxy (nginx) agar unduhan langsung berjalan
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@app.route('/export_occupancy')
+@login_required
+@property_access_required
+@read_replica
+def export_occupancy():
+    """
+    Mengekspor data hunian ke CSV/XLSX (streaming), filter sama dengan ekspor PDF
+    """
+    property_id = request.args.get('property_id', type=int)
+    start_month = request.args.get('start_month', datetime.now().strftime('%Y-%m'))
+    end_month = request.args.get('end_month', start_month)
+    export_format = request.args.get('format', 'csv')
+
+    if export_format not in EXPORT_FORMATS:
+        flash('Format ekspor tidak valid.', 'danger')
+        return redirect(url_for('manage_occupancy'))
+
+    # Validasi format bulan
+    try:
+        start_ordinal = month_to_ordinal(start_month)
+        end_ordinal = month_to_ordinal(end_month)
+    except ValueError:
+        flash('Format bulan tidak valid. Gunakan format YYYY-MM.', 'danger')
+        return redirect(url_for('manage_occupancy'))
+
+    if not property_id:
+        flash('Properti tidak valid.', 'danger')
+        return redirect(url_for('manage_occupancy'))
+
+    # Pastikan pengguna memiliki akses ke properti
+    property_data = next((p for p in get_user_properties() if p.id == property_id), None)
+    if not property_data:
+        flash('Anda tidak memiliki akses ke properti ini.', 'danger')
+        return redirect(url_for('manage_occupancy'))
+
+    return _export_response(
+        export_format,
+        OCCUPANCY_HEADER,
+        occupancy_rows(property_id, start_ordinal, end_ordinal),
+        f'hunian_{property_data.name}_{start_month}_{end_month}',
+        sheet_name='Hunian'
+    )
+
+
+@app.route('/export_finance')
+@login_required
+@property_access_required
+@read_replica
+def export_finance():
+    """
+    Mengekspor data keuangan ke CSV/XLSX (streaming), filter sama dengan ekspor PDF
+    """
+    property_id = request.args.get('property_id', type=int)
+    start_date_str = request.args.get('start_date', datetime.now().replace(day=1).strftime('%Y-%m-%d'))
+    end_date_str = request.args.get('end_date', datetime.now().strftime('%Y-%m-%d'))
+    export_format = request.args.get('format', 'csv')
+
+    if export_format not in EXPORT_FORMATS:
+        flash('Format ekspor tidak valid.', 'danger')
+        return redirect(url_for('manage_finance'))
+
+    # Validasi format tanggal
+    try:
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+    except ValueError:
+        flash('Format tanggal tidak valid. Gunakan format YYYY-MM-DD.', 'danger')
+        return redirect(url_for('manage_finance'))
+
+    if not property_id:
+        flash('Properti tidak valid.', 'danger')
+        return redirect(url_for('manage_finance'))
+
+    # Pastikan pengguna memiliki akses ke properti
+    property_data = next((p for p in get_user_properties() if p.id == property_id), None)
+    if not property_data:
+        flash('Anda tidak memiliki akses ke properti ini.', 'danger')
+        return redirect(url_for('manage_finance'))
+
+    return _export_response(
+        export_format,
+        FINANCE_HEADER,
+        finance_rows(property_id, start_date, end_date),
+        f'keuangan_{property_data.name}_{start_date_str}_{end_date_str}',
+        sheet_name='Keuangan'
+    )
@@ -0,0 +1,204 @@
+"""
+Proyeksi pendapatan sewa untuk beberapa bulan ke depan.
+
+Untuk setiap kamar dan bulan proyeksi:
+
+- prepaid: bulan yang sudah dibayar di muka (cakupan payment_months dari
+  catatan hunian berstatus paid)
+- contracted: bulan yang sudah tercatat dihuni tetapi belum dibayar
+- projected: bulan yang belum tercatat, yaitu tarif x tingkat hunian historis
+  tipe kamar tersebut di propertinya (lookback bulan terakhir)
+
+Tarif per bulan diambil dari riwayat tarif (room_rates), sehingga perubahan
+tarif yang dijadwalkan ikut diperhitungkan. Semua kamar dihitung sekaligus
+sebagai matriks NumPy (kamar x bulan); jumlah query database tetap, tidak
+bergantung pada jumlah kamar.
+
+Jalankan `python forecasting.py [bulan] [lookback]` untuk mencetak proyeksi
+semua properti beserta waktu hitungnya.
+"""
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import select
+
+from app import app, db
+from models import Property, Room, RoomRate, OccupancyRecord, ordinal_to_month
+from room_rates import rates_for
+
+DEFAULT_MONTHS = 6
+MAX_MONTHS = 36
+DEFAULT_LOOKBACK = 12
+MAX_LOOKBACK = 60
+
+COMPONENTS = ('prepaid', 'contracted', 'projected', 'total')
+
+
+def _coverage_matrix(room_index, starts, ends, first, width, n_rooms):
+    """
+    Matriks boolean (kamar x bulan) dari rentang cakupan [start, end] per catatan,
+    dibangun dengan array selisih lalu cumsum (tanpa loop per catatan)
+    """
+    diff = np.zeros((n_rooms, width + 1), dtype=np.int32)
+    if len(room_index):
+        start = np.clip(starts - first, 0, width)
+        stop = np.clip(ends - first + 1, 0, width)
+        valid = start < stop
+        np.add.at(diff, (room_index[valid], start[valid]), 1)
+        np.add.at(diff, (room_index[valid], stop[valid]), -1)
+    return np.cumsum(diff[:, :width], axis=1) > 0
+
+
+def _rate_matrix(room_ids, start, months):
+    """
+    Tarif kamar (kamar x bulan) mulai bulan start, termasuk perubahan tarif terjadwal
+    """
+    base = rates_for((room_id, start) for room_id in room_ids)
+    rates = np.repeat(
+        np.array([base.get((room_id, start), 0) for room_id in room_ids], dtype=np.float64)[:, None],
+        months, axis=1
+    )
+    position = {room_id: i for i, room_id in enumerate(room_ids)}
+    changes = db.session.execute(
+        select(RoomRate.room_id, RoomRate.effective_from, RoomRate.rate)
+        .where(RoomRate.room_id.in_(room_ids),
+               RoomRate.effective_from > start,
+               RoomRate.effective_from < start + months)
+        .order_by(RoomRate.effective_from, RoomRate.id)
+    ).all()
+    for room_id, effective_from, rate in changes:
+        rates[position[room_id], effective_from - start:] = rate
+    return rates
+
+
+def forecast_revenue(property_ids, months=DEFAULT_MONTHS, lookback=DEFAULT_LOOKBACK, start=None):
+    """
+    Proyeksi pendapatan sewa per properti untuk `months` bulan mulai bulan
+    `start` (nomor urut bulan, bawaan bulan ini)
+    """
+    months = max(1, min(int(months), MAX_MONTHS))
+    lookback = max(1, min(int(lookback), MAX_LOOKBACK))
+    if start is None:
+        today = datetime.now()
+        start = today.year * 12 + today.month - 1
+    month_labels = [ordinal_to_month(start + i) for i in range(months)]
+
+    room_rows = db.session.execute(
+        select(Room.id, Room.property_id, Room.room_type)
+        .where(Room.property_id.in_(property_ids)).order_by(Room.id)
+    ).all() if property_ids else []
+    property_names = dict(db.session.execute(
+        select(Property.id, Property.name).where(Property.id.in_(property_ids))
+    ).all()) if property_ids else {}
+
+    empty = {component: 0 for component in COMPONENTS}
+    if not room_rows:
+        return {
+            'start': month_labels[0],
+            'months': month_labels,
+            'lookback': lookback,
+            'properties': [],
+            'totals': {'months': [dict(empty, month=label) for label in month_labels], **empty}
+        }
+
+    room_ids = [row[0] for row in room_rows]
+    n_rooms = len(room_ids)
+    room_position = {room_id: i for i, room_id in enumerate(room_ids)}
+
+    # Kelompok (properti, tipe kamar) dan indeks properti untuk setiap kamar
+    group_keys = sorted({(property_id, room_type) for _, property_id, room_type in room_rows})
+    group_position = {key: i for i, key in enumerate(group_keys)}
+    group_index = np.array([group_position[(property_id, room_type)] for _, property_id, room_type in room_rows])
+    result_property_ids = sorted({property_id for _, property_id, _ in room_rows})
+    property_position = {property_id: i for i, property_id in enumerate(result_property_ids)}
+    property_index = np.array([property_position[property_id] for _, property_id, _ in room_rows])
+
+    # Cakupan hunian dari awal lookback sampai akhir proyeksi
+    first = start - lookback
+    width = lookback + months
+    records = db.session.execute(
+        select(OccupancyRecord.room_id, OccupancyRecord.coverage_start,
+               OccupancyRecord.coverage_end, OccupancyRecord.payment_status)
+        .join(Room, OccupancyRecord.room_id == Room.id)
+        .where(Room.property_id.in_(property_ids),
+               OccupancyRecord.is_occupied == True,
+               OccupancyRecord.coverage_end >= first,
+               OccupancyRecord.coverage_start < start + months)
+    ).all()
+    record_rooms = np.array([room_position[row[0]] for row in records], dtype=np.int64)
+    starts = np.array([row[1] for row in records], dtype=np.int64)
+    ends = np.array([row[2] for row in records], dtype=np.int64)
+    is_paid = np.array([row[3] == 'paid' for row in records], dtype=bool)
+
+    occupied = _coverage_matrix(record_rooms, starts, ends, first, width, n_rooms)
+    paid = _coverage_matrix(record_rooms[is_paid], starts[is_paid], ends[is_paid], first, width, n_rooms)
+
+    # Tingkat hunian historis per (properti, tipe kamar)
+    occupied_months = np.bincount(group_index, weights=occupied[:, :lookback].sum(axis=1), minlength=len(group_keys))
+    room_months = np.bincount(group_index, minlength=len(group_keys)) * lookback
+    occupancy_rates = occupied_months / room_months
+
+    rates = _rate_matrix(room_ids, start, months)
+    covered = occupied[:, lookback:]
+    paid_future = paid[:, lookback:]
+    components = {
+        'prepaid': rates * paid_future,
+        'contracted': rates * (covered & ~paid_future),
+        'projected': rates * ~covered * occupancy_rates[group_index][:, None],
+    }
+    components['total'] = components['prepaid'] + components['contracted'] + components['projected']
+
+    # Jumlahkan per properti: (properti x bulan)
+    per_property = {}
+    for component, values in components.items():
+        summed = np.zeros((len(result_property_ids), months))
+        np.add.at(summed, property_index, values)
+        per_property[component] = np.rint(summed).astype(np.int64)
+
+    properties = []
+    for i, property_id in enumerate(result_property_ids):
+        properties.append({
+            'property_id': property_id,
+            'property_name': property_names.get(property_id),
+            'rooms': int(np.count_nonzero(property_index == i)),
+            'occupancy_rates': {
+                room_type: round(float(occupancy_rates[group_position[(key_property, room_type)]]) * 100, 1)
+                for key_property, room_type in group_keys if key_property == property_id
+            },
+            'months': [
+                dict({component: int(per_property[component][i, t]) for component in COMPONENTS}, month=label)
+                for t, label in enumerate(month_labels)
+            ],
+            **{component: int(per_property[component][i].sum()) for component in COMPONENTS}
+        })
+    properties.sort(key=lambda item: item['property_name'] or '')
+
+    totals = {component: int(per_property[component].sum()) for component in COMPONENTS}
+    totals['months'] = [
+        dict({component: int(per_property[component][:, t].sum()) for component in COMPONENTS}, month=label)
+        for t, label in enumerate(month_labels)
+    ]
+    return {
+        'start': month_labels[0],
+        'months': month_labels,
+        'lookback': lookback,
+        'properties': properties,
+        'totals': totals
+    }
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    months = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_MONTHS
+    lookback = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_LOOKBACK
+    with app.app_context():
+        property_ids = [prop.id for prop in Property.query.all()]
+        started = time.perf_counter()
+        forecast = forecast_revenue(property_ids, months, lookback)
+        elapsed = time.perf_counter() - started
+        for item in forecast['properties']:
+            print(f"{item['property_name']:<20} {item['rooms']:>5} kamar  Rp {item['total']:>15,}")
+        print(f"{'Total':<20} {'':>11}  Rp {forecast['totals']['total']:>15,}")
+        print(f"{months} bulan mulai {forecast['start']}, dihitung dalam {elapsed * 1000:.1f} ms")
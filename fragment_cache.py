@@ -0,0 +1,42 @@
+"""
+Cache potongan template (fragment) untuk halaman yang berat.
+
+Di template:
+
+    {% cache 'payment-status', property.id, selected_month, data_version %}
+        ... tabel yang mahal dirender ...
+    {% endcache %}
+
+Semua argumen setelah tag menjadi kunci cache. Sertakan versi data
+(data_version.version_token) di dalam kunci sehingga potongan otomatis
+dirender ulang ketika data properti berubah; entri lama tersingkir oleh LRU/TTL.
+Potongan disimpan di cache bersama (cache_backend), jadi satu render dapat
+dipakai oleh semua worker jika CACHE_BACKEND bersama.
+"""
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+from app import app
+from cache_backend import cache
+
+
+class FragmentCacheExtension(Extension):
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key_parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key_parts.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_render_cached', [nodes.List(key_parts)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _render_cached(self, key_parts, caller):
+        if not app.config['FRAGMENT_CACHE']:
+            return caller()
+        return cache.get_or_set('fragment:' + repr(tuple(key_parts)), caller)
+
+
+app.jinja_env.add_extension(FragmentCacheExtension)
@@ -0,0 +1,119 @@
+import os
+import time
+import bisect
+import logging
+import threading
+from datetime import timedelta
+
+from sqlalchemy import event
+
+from app import db
+from models import NationalHoliday
+from calendar_service import month_range
+
+# Indeks hari libur di memori: daftar tanggal terurut + nama per tanggal
+_holiday_dates = []
+_holiday_names = {}
+_loaded = False
+_loaded_at = 0.0
+_stale = False
+_index_lock = threading.Lock()
+
+# Set HOLIDAY_CACHE=false untuk selalu membaca langsung dari database
+HOLIDAY_CACHE_ENABLED = os.environ.get('HOLIDAY_CACHE', 'true').lower() not in ('0', 'false', 'no')
+# Umur maksimum indeks (detik). Perubahan di worker ini langsung terlihat (event
+# mapper); perubahan dari worker lain atau dari luar aplikasi terlihat setelah TTL ini
+HOLIDAY_CACHE_TTL = int(os.environ.get('HOLIDAY_CACHE_TTL', 300))
+
+
+def reload_holidays():
+    """
+    Memuat ulang seluruh hari libur nasional dari database ke indeks memori.
+    Panggil setelah data hari libur diubah di luar aplikasi ini.
+    """
+    global _holiday_dates, _holiday_names, _loaded, _loaded_at, _stale
+    rows = db.session.query(NationalHoliday.date, NationalHoliday.name).order_by(NationalHoliday.date).all()
+    with _index_lock:
+        _holiday_dates = [row.date for row in rows]
+        _holiday_names = {row.date: row.name for row in rows}
+        _loaded = True
+        _loaded_at = time.monotonic()
+        _stale = False
+    logging.info(f"Indeks hari libur dimuat: {len(rows)} tanggal")
+
+
+def _ensure_loaded():
+    if not _loaded or _stale or time.monotonic() - _loaded_at > HOLIDAY_CACHE_TTL:
+        reload_holidays()
+
+
+def _query_between(start_date, end_date):
+    # Filter rentang tanggal langsung pada kolom date agar indeks unik bisa dipakai
+    rows = db.session.query(NationalHoliday.date, NationalHoliday.name).filter(
+        NationalHoliday.date >= start_date,
+        NationalHoliday.date < end_date
+    ).order_by(NationalHoliday.date).all()
+    return [(row.date, row.name) for row in rows]
+
+
+def holidays_between(start_date, end_date):
+    """
+    Mendapatkan daftar (tanggal, nama) hari libur dalam rentang [start_date, end_date)
+    """
+    if not HOLIDAY_CACHE_ENABLED:
+        return _query_between(start_date, end_date)
+
+    _ensure_loaded()
+    with _index_lock:
+        lo = bisect.bisect_left(_holiday_dates, start_date)
+        hi = bisect.bisect_left(_holiday_dates, end_date)
+        return [(d, _holiday_names[d]) for d in _holiday_dates[lo:hi]]
+
+
+def holidays_in_month(year, month):
+    """
+    Mendapatkan hari libur dalam satu bulan dalam bentuk {hari: nama}
+    """
+    start_date, end_date = month_range(year, month)
+    return {d.day: name for d, name in holidays_between(start_date, end_date)}
+
+
+def is_holiday(day_date):
+    return bool(holidays_between(day_date, day_date + timedelta(days=1)))
+
+
+def is_business_day(day_date):
+    """
+    Hari kerja adalah Senin-Jumat yang bukan hari libur nasional
+    """
+    return day_date.weekday() < 5 and not is_holiday(day_date)
+
+
+def next_business_day(day_date):
+    """
+    Mendapatkan hari kerja pertama pada atau setelah tanggal yang diberikan
+    """
+    while not is_business_day(day_date):
+        day_date += timedelta(days=1)
+    return day_date
+
+
+def add_business_days(day_date, days):
+    """
+    Menambahkan sejumlah hari kerja ke tanggal yang diberikan
+    """
+    while days > 0:
+        day_date += timedelta(days=1)
+        if is_business_day(day_date):
+            days -= 1
+    return day_date
+
+
+def _mark_stale(mapper, connection, target):
+    # Indeks akan dimuat ulang pada pencarian berikutnya
+    global _stale
+    _stale = True
+
+
+for _event_name in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(NationalHoliday, _event_name, _mark_stale)
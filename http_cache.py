@@ -0,0 +1,84 @@
+"""
+HTTP caching (ETag + conditional GET) untuk halaman baca yang berat.
+
+ETag dihitung dari versi data properti yang ditampilkan (data_version), URL
+lengkap, pengguna dan tanggal hari ini. Jika browser mengirim If-None-Match
+yang sama, request dijawab 304 Not Modified sebelum view dijalankan, sehingga
+query database dan pengiriman isi halaman dilewati.
+
+Halaman berisi data pengguna (nama di navbar, properti yang boleh diakses),
+karena itu Cache-Control memakai 'private, no-cache': browser menyimpan salinan
+tetapi selalu memvalidasi ulang dengan ETag.
+"""
+import os
+import glob
+import hashlib
+from datetime import date
+from functools import wraps
+
+from flask import request, session, make_response
+from flask_login import current_user
+
+from app import app
+from auth_helpers import get_user_properties
+from data_version import version_token
+
+
+def _deploy_token():
+    # Berubah setiap kali kode atau template diperbarui, agar ETag lama tidak berlaku setelah deploy
+    patterns = ['*.py', 'templates/**/*.html', 'static/js/*.js', 'static/css/*.css']
+    latest = 0
+    for pattern in patterns:
+        for path in glob.glob(os.path.join(app.root_path, pattern), recursive=True):
+            latest = max(latest, os.path.getmtime(path))
+    return str(int(latest))
+
+
+DEPLOY_TOKEN = _deploy_token()
+
+
+def compute_etag(property_ids):
+    parts = [
+        DEPLOY_TOKEN,
+        request.full_path,
+        str(current_user.get_id()),
+        current_user.role,
+        version_token(property_ids),
+        date.today().isoformat(),
+    ]
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def etag_cached(property_ids_for=None):
+    """
+    Decorator untuk view GET yang hanya bergantung pada data properti.
+    property_ids_for(**view_args) menentukan properti yang datanya ditampilkan;
+    bawaan: semua properti yang dapat diakses pengguna.
+    Dipasang di bawah @login_required.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            # Pesan flash yang belum ditampilkan harus dirender, jadi jangan jawab 304
+            if request.method != 'GET' or session.get('_flashes'):
+                return view(*args, **kwargs)
+
+            if property_ids_for:
+                property_ids = property_ids_for(**kwargs)
+            else:
+                property_ids = [prop.id for prop in get_user_properties()]
+            etag = compute_etag(property_ids)
+
+            # Perbandingan lemah: respons yang dikompresi membawa ETag lemah (W/"...")
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapped
+    return decorator
@@ -11,21 +11,45 @@ with app.app_context():
     # Import models
     import models  # noqa: F401
     
+    # Penghitung statistik pool koneksi (lihat /api/db_stats)
+    from database import register_pool_metrics
+    register_pool_metrics(db)
+    
     # Create tables
     db.create_all()
     logging.info("Database tables created")
     
+    # Tambahkan kolom/indeks baru pada tabel lama
+    from migrations import run_migrations
+    run_migrations()
+
+    
+    # Buat indeks pencarian teks penuh jika belum ada
+    from search import ensure_search_index
+    ensure_search_index()
+    
     # Import routes (setelah app dan db sudah siap)
     import routes  # noqa: F401
     import pdf_routes  # noqa: F401
+    import export_routes  # noqa: F401
+    import api_v1  # noqa: F401
+    import profiler  # noqa: F401
+    import compression  # noqa: F401
+    import static_assets  # noqa: F401
     
     # Import data initialization functions
     from routes import create_initial_data, initialize_rooms
+    from holiday_service import reload_holidays
+    from receivables import backfill_receivables
+    from report_archive import start_report_scheduler
     
     # Initialize data
     try:
         create_initial_data()
         initialize_rooms()
+        reload_holidays()
+        backfill_receivables()
+        start_report_scheduler()
     except Exception as e:
         logging.error(f"Error initializing data: {e}")
 
@@ -0,0 +1,189 @@
+"""
+Migrasi skema sederhana untuk database yang sudah ada.
+
+db.create_all() hanya membuat tabel baru, tidak menambahkan kolom atau indeks
+baru pada tabel lama. Fungsi di sini menambahkan kolom/indeks yang belum ada
+dan mengisi nilai kolom turunan untuk data lama. Aman dijalankan berulang kali.
+"""
+import re
+import logging
+
+from sqlalchemy import inspect, text
+
+from app import app, db
+from models import Room, OccupancyRecord, FinancialRecord, Tenant, month_to_ordinal, normalize_tenant_name
+from rooms import deduplicate_room_numbers
+
+
+def add_missing_columns():
+    """
+    Menambahkan kolom model yang belum ada di tabel database (selalu nullable)
+    """
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                logging.info(f"Kolom {table.name}.{column.name} ditambahkan")
+
+
+def widen_room_numbers():
+    """
+    Memperlebar rooms.number menjadi VARCHAR(20) di MySQL (nomor kamar otomatis
+    seperti 'ANT-Sta-100' lebih dari 10 karakter; SQLite tidak membatasi panjang)
+    """
+    if db.engine.dialect.name != 'mysql':
+        return
+    column = next(column for column in inspect(db.engine).get_columns('rooms') if column['name'] == 'number')
+    if (getattr(column['type'], 'length', None) or 20) < 20:
+        with db.engine.begin() as connection:
+            connection.execute(text('ALTER TABLE rooms MODIFY number VARCHAR(20) NOT NULL'))
+        logging.info("Kolom rooms.number diperlebar menjadi VARCHAR(20)")
+
+
+def create_missing_indexes():
+    """
+    Membuat indeks yang didefinisikan di model tetapi belum ada di database
+    """
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+
+def backfill_occupancy_coverage():
+    """
+    Mengisi rentang cakupan bulan untuk catatan hunian lama
+    """
+    rows = db.session.query(
+        OccupancyRecord.id, OccupancyRecord.month, OccupancyRecord.payment_months
+    ).filter(OccupancyRecord.coverage_start.is_(None)).all()
+    if not rows:
+        return 0
+
+    updates = []
+    for record_id, month, payment_months in rows:
+        try:
+            start = month_to_ordinal(month)
+        except (ValueError, AttributeError):
+            # Bulan kosong/tidak valid dari data lama: dilewati agar aplikasi tetap bisa berjalan
+            logging.warning(f"Catatan hunian {record_id} dilewati: bulan tidak valid ({month!r})")
+            continue
+        updates.append({
+            'id': record_id,
+            'coverage_start': start,
+            'coverage_end': start + max(payment_months or 1, 1) - 1
+        })
+    if not updates:
+        return 0
+    db.session.bulk_update_mappings(OccupancyRecord, updates)
+    db.session.commit()
+    logging.info(f"Cakupan bulan diisi untuk {len(updates)} catatan hunian")
+    return len(updates)
+
+
+def backfill_tenants():
+    """
+    Membuat data penyewa dari nama penyewa di catatan hunian lama.
+    Nama yang sama (tanpa membedakan huruf besar/kecil dan spasi) digabung menjadi satu penyewa.
+    """
+    rows = db.session.query(OccupancyRecord.id, OccupancyRecord.tenant_name).filter(
+        OccupancyRecord.tenant_id.is_(None),
+        OccupancyRecord.tenant_name.isnot(None)
+    ).order_by(OccupancyRecord.id.desc()).all()
+    if not rows:
+        return 0
+
+    tenant_ids = dict(db.session.query(Tenant.normalized_name, Tenant.id).all())
+    updates = []
+    for record_id, tenant_name in rows:
+        normalized_name = normalize_tenant_name(tenant_name)
+        if not normalized_name:
+            continue
+        if normalized_name not in tenant_ids:
+            # Ejaan dari catatan terbaru dipakai sebagai nama penyewa
+            tenant = Tenant(name=' '.join(tenant_name.split()), normalized_name=normalized_name)
+            db.session.add(tenant)
+            db.session.flush()
+            tenant_ids[normalized_name] = tenant.id
+        updates.append({'id': record_id, 'tenant_id': tenant_ids[normalized_name]})
+
+    if updates:
+        db.session.bulk_update_mappings(OccupancyRecord, updates)
+    db.session.commit()
+    logging.info(f"Penyewa dihubungkan ke {len(updates)} catatan hunian")
+    return len(updates)
+
+
+def backfill_room_versions():
+    """
+    Mengisi versi awal kamar lama (kolom version ditambahkan sebagai nullable)
+    """
+    # Cek dulu dengan SELECT: UPDATE tanpa baris pun membuka transaksi tulis di setiap start
+    if Room.query.filter(Room.version.is_(None)).first() is None:
+        return 0
+    updated = Room.query.filter(Room.version.is_(None)).update({'version': 1}, synchronize_session=False)
+    db.session.commit()
+    logging.info(f"Versi awal diisi untuk {updated} kamar")
+    return updated
+
+
+def backfill_payment_links():
+    """
+    Menautkan pemasukan sewa lama yang dibuat create_financial_records.py
+    (deskripsi berisi 'occupancy_id=N') ke catatan hunian
+    """
+    rows = db.session.query(FinancialRecord.id, FinancialRecord.description).filter(
+        FinancialRecord.occupancy_id.is_(None),
+        FinancialRecord.description.like('%occupancy_id=%')
+    ).order_by(FinancialRecord.id).all()
+    if not rows:
+        return 0
+
+    linked = {occupancy_id for (occupancy_id,) in db.session.query(FinancialRecord.occupancy_id).filter(
+        FinancialRecord.occupancy_id.isnot(None)
+    )}
+    existing = {occupancy_id for (occupancy_id,) in db.session.query(OccupancyRecord.id)}
+    updates = []
+    for record_id, description in rows:
+        match = re.search(r'occupancy_id=(\d+)', description)
+        occupancy_id = int(match.group(1)) if match else None
+        if occupancy_id in existing and occupancy_id not in linked:
+            linked.add(occupancy_id)
+            updates.append({'id': record_id, 'occupancy_id': occupancy_id})
+
+    if updates:
+        db.session.bulk_update_mappings(FinancialRecord, updates)
+    db.session.commit()
+    logging.info(f"{len(updates)} pemasukan sewa ditautkan ke catatan hunian")
+    return len(updates)
+
+
+def run_migrations():
+    add_missing_columns()
+    widen_room_numbers()
+    # Indeks unik (property_id, number) gagal dibuat jika masih ada nomor ganda
+    renamed = deduplicate_room_numbers()
+    if renamed:
+        logging.warning(f"{renamed} kamar dengan nomor ganda diberi nomor baru")
+    create_missing_indexes()
+    backfill_occupancy_coverage()
+    backfill_tenants()
+    backfill_room_versions()
+    backfill_payment_links()
+    # Tutup transaksi baca yang masih terbuka (backfill tanpa data tidak commit);
+    # pada SQLite WAL snapshot lama ini tidak bisa dipakai menulis setelah koneksi lain menulis
+    db.session.commit()
+
+
+if __name__ == '__main__':
+    with app.app_context():
+        db.create_all()
+        run_migrations()
+        print('Migrasi selesai')
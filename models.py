@@ -1,8 +1,33 @@
 from datetime import datetime
+from itertools import chain
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects import mysql, postgresql, sqlite
 from app import db
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 
+def month_to_ordinal(month):
+    """Mengubah bulan 'YYYY-MM' menjadi nomor urut bulan (tahun * 12 + bulan - 1)"""
+    year, month_num = month.split('-')
+    year, month_num = int(year), int(month_num)
+    if not 1 <= month_num <= 12:
+        raise ValueError(f"Bulan tidak valid: {month}")
+    return year * 12 + month_num - 1
+
+def normalize_tenant_name(name):
+    """Menormalkan nama penyewa (huruf kecil, spasi tunggal) untuk pencarian dan deduplikasi"""
+    return ' '.join((name or '').split()).lower()
+
+def date_to_ordinal(value):
+    """Mendapatkan nomor urut bulan dari objek date/datetime"""
+    return value.year * 12 + value.month - 1
+
+def ordinal_to_month(ordinal):
+    """Mengubah nomor urut bulan kembali ke format 'YYYY-MM'"""
+    year, month_index = divmod(ordinal, 12)
+    return f"{year}-{str(month_index + 1).zfill(2)}"
+
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
     id = db.Column(db.Integer, primary_key=True)
@@ -46,13 +71,43 @@ class Property(db.Model):
 class Room(db.Model):
     __tablename__ = 'rooms'
     id = db.Column(db.Integer, primary_key=True)
-    number = db.Column(db.String(10), nullable=False)
+    number = db.Column(db.String(20), nullable=False)
     property_id = db.Column(db.Integer, db.ForeignKey('properties.id'), nullable=False)
     room_type = db.Column(db.String(50), nullable=False)  # Standard, Deluxe, Executive, Studio, etc.
     monthly_rate = db.Column(db.Integer, default=0)
     status = db.Column(db.String(20), default='available')  # available, occupied, maintenance, etc.
+    # Naik setiap kali tarif diubah; perubahan tarif ditolak jika versi yang dikirim sudah usang
+    version = db.Column(db.Integer, nullable=False, default=1)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     occupancy_records = db.relationship('OccupancyRecord', backref='room', lazy='dynamic')
+    
+    __table_args__ = (
+        # Nomor kamar unik per properti; juga dipakai untuk mencari kamar berdasarkan nomor
+        db.Index('uq_rooms_property_number', 'property_id', 'number', unique=True),
+    )
+
+class RoomNumberSequence(db.Model):
+    """Nomor urut berikutnya untuk kamar baru per properti dan awalan nomor (mis. 'ANT-Sta')"""
+    __tablename__ = 'room_number_sequences'
+    property_id = db.Column(db.Integer, db.ForeignKey('properties.id'), primary_key=True)
+    prefix = db.Column(db.String(20), primary_key=True)
+    next_value = db.Column(db.Integer, nullable=False, default=1)
+
+class RoomRate(db.Model):
+    """Riwayat tarif kamar: tarif baru berlaku mulai bulan effective_from (nomor urut bulan)"""
+    __tablename__ = 'room_rates'
+    id = db.Column(db.Integer, primary_key=True)
+    room_id = db.Column(db.Integer, db.ForeignKey('rooms.id'), nullable=False)
+    rate = db.Column(db.Integer, nullable=False)
+    previous_rate = db.Column(db.Integer)
+    effective_from = db.Column(db.Integer, nullable=False)
+    changed_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    room = db.relationship('Room', backref=db.backref('rate_history', lazy='dynamic'))
+    
+    __table_args__ = (
+        db.Index('idx_room_rates_room_effective', 'room_id', 'effective_from'),
+    )
 
 class OccupancyRecord(db.Model):
     __tablename__ = 'occupancy_records'
@@ -61,6 +116,7 @@ class OccupancyRecord(db.Model):
     month = db.Column(db.String(7), nullable=False)  # YYYY-MM format
     is_occupied = db.Column(db.Boolean, default=True)
     tenant_name = db.Column(db.String(100))
+    tenant_id = db.Column(db.Integer, db.ForeignKey('tenants.id'), index=True)
     payment_status = db.Column(db.String(20), default='unpaid')  # 'paid', 'unpaid', 'late'
     payment_date = db.Column(db.Date, nullable=True)  # Tanggal pembayaran
     payment_due_date = db.Column(db.Date, nullable=True)  # Tanggal jatuh tempo
@@ -68,35 +124,66 @@ class OccupancyRecord(db.Model):
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     created_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    # Rentang bulan yang dicakup catatan ini (nomor urut bulan), diisi otomatis saat disimpan
+    coverage_start = db.Column(db.Integer)
+    coverage_end = db.Column(db.Integer)
+    
+    # Bulan catatan sebagai nomor urut bulan, dipakai untuk filter rentang dan pengurutan.
+    # Kolom month (YYYY-MM) tetap disimpan untuk kompatibilitas tampilan dan data lama.
+    month_ordinal = db.synonym('coverage_start')
+    
+    __table_args__ = (
+        db.Index('idx_occupancy_coverage', 'room_id', 'coverage_start', 'coverage_end'),
+        db.Index('idx_occupancy_month_ordinal', 'coverage_start'),
+    )
+    
+    def update_coverage(self):
+        """Menghitung ulang rentang bulan yang dicakup berdasarkan month dan payment_months"""
+        try:
+            self.coverage_start = month_to_ordinal(self.month)
+        except (ValueError, AttributeError):
+            # Data lama dengan bulan tidak valid: tanpa cakupan, tetapi tetap bisa disimpan
+            self.coverage_start = self.coverage_end = None
+            return
+        self.coverage_end = self.coverage_start + max(self.payment_months or 1, 1) - 1
     
     def is_late(self):
-        """Mengecek apakah pembayaran terlambat"""
-        if self.payment_status == 'paid':
-            return False
-        if not self.payment_due_date:
-            return False
-        return self.payment_due_date < datetime.now().date()
+        """Mengecek apakah pembayaran terlambat (memperhitungkan akhir pekan dan hari libur)"""
+        from due_dates import evaluate_late_payments
+        return self.id in evaluate_late_payments([self])
         
     def get_paid_until(self):
         """Mendapatkan bulan terakhir yang sudah dibayar"""
         if self.payment_status != 'paid' or not self.payment_date:
             return None
-            
-        # Parse bulan saat ini
-        year, month = map(int, self.month.split('-'))
-        
-        # Tambahkan jumlah bulan yang dibayar
-        month = month + (self.payment_months - 1)
         
-        # Atur ulang bulan dan tahun jika bulan > 12
-        if month > 12:
-            year += month // 12
-            month = month % 12
-            if month == 0:  # Jika hasil modulo 0, artinya bulan Desember
-                month = 12
-                year -= 1
-                
-        return f"{year}-{str(month).zfill(2)}"
+        coverage_end = self.coverage_end
+        if coverage_end is None:
+            coverage_end = month_to_ordinal(self.month) + max(self.payment_months or 1, 1) - 1
+        return ordinal_to_month(coverage_end)
+
+@event.listens_for(OccupancyRecord, 'before_insert')
+@event.listens_for(OccupancyRecord, 'before_update')
+def _set_occupancy_coverage(mapper, connection, target):
+    target.update_coverage()
+
+class Tenant(db.Model):
+    __tablename__ = 'tenants'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    normalized_name = db.Column(db.String(100), nullable=False, unique=True)  # Untuk pencarian berbasis indeks
+    phone = db.Column(db.String(30))
+    email = db.Column(db.String(120))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    occupancy_records = db.relationship('OccupancyRecord', backref='tenant', lazy='dynamic')
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'phone': self.phone or '',
+            'email': self.email or ''
+        }
 
 class FinancialRecord(db.Model):
     __tablename__ = 'financial_records'
@@ -109,6 +196,8 @@ class FinancialRecord(db.Model):
     description = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     created_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    # Catatan hunian yang pembayaran sewanya dicatat otomatis (paling banyak satu per hunian)
+    occupancy_id = db.Column(db.Integer, db.ForeignKey('occupancy_records.id'), unique=True, index=True)
     
     property = db.relationship('Property', backref='financial_records')
     user = db.relationship('User', backref='financial_records')
@@ -125,9 +214,130 @@ class FinancialRecord(db.Model):
             'description': self.description or ''
         }
 
+class PaymentRequest(db.Model):
+    """Kunci idempotensi form/permintaan pembayaran yang sudah diproses"""
+    __tablename__ = 'payment_requests'
+    id = db.Column(db.Integer, primary_key=True)
+    idempotency_key = db.Column(db.String(64), nullable=False, unique=True)
+    action = db.Column(db.String(30))  # input_occupancy atau update_payment
+    occupancy_id = db.Column(db.Integer)
+    financial_record_id = db.Column(db.Integer)
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class NationalHoliday(db.Model):
     __tablename__ = 'national_holidays'
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.Date, nullable=False, unique=True)
     name = db.Column(db.String(100), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class Receivable(db.Model):
+    """Piutang sewa per catatan hunian, diperbarui setiap kali hunian/pembayaran berubah"""
+    __tablename__ = 'receivables'
+    id = db.Column(db.Integer, primary_key=True)
+    occupancy_id = db.Column(db.Integer, db.ForeignKey('occupancy_records.id'), nullable=False, unique=True)
+    property_id = db.Column(db.Integer, db.ForeignKey('properties.id'), nullable=False)
+    room_id = db.Column(db.Integer, db.ForeignKey('rooms.id'), nullable=False, index=True)
+    tenant_name = db.Column(db.String(100))
+    month = db.Column(db.String(7), nullable=False)  # YYYY-MM format
+    due_date = db.Column(db.Date, nullable=False)
+    amount_due = db.Column(db.Integer, nullable=False, default=0)
+    amount_paid = db.Column(db.Integer, nullable=False, default=0)
+    outstanding = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('idx_receivables_property_outstanding', 'property_id', 'outstanding', 'due_date'),
+    )
+
+class ReportArchive(db.Model):
+    """Laporan PDF yang sudah dibuat terjadwal; file disimpan di REPORT_ARCHIVE_DIR"""
+    __tablename__ = 'report_archives'
+    id = db.Column(db.Integer, primary_key=True)
+    report_type = db.Column(db.String(30), nullable=False)  # 'room_stats' atau 'financial_stats'
+    property_id = db.Column(db.Integer, nullable=False, default=0)  # 0 = semua properti
+    period = db.Column(db.String(7), nullable=False)  # YYYY-MM atau YYYY
+    filename = db.Column(db.String(255), nullable=False)
+    size = db.Column(db.Integer, nullable=False, default=0)
+    generated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('report_type', 'property_id', 'period', name='uq_report_archives_report'),
+    )
+
+class DataVersion(db.Model):
+    """Nomor versi data per properti, naik setiap kali kamar, hunian, keuangan properti atau hari libur berubah"""
+    __tablename__ = 'data_versions'
+    property_id = db.Column(db.Integer, db.ForeignKey('properties.id'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+def _changed_values(obj, field):
+    # Nilai sekarang dan nilai lama (jika berubah) dari sebuah atribut
+    values = {getattr(obj, field)}
+    values.update(inspect(obj).attrs[field].history.deleted or ())
+    return {value for value in values if value is not None}
+
+def bump_data_versions(connection, property_ids):
+    """
+    Menaikkan versi data properti di dalam transaksi yang sedang berjalan.
+    Baris yang belum ada dibuat dengan upsert satu pernyataan, sehingga dua
+    transaksi yang bersamaan tidak bertabrakan di primary key (yang di MySQL
+    akan membatalkan perubahan pengguna).
+    """
+    property_ids = {int(property_id) for property_id in property_ids}
+    if not property_ids:
+        return
+    table = DataVersion.__table__
+    now = datetime.utcnow()
+    rows = [{'property_id': property_id, 'version': 1, 'updated_at': now} for property_id in sorted(property_ids)]
+    dialect = connection.dialect.name
+    if dialect == 'mysql':
+        stmt = mysql.insert(table)
+        stmt = stmt.on_duplicate_key_update(version=table.c.version + 1, updated_at=stmt.inserted.updated_at)
+    elif dialect in ('sqlite', 'postgresql'):
+        stmt = (sqlite if dialect == 'sqlite' else postgresql).insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.property_id],
+            set_={'version': table.c.version + 1, 'updated_at': stmt.excluded.updated_at},
+        )
+    else:
+        connection.execute(
+            table.update().where(table.c.property_id.in_(property_ids))
+            .values(version=table.c.version + 1, updated_at=now)
+        )
+        existing = set(connection.execute(
+            db.select(table.c.property_id).where(table.c.property_id.in_(property_ids))
+        ).scalars())
+        rows = [row for row in rows if row['property_id'] not in existing]
+        if not rows:
+            return
+        stmt = table.insert()
+    connection.execute(stmt, rows)
+
+@event.listens_for(Session, 'after_flush')
+def _bump_versions_after_flush(session, flush_context):
+    property_ids = set()
+    room_ids = set()
+    holidays_changed = False
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+            continue
+        if isinstance(obj, (FinancialRecord, Room)):
+            property_ids |= _changed_values(obj, 'property_id')
+        elif isinstance(obj, OccupancyRecord):
+            room_ids |= _changed_values(obj, 'room_id')
+        elif isinstance(obj, NationalHoliday):
+            holidays_changed = True
+    
+    connection = session.connection()
+    if holidays_changed:
+        # Hari libur menggeser jatuh tempo efektif (status terlambat) di semua properti
+        property_ids |= set(connection.execute(db.select(Property.id)).scalars())
+    if room_ids:
+        property_ids |= set(connection.execute(
+            db.select(Room.property_id).where(Room.id.in_(room_ids))
+        ).scalars())
+    bump_data_versions(connection, property_ids)
+
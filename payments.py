@@ -0,0 +1,165 @@
+"""
+Pencatatan pembayaran sewa.
+
+Dipakai oleh input_occupancy (hunian baru) dan update_payment_status agar
+aturan pembukuannya sama:
+
+- Hunian berstatus paid memiliki paling banyak satu catatan pemasukan
+  otomatis (FinancialRecord.occupancy_id, unik). Perubahan jumlah bulan atau
+  tanggal bayar memperbarui catatan itu, bukan menambah catatan baru; status
+  yang dikembalikan ke belum bayar menghapusnya.
+- Jumlah dihitung dari tarif yang berlaku di bulan hunian (room_rates).
+- Setiap form membawa kunci idempotensi. Kunci yang sudah diproses tidak
+  diproses lagi, sehingga klik ganda atau kiriman ulang tidak mencatat
+  pembayaran dua kali. Kunci terikat pada pengguna, aksi dan hunian yang
+  memakainya; kunci yang sama untuk data lain ditolak (422).
+- Baris hunian dikunci selama transaksi (SELECT ... FOR UPDATE di MySQL; di
+  SQLite request POST sudah memakai BEGIN IMMEDIATE, lihat database.py),
+  dan perubahan hunian, pemasukan dan piutang di-commit bersama.
+
+Jalankan `python benchmark_payments.py` untuk uji kiriman bersamaan.
+"""
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from models import Room, OccupancyRecord, FinancialRecord, PaymentRequest
+from receivables import sync_receivable
+from room_rates import rate_for
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+ACTION_NEW_OCCUPANCY = 'input_occupancy'
+ACTION_UPDATE_PAYMENT = 'update_payment'
+
+
+class PaymentError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def idempotency_key_from(request):
+    """
+    Kunci idempotensi dari form (idempotency_key) atau header Idempotency-Key
+    """
+    key = (request.form.get('idempotency_key') or request.headers.get(IDEMPOTENCY_HEADER) or '').strip()
+    return key[:64] or None
+
+
+def processed_request(idempotency_key, user_id, action, occupancy_id=None):
+    """
+    PaymentRequest yang sudah tercatat untuk kunci ini, atau None. Kunci yang
+    sudah dipakai pengguna lain, untuk aksi lain atau (jika occupancy_id
+    diberikan) untuk hunian lain menghasilkan PaymentError 422.
+    """
+    if not idempotency_key:
+        return None
+    payment_request = PaymentRequest.query.filter_by(idempotency_key=idempotency_key).first()
+    if payment_request is None:
+        return None
+    # Catatan lama (sebelum ada kolom action) dianggap sesuai aksinya
+    if (payment_request.created_by != user_id
+            or (payment_request.action or action) != action
+            or (occupancy_id is not None and payment_request.occupancy_id != occupancy_id)):
+        raise PaymentError('Kunci idempotensi ini sudah dipakai untuk data lain', 422)
+    return payment_request
+
+
+def remember_request(idempotency_key, action, occupancy, financial_record, user_id):
+    """
+    Mencatat kunci idempotensi di transaksi yang sama dengan pembayarannya
+    """
+    if not idempotency_key:
+        return None
+    payment_request = PaymentRequest(
+        idempotency_key=idempotency_key,
+        action=action,
+        occupancy_id=occupancy.id,
+        financial_record_id=financial_record.id if financial_record else None,
+        created_by=user_id
+    )
+    db.session.add(payment_request)
+    return payment_request
+
+
+def settle_payment(occupancy, room, old_status, user_id):
+    """
+    Menyesuaikan catatan pemasukan dan piutang dengan status pembayaran hunian.
+    Dipanggil setelah occupancy di-flush. Mengembalikan catatan pemasukan
+    otomatis milik hunian ini (atau None).
+    """
+    rate = rate_for(room.id, occupancy.month_ordinal) if occupancy.month_ordinal is not None else None
+    if rate is None:
+        rate = room.monthly_rate or 0
+    income = FinancialRecord.query.filter_by(occupancy_id=occupancy.id).first()
+
+    if occupancy.is_occupied and occupancy.payment_status == 'paid':
+        amount = rate * (occupancy.payment_months or 1)
+        description = (f'Pembayaran sewa kamar {room.number} ({room.room_type}) oleh '
+                       f'{occupancy.tenant_name} untuk {occupancy.payment_months} bulan')
+        # Hunian yang sudah lunas sebelum ada tautan occupancy_id tidak dibuatkan pemasukan kedua
+        if income is None and old_status != 'paid':
+            income = FinancialRecord(
+                property_id=room.property_id,
+                occupancy_id=occupancy.id,
+                transaction_type='income',
+                category='Sewa',
+                created_by=user_id
+            )
+            db.session.add(income)
+        if income is not None:
+            income.transaction_date = occupancy.payment_date or datetime.now().date()
+            income.amount = amount
+            income.description = description
+    elif income is not None:
+        db.session.delete(income)
+        income = None
+
+    sync_receivable(occupancy, room, rate)
+    db.session.flush()
+    return income
+
+
+def update_payment(record_id, property_ids, user_id, status, payment_months=1,
+                   payment_date=None, due_date=None, idempotency_key=None):
+    """
+    Mengubah status pembayaran satu hunian dalam satu transaksi dan commit.
+    Mengembalikan (occupancy, pemasukan, replayed); replayed True berarti kunci
+    idempotensi sudah pernah diproses dan tidak ada yang diubah.
+    """
+    # Hunian dan kamarnya dalam satu query; baris hunian dikunci sampai commit
+    row = db.session.query(OccupancyRecord, Room).join(
+        Room, OccupancyRecord.room_id == Room.id
+    ).filter(OccupancyRecord.id == record_id).with_for_update(of=OccupancyRecord).first()
+    if row is None:
+        raise PaymentError('Data hunian tidak ditemukan')
+    occupancy, room = row
+    if room.property_id not in property_ids:
+        raise PaymentError('Anda tidak memiliki akses untuk mengubah data ini')
+
+    # Diperiksa setelah baris dikunci: kiriman kedua menunggu kiriman pertama selesai
+    if processed_request(idempotency_key, user_id, ACTION_UPDATE_PAYMENT, occupancy.id):
+        db.session.rollback()
+        return occupancy, None, True
+
+    old_status = occupancy.payment_status
+    occupancy.payment_status = status
+    occupancy.payment_months = max(int(payment_months or 1), 1)
+    occupancy.payment_date = payment_date or (datetime.now().date() if status == 'paid' else None)
+    if due_date:
+        occupancy.payment_due_date = due_date
+
+    income = settle_payment(occupancy, room, old_status, user_id)
+    remember_request(idempotency_key, ACTION_UPDATE_PAYMENT, occupancy, income, user_id)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Kunci yang sama di-commit oleh request lain lebih dulu
+        db.session.rollback()
+        if processed_request(idempotency_key, user_id, ACTION_UPDATE_PAYMENT, record_id):
+            return occupancy, None, True
+        raise
+    return occupancy, income, False
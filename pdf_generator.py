@@ -1,43 +1,82 @@
 import os
 import uuid
+import atexit
+import threading
+import multiprocessing
 from io import BytesIO
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
 from flask import render_template, make_response, url_for, current_app
 from xhtml2pdf import pisa
+from pypdf import PdfWriter
 from weasyprint import HTML, CSS
 from app import app
+from due_dates import OVERDUE_AFTER_DAYS
 
-def render_to_pdf(template_path, context_data, as_attachment=True):
+# Jumlah baris tabel maksimum per potongan PDF. Waktu layout xhtml2pdf naik lebih
+# dari linear terhadap ukuran tabel, jadi laporan besar dirender per potongan.
+PDF_CHUNK_ROWS = int(os.environ.get('PDF_CHUNK_ROWS', 250))
+
+# Jumlah proses untuk merender potongan PDF secara paralel (1 = tanpa proses tambahan)
+PDF_WORKERS = int(os.environ.get('PDF_WORKERS', min(4, os.cpu_count() or 1)))
+
+# Jumlah laporan yang boleh memakai pool proses bersamaan; permintaan berikutnya dirender berurutan
+PDF_MAX_JOBS = int(os.environ.get('PDF_MAX_JOBS', 2))
+
+_pdf_executor = None
+_pdf_executor_lock = threading.Lock()
+_pdf_jobs = threading.BoundedSemaphore(max(PDF_MAX_JOBS, 1))
+
+def _get_pdf_executor():
     """
-    Fungsi untuk merender template HTML ke file PDF
-    
-    Parameters:
-    template_path (str): Path ke template HTML
-    context_data (dict): Data untuk template
-    as_attachment (bool): True untuk download, False untuk inline display
+    Pool proses bersama untuk render potongan PDF, dibuat saat pertama dipakai.
+    Memakai konteks 'spawn' agar proses pekerja tidak di-fork dari server yang
+    sedang menjalankan thread (kunci dan koneksi database ikut tersalin saat fork).
+    """
+    global _pdf_executor
+    with _pdf_executor_lock:
+        if _pdf_executor is None:
+            _pdf_executor = ProcessPoolExecutor(max_workers=PDF_WORKERS,
+                                                mp_context=multiprocessing.get_context('spawn'))
+            atexit.register(_shutdown_pdf_executor)
+        return _pdf_executor
+
+def _shutdown_pdf_executor():
+    """
+    Menghentikan pool proses PDF saat aplikasi berhenti
+    """
+    global _pdf_executor
+    with _pdf_executor_lock:
+        if _pdf_executor is not None:
+            _pdf_executor.shutdown(wait=False, cancel_futures=True)
+            _pdf_executor = None
+
+def _html_to_pdf_bytes(rendered_html):
+    """
+    Konversi HTML ke PDF menggunakan xhtml2pdf (dipanggil juga di proses pekerja)
+    """
+    pdf_io = BytesIO()
+    pisa.CreatePDF(rendered_html, dest=pdf_io)
+    return pdf_io.getvalue()
+
+def _pdf_response(pdf_bytes, as_attachment):
+    """
+    Menyimpan PDF lalu mengembalikan response unduhan atau URL publik untuk preview
     """
-    # Render template HTML dengan data yang diberikan
-    rendered_html = render_template(template_path, **context_data)
-    
     # Tentukan nama file
     unique_id = uuid.uuid4().hex[:8]
     filename = f'laporan_{datetime.now().strftime("%Y%m%d_%H%M%S")}_{unique_id}.pdf'
     file_path = os.path.join('static', 'pdf', filename)
     absolute_path = os.path.join(current_app.root_path, file_path)
     
-    # Konversi HTML ke PDF menggunakan xhtml2pdf
-    pdf_io = BytesIO()
-    pisa.CreatePDF(rendered_html, dest=pdf_io)
-    
     # Simpan PDF ke file sementara (akan terhapus setelah restart server)
-    pdf_io.seek(0)
+    os.makedirs(os.path.dirname(absolute_path), exist_ok=True)
     with open(absolute_path, 'wb') as f:
-        f.write(pdf_io.getvalue())
+        f.write(pdf_bytes)
     
     # Jika as_attachment (download), buat response langsung untuk unduhan
     if as_attachment:
-        pdf_io.seek(0)
-        response = make_response(pdf_io.getvalue())
+        response = make_response(pdf_bytes)
         response.headers['Content-Type'] = 'application/pdf'
         response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
         return response
@@ -45,24 +84,118 @@ def render_to_pdf(template_path, context_data, as_attachment=True):
     # Jika tidak as_attachment (preview/inline), kembalikan URL publik ke PDF
     return url_for('static', filename=f'pdf/{filename}')
 
+def render_to_pdf(template_path, context_data, as_attachment=True):
+    """
+    Fungsi untuk merender template HTML ke file PDF
+    
+    Parameters:
+    template_path (str): Path ke template HTML
+    context_data (dict): Data untuk template
+    as_attachment (bool): True untuk download, False untuk inline display
+    """
+    return _pdf_response(render_pdf_bytes(template_path, context_data), as_attachment)
+
+def render_pdf_bytes(template_path, context_data):
+    """
+    Merender template HTML menjadi isi file PDF (bytes) tanpa menyimpan atau membuat response
+    """
+    # Render template HTML dengan data yang diberikan
+    rendered_html = render_template(template_path, **context_data)
+    return _html_to_pdf_bytes(rendered_html)
+
+def render_chunked_pdf(template_path, chunks, context_data, as_attachment=True):
+    """
+    Merender laporan besar per potongan lalu menggabungkannya menjadi satu PDF
+    
+    Parameters:
+    template_path (str): Path ke template HTML
+    chunks (list): Data tambahan per potongan (dict), digabung dengan context_data
+    context_data (dict): Data yang sama untuk semua potongan
+    as_attachment (bool): True untuk download, False untuk inline display
+    """
+    # Template dirender di proses utama (butuh app context), konversi ke PDF di proses pekerja
+    html_chunks = [
+        render_template(template_path, **dict(context_data, **chunk))
+        for chunk in chunks
+    ]
+    
+    # Pool dipakai paling banyak PDF_MAX_JOBS laporan sekaligus; jika penuh, render berurutan
+    pdf_parts = None
+    if PDF_WORKERS > 1 and len(html_chunks) > 1 and _pdf_jobs.acquire(blocking=False):
+        try:
+            pdf_parts = list(_get_pdf_executor().map(_html_to_pdf_bytes, html_chunks))
+        finally:
+            _pdf_jobs.release()
+    if pdf_parts is None:
+        pdf_parts = [_html_to_pdf_bytes(html) for html in html_chunks]
+    
+    if len(pdf_parts) == 1:
+        return _pdf_response(pdf_parts[0], as_attachment)
+    
+    writer = PdfWriter()
+    for part in pdf_parts:
+        writer.append(BytesIO(part))
+    merged = BytesIO()
+    writer.write(merged)
+    return _pdf_response(merged.getvalue(), as_attachment)
+
+def _chunk_sections(sections, max_rows):
+    """
+    Mengelompokkan bagian laporan (judul + baris) menjadi potongan berisi paling
+    banyak max_rows baris. Bagian yang terlalu besar dipecah dan ditandai 'lanjutan'.
+    """
+    chunks = []
+    current, current_rows = [], 0
+    for title, rows in sections:
+        start = 0
+        while start < len(rows):
+            if current_rows >= max_rows:
+                chunks.append(current)
+                current, current_rows = [], 0
+            take = max_rows - current_rows
+            current.append({'title': title, 'rows': rows[start:start + take], 'continued': start > 0})
+            current_rows += len(rows[start:start + take])
+            start += take
+    if current or not chunks:
+        chunks.append(current)
+    return chunks
+
 def generate_occupancy_pdf(property_id, start_month, end_month, occupancy_data, property_name, as_attachment=True):
     """
-    Generate PDF untuk data hunian
+    Generate PDF untuk data hunian. occupancy_data harus sudah terurut per bulan
+    dengan relasi room sudah dimuat. Laporan dibagi per bulan; bagian-bagian
+    dirender paralel dalam potongan PDF_CHUNK_ROWS baris lalu digabungkan.
     
     Parameters:
     as_attachment (bool): True untuk download, False untuk inline display
     """
+    sections = []
+    for record in occupancy_data:
+        if not sections or sections[-1][0] != record.month:
+            sections.append((record.month, []))
+        sections[-1][1].append(record)
+    
+    status_counts = {'paid': 0, 'unpaid': 0, 'late': 0}
+    for record in occupancy_data:
+        if record.payment_status in status_counts:
+            status_counts[record.payment_status] += 1
+    
     context = {
         'property_id': property_id,
         'property_name': property_name,
         'start_month': start_month,
         'end_month': end_month,
-        'occupancy_data': occupancy_data,
+        'summary': dict(status_counts, total=len(occupancy_data)),
         'current_date': datetime.now().strftime('%d %B %Y'),
         'title': 'Laporan Data Hunian'
     }
     
-    return render_to_pdf('pdf/occupancy_report.html', context, as_attachment=as_attachment)
+    section_chunks = _chunk_sections(sections, PDF_CHUNK_ROWS)
+    chunks = [
+        {'sections': chunk, 'is_first_chunk': index == 0, 'is_last_chunk': index == len(section_chunks) - 1}
+        for index, chunk in enumerate(section_chunks)
+    ]
+    return render_chunked_pdf('pdf/occupancy_report.html', chunks, context, as_attachment=as_attachment)
 
 def generate_finance_pdf(property_id, start_date, end_date, finance_data, property_name, summary_data, as_attachment=True):
     """
@@ -84,6 +217,20 @@ def generate_finance_pdf(property_id, start_date, end_date, finance_data, proper
     
     return render_to_pdf('pdf/finance_report.html', context, as_attachment=as_attachment)
 
+def room_stats_context(property_id, month, stats_data, property_name):
+    """
+    Data template untuk PDF statistik kamar
+    """
+    return {
+        'property_id': property_id,
+        'property_name': property_name,
+        'month': month,
+        'stats_data': stats_data,
+        'overdue_after_days': OVERDUE_AFTER_DAYS,
+        'current_date': datetime.now().strftime('%d %B %Y'),
+        'title': 'Laporan Statistik Kamar'
+    }
+
 def generate_room_stats_pdf(property_id, month, stats_data, property_name, as_attachment=True):
     """
     Generate PDF untuk statistik kamar
@@ -91,31 +238,52 @@ def generate_room_stats_pdf(property_id, month, stats_data, property_name, as_at
     Parameters:
     as_attachment (bool): True untuk download, False untuk inline display
     """
-    context = {
+    context = room_stats_context(property_id, month, stats_data, property_name)
+    return render_to_pdf('pdf/room_stats_report.html', context, as_attachment=as_attachment)
+
+def financial_stats_context(property_id, year, stats_data, property_name):
+    """
+    Data template untuk PDF statistik keuangan
+    """
+    return {
         'property_id': property_id,
         'property_name': property_name,
-        'month': month,
+        'year': year,
         'stats_data': stats_data,
         'current_date': datetime.now().strftime('%d %B %Y'),
-        'title': 'Laporan Statistik Kamar'
+        'title': 'Laporan Statistik Keuangan'
     }
-    
-    return render_to_pdf('pdf/room_stats_report.html', context, as_attachment=as_attachment)
 
 def generate_financial_stats_pdf(property_id, year, stats_data, property_name, as_attachment=True):
     """
     Generate PDF untuk statistik keuangan
     
+    Parameters:
+    as_attachment (bool): True untuk download, False untuk inline display
+    """
+    context = financial_stats_context(property_id, year, stats_data, property_name)
+    return render_to_pdf('pdf/financial_stats_report.html', context, as_attachment=as_attachment)
+
+def generate_consolidated_pdf(month, sections, totals, as_attachment=True):
+    """
+    Generate PDF laporan akhir bulan gabungan: halaman ringkasan semua properti
+    diikuti satu bagian per properti (dirender paralel lalu digabung)
+    
     Parameters:
     as_attachment (bool): True untuk download, False untuk inline display
     """
     context = {
-        'property_id': property_id,
-        'property_name': property_name,
-        'year': year,
-        'stats_data': stats_data,
+        'month': month,
+        'sections': sections,
+        'totals': totals,
+        'overdue_after_days': OVERDUE_AFTER_DAYS,
         'current_date': datetime.now().strftime('%d %B %Y'),
-        'title': 'Laporan Statistik Keuangan'
+        'title': 'Laporan Akhir Bulan Gabungan'
     }
     
-    return render_to_pdf('pdf/financial_stats_report.html', context, as_attachment=as_attachment)
\ No newline at end of file
+    chunks = [{'cover': True, 'property_name': 'Semua Properti'}]
+    chunks.extend(
+        {'cover': False, 'section': section, 'property_name': section['property_name']}
+        for section in sections
+    )
+    return render_chunked_pdf('pdf/consolidated_report.html', chunks, context, as_attachment=as_attachment)
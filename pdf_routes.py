@@ -1,14 +1,21 @@
-from flask import request, flash, redirect, url_for, render_template
-from datetime import datetime, date, timedelta
+from flask import request, flash, redirect, url_for, render_template, send_file
+from datetime import datetime
 from collections import defaultdict
 import urllib.parse
 from flask_login import login_required, current_user
+from sqlalchemy.orm import contains_eager
 
-from app import app, db
-from models import Property, Room, OccupancyRecord, FinancialRecord
-from auth_helpers import admin_required, property_access_required, get_user_properties
+from app import app
+from models import Property, Room, OccupancyRecord, FinancialRecord, ReportArchive, month_to_ordinal
+from auth_helpers import admin_required, manager_required, property_access_required, get_user_properties
+from database import read_replica
 from pdf_generator import (generate_occupancy_pdf, generate_finance_pdf, 
-                         generate_room_stats_pdf, generate_financial_stats_pdf)
+                         generate_room_stats_pdf, generate_financial_stats_pdf,
+                         generate_consolidated_pdf)
+from consolidated_report import cached_month_end_data
+from report_data import room_stats_data, financial_stats_data
+from report_archive import (REPORT_ROOM_STATS, REPORT_FINANCIAL_STATS, get_archived_report,
+                            archive_file_path)
 
 
 @app.route('/preview_pdf')
@@ -26,9 +33,44 @@ def preview_pdf():
     
     return render_template('pdf_preview.html', pdf_url=pdf_url, back_url=back_url)
 
+def _send_archived_report(report, preview, back_url):
+    """
+    Mengirim laporan dari arsip (tanpa render ulang)
+    """
+    if preview:
+        return redirect(url_for('preview_pdf',
+                                pdf_url=url_for('archived_report', report_id=report.id, inline='true'),
+                                back_url=back_url))
+    return send_file(archive_file_path(report), mimetype='application/pdf',
+                     as_attachment=True, download_name=report.filename)
+
+@app.route('/archived_report/<int:report_id>')
+@login_required
+@read_replica
+def archived_report(report_id):
+    """
+    Mengunduh laporan PDF dari arsip
+    """
+    report = ReportArchive.query.get_or_404(report_id)
+    
+    # Laporan keuangan hanya untuk admin, statistik kamar sesuai akses properti pengguna
+    if report.report_type == REPORT_FINANCIAL_STATS or report.property_id == 0:
+        has_access = current_user.is_admin
+    else:
+        has_access = report.property_id in [p.id for p in get_user_properties()]
+    
+    if not has_access:
+        flash('Anda tidak memiliki akses ke laporan ini.', 'danger')
+        return redirect(url_for('reports'))
+    
+    inline = request.args.get('inline', 'false') == 'true'
+    return send_file(archive_file_path(report), mimetype='application/pdf',
+                     as_attachment=not inline, download_name=report.filename)
+
 @app.route('/export_occupancy_pdf')
 @login_required
 @property_access_required
+@read_replica
 def export_occupancy_pdf():
     """
     Mengekspor data hunian ke PDF
@@ -40,8 +82,8 @@ def export_occupancy_pdf():
     
     # Validasi format bulan
     try:
-        datetime.strptime(start_month, '%Y-%m')
-        datetime.strptime(end_month, '%Y-%m')
+        start_ordinal = month_to_ordinal(start_month)
+        end_ordinal = month_to_ordinal(end_month)
     except ValueError:
         flash('Format bulan tidak valid. Gunakan format YYYY-MM.', 'danger')
         return redirect(url_for('manage_occupancy'))
@@ -59,11 +101,14 @@ def export_occupancy_pdf():
         return redirect(url_for('manage_occupancy'))
     
     # Ambil data hunian untuk rentang bulan yang diminta
-    occupancy_records = OccupancyRecord.query.join(Room).filter(
+    # Relasi room ikut dimuat dari join yang sama agar template tidak query per baris
+    occupancy_records = OccupancyRecord.query.join(Room).options(
+        contains_eager(OccupancyRecord.room)
+    ).filter(
         Room.property_id == property_id,
-        OccupancyRecord.month >= start_month,
-        OccupancyRecord.month <= end_month
-    ).order_by(OccupancyRecord.month, Room.number).all()
+        OccupancyRecord.month_ordinal >= start_ordinal,
+        OccupancyRecord.month_ordinal <= end_ordinal
+    ).order_by(OccupancyRecord.month_ordinal, Room.number).all()
     
     # Jika mode preview, arahkan ke halaman preview
     if preview:
@@ -92,6 +137,7 @@ def export_occupancy_pdf():
 @app.route('/export_finance_pdf')
 @login_required
 @property_access_required
+@read_replica
 def export_finance_pdf():
     """
     Mengekspor data keuangan ke PDF
@@ -186,6 +232,7 @@ def export_finance_pdf():
 @app.route('/export_room_stats_pdf')
 @login_required
 @property_access_required
+@read_replica
 def export_room_stats_pdf():
     """
     Mengekspor statistik kamar ke PDF
@@ -196,7 +243,7 @@ def export_room_stats_pdf():
     
     # Validasi format bulan
     try:
-        datetime.strptime(month, '%Y-%m')
+        month_ordinal = month_to_ordinal(month)
     except ValueError:
         flash('Format bulan tidak valid. Gunakan format YYYY-MM.', 'danger')
         return redirect(url_for('room_stats'))
@@ -213,69 +260,12 @@ def export_room_stats_pdf():
         flash('Anda tidak memiliki akses ke properti ini.', 'danger')
         return redirect(url_for('room_stats'))
     
-    # Ambil data kamar dan hunian
-    rooms = Room.query.filter(Room.property_id == property_id).all()
-    total_rooms = len(rooms)
-    occupied_rooms = sum(1 for room in rooms if room.status == 'occupied')
-    vacant_rooms = total_rooms - occupied_rooms
-    occupancy_rate = (occupied_rooms / total_rooms * 100) if total_rooms > 0 else 0
-    
-    # Get room details with tenant information
-    room_details = []
-    room_types = {}
-    
-    for room in rooms:
-        # Count room types
-        if room.room_type in room_types:
-            room_types[room.room_type] += 1
-        else:
-            room_types[room.room_type] = 1
-            
-        # Get tenant name if room is occupied
-        tenant_name = None
-        if room.status == 'occupied':
-            occupancy = OccupancyRecord.query.filter(
-                OccupancyRecord.room_id == room.id,
-                OccupancyRecord.month == month
-            ).first()
-            if occupancy:
-                tenant_name = occupancy.tenant_name
-        
-        room_details.append({
-            'id': room.id,
-            'number': room.number,
-            'room_type': room.room_type,
-            'monthly_rate': room.monthly_rate,
-            'status': room.status,
-            'tenant_name': tenant_name
-        })
-    
-    # Get payment status statistics
-    payment_status = {
-        'paid': 0,
-        'unpaid': 0,
-        'late': 0
-    }
+    # Laporan yang sudah diarsipkan dikirim langsung dari file
+    archived = get_archived_report(REPORT_ROOM_STATS, property_id, month)
+    if archived:
+        return _send_archived_report(archived, preview, url_for('room_stats'))
     
-    occupancy_records = OccupancyRecord.query.join(Room).filter(
-        Room.property_id == property_id,
-        OccupancyRecord.month == month,
-        OccupancyRecord.is_occupied == True
-    ).all()
-    
-    for record in occupancy_records:
-        if record.payment_status in payment_status:
-            payment_status[record.payment_status] += 1
-    
-    stats_data = {
-        'total_rooms': total_rooms,
-        'occupied_rooms': occupied_rooms,
-        'vacant_rooms': vacant_rooms,
-        'occupancy_rate': occupancy_rate,
-        'room_details': room_details,
-        'room_types': room_types,
-        'payment_status': payment_status
-    }
+    stats_data = room_stats_data(property_id, month_ordinal)
     
     # Jika mode preview, arahkan ke halaman preview
     if preview:
@@ -302,6 +292,7 @@ def export_room_stats_pdf():
 @app.route('/export_financial_stats_pdf')
 @login_required
 @admin_required  # Hanya admin yang dapat mengakses statistik keuangan
+@read_replica
 def export_financial_stats_pdf():
     """
     Mengekspor statistik keuangan ke PDF
@@ -319,135 +310,18 @@ def export_financial_stats_pdf():
         flash('Format tahun tidak valid. Gunakan format YYYY.', 'danger')
         return redirect(url_for('financial_stats'))
     
+    # Laporan yang sudah diarsipkan dikirim langsung dari file
+    archived = get_archived_report(REPORT_FINANCIAL_STATS, property_id, f'{year_int:04d}')
+    if archived:
+        return _send_archived_report(archived, preview, url_for('financial_stats'))
+    
     # Tentukan properti yang akan dilihat
     if property_id:
-        property_data = Property.query.get_or_404(property_id)
-        property_filter = FinancialRecord.property_id == property_id
-        property_name = property_data.name
+        property_name = Property.query.get_or_404(property_id).name
     else:
-        property_filter = FinancialRecord.id > 0  # All properties
         property_name = "Semua Properti"
     
-    # Define the date range for the year
-    start_date = date(int(year), 1, 1)
-    end_date = date(int(year), 12, 31)
-    
-    # Calculate yearly summary
-    yearly_income = db.session.query(db.func.sum(FinancialRecord.amount)).filter(
-        property_filter,
-        FinancialRecord.transaction_type == 'income',
-        FinancialRecord.transaction_date >= start_date,
-        FinancialRecord.transaction_date <= end_date
-    ).scalar() or 0
-    
-    yearly_expense = db.session.query(db.func.sum(FinancialRecord.amount)).filter(
-        property_filter,
-        FinancialRecord.transaction_type == 'expense',
-        FinancialRecord.transaction_date >= start_date,
-        FinancialRecord.transaction_date <= end_date
-    ).scalar() or 0
-    
-    yearly_profit = yearly_income - yearly_expense
-    
-    # Calculate monthly breakdown
-    monthly_data = []
-    month_names = ['Januari', 'Februari', 'Maret', 'April', 'Mei', 'Juni', 
-                  'Juli', 'Agustus', 'September', 'Oktober', 'November', 'Desember']
-    
-    highest_income_month = ""
-    highest_income_amount = 0
-    highest_expense_month = ""
-    highest_expense_amount = 0
-    highest_profit_month = ""
-    highest_profit_amount = 0
-    
-    for month_num in range(1, 13):
-        month_start = date(int(year), month_num, 1)
-        if month_num == 12:
-            month_end = date(int(year), month_num, 31)
-        else:
-            month_end = date(int(year), month_num + 1, 1) - timedelta(days=1)
-        
-        month_income = db.session.query(db.func.sum(FinancialRecord.amount)).filter(
-            property_filter,
-            FinancialRecord.transaction_type == 'income',
-            FinancialRecord.transaction_date >= month_start,
-            FinancialRecord.transaction_date <= month_end
-        ).scalar() or 0
-        
-        month_expense = db.session.query(db.func.sum(FinancialRecord.amount)).filter(
-            property_filter,
-            FinancialRecord.transaction_type == 'expense',
-            FinancialRecord.transaction_date >= month_start,
-            FinancialRecord.transaction_date <= month_end
-        ).scalar() or 0
-        
-        month_profit = month_income - month_expense
-        
-        # Update highest values
-        if month_income > highest_income_amount:
-            highest_income_amount = month_income
-            highest_income_month = month_names[month_num - 1]
-        
-        if month_expense > highest_expense_amount:
-            highest_expense_amount = month_expense
-            highest_expense_month = month_names[month_num - 1]
-        
-        if month_profit > highest_profit_amount:
-            highest_profit_amount = month_profit
-            highest_profit_month = month_names[month_num - 1]
-        
-        monthly_data.append({
-            'month_num': month_num,
-            'month_name': month_names[month_num - 1],
-            'income': month_income,
-            'expense': month_expense,
-            'profit': month_profit
-        })
-    
-    # Get income and expense by category
-    income_by_category = db.session.query(
-        FinancialRecord.category,
-        db.func.sum(FinancialRecord.amount)
-    ).filter(
-        property_filter,
-        FinancialRecord.transaction_type == 'income',
-        FinancialRecord.transaction_date >= start_date,
-        FinancialRecord.transaction_date <= end_date
-    ).group_by(FinancialRecord.category).all()
-    
-    expense_by_category = db.session.query(
-        FinancialRecord.category,
-        db.func.sum(FinancialRecord.amount)
-    ).filter(
-        property_filter,
-        FinancialRecord.transaction_type == 'expense',
-        FinancialRecord.transaction_date >= start_date,
-        FinancialRecord.transaction_date <= end_date
-    ).group_by(FinancialRecord.category).all()
-    
-    # Convert query results to dict
-    income_by_category_dict = {cat: amount for cat, amount in income_by_category}
-    expense_by_category_dict = {cat: amount for cat, amount in expense_by_category}
-    
-    stats_data = {
-        'yearly_summary': {
-            'total_income': yearly_income,
-            'total_expense': yearly_expense,
-            'net_profit': yearly_profit
-        },
-        'monthly_data': monthly_data,
-        'income_by_category': income_by_category_dict,
-        'expense_by_category': expense_by_category_dict,
-        'trends': {
-            'highest_income_month': highest_income_month,
-            'highest_income_amount': highest_income_amount,
-            'highest_expense_month': highest_expense_month,
-            'highest_expense_amount': highest_expense_amount,
-            'highest_profit_month': highest_profit_month,
-            'highest_profit_amount': highest_profit_amount
-        }
-    }
+    stats_data = financial_stats_data(property_id, int(year))
     
     # Jika mode preview, arahkan ke halaman preview
     if preview:
@@ -469,4 +343,40 @@ def export_financial_stats_pdf():
         stats_data=stats_data,
         property_name=property_name,
         as_attachment=True
-    )
\ No newline at end of file
+    )
+
+@app.route('/export_consolidated_pdf')
+@login_required
+@manager_required
+@read_replica
+def export_consolidated_pdf():
+    """
+    Mengekspor laporan akhir bulan gabungan untuk semua properti yang dapat diakses
+    """
+    month = request.args.get('month', datetime.now().strftime('%Y-%m'))
+    preview = request.args.get('preview', 'false') == 'true'
+    
+    # Validasi format bulan
+    try:
+        month_to_ordinal(month)
+    except ValueError:
+        flash('Format bulan tidak valid. Gunakan format YYYY-MM.', 'danger')
+        return redirect(url_for('reports'))
+    
+    property_ids = [p.id for p in get_user_properties()]
+    if not property_ids:
+        flash('Tidak ada properti yang dapat diakses.', 'danger')
+        return redirect(url_for('reports'))
+    
+    year, month_num = map(int, month.split('-'))
+    sections, totals = cached_month_end_data(property_ids, year, month_num)
+    
+    # Jika mode preview, arahkan ke halaman preview
+    if preview:
+        pdf_url = generate_consolidated_pdf(month, sections, totals, as_attachment=False)
+        return redirect(url_for('preview_pdf', 
+                                pdf_url=pdf_url, 
+                                back_url=url_for('reports')))
+    
+    # Generate PDF untuk download
+    return generate_consolidated_pdf(month, sections, totals, as_attachment=True)
@@ -0,0 +1,164 @@
+import os
+import re
+import io
+import time
+import uuid
+import pstats
+import cProfile
+import logging
+from datetime import datetime
+
+from flask import request, g, render_template, send_from_directory, abort, make_response
+from flask_login import current_user
+
+from app import app
+from auth_helpers import admin_required
+
+# Ekstensi file hasil profiling (format pstats, bisa dibuka dengan snakeviz/flameprof/gprof2dot)
+PROFILE_EXT = '.prof'
+PROFILE_NAME_RE = re.compile(r'^[A-Za-z0-9_.-]+\.prof$')
+
+
+def _profiling_requested():
+    """
+    Mengecek apakah request ini meminta mode profiling
+    melalui query parameter `_profile=1` atau header `X-Profile: 1`
+    """
+    flag = request.args.get('_profile') or request.headers.get('X-Profile')
+    return flag in ('1', 'true', 'yes')
+
+
+def _profile_dir():
+    path = app.config['PROFILE_DIR']
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _enforce_retention(path):
+    """
+    Menghapus file profil tertua jika jumlahnya melebihi PROFILE_MAX_FILES
+    """
+    max_files = app.config['PROFILE_MAX_FILES']
+    files = sorted(
+        (f for f in os.listdir(path) if f.endswith(PROFILE_EXT)),
+        key=lambda f: os.path.getmtime(os.path.join(path, f))
+    )
+    for name in files[:max(len(files) - max_files, 0)]:
+        try:
+            os.remove(os.path.join(path, name))
+        except OSError:
+            pass
+
+
+def list_profiles():
+    """
+    Mendapatkan daftar file profil yang tersimpan, terbaru lebih dulu
+    """
+    path = _profile_dir()
+    profiles = []
+    for name in os.listdir(path):
+        if not name.endswith(PROFILE_EXT):
+            continue
+        full_path = os.path.join(path, name)
+        profiles.append({
+            'name': name,
+            'size': os.path.getsize(full_path),
+            'created_at': datetime.fromtimestamp(os.path.getmtime(full_path))
+        })
+    profiles.sort(key=lambda p: p['created_at'], reverse=True)
+    return profiles
+
+
+@app.before_request
+def start_profiler():
+    """
+    Menjalankan cProfile untuk request ini jika diminta oleh admin
+    """
+    if not _profiling_requested():
+        return
+    if not current_user.is_authenticated or not current_user.is_admin:
+        return
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Profiler lain sedang aktif di thread ini
+        logging.warning("Profiling dilewati: profiler lain sedang aktif")
+        return
+    g.profiler = profiler
+    g.profiler_started = time.perf_counter()
+
+
+@app.after_request
+def stop_profiler(response):
+    """
+    Menghentikan profiler dan menyimpan hasilnya ke PROFILE_DIR
+    """
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return response
+    profiler.disable()
+
+    elapsed_ms = (time.perf_counter() - g.pop('profiler_started')) * 1000
+    endpoint = re.sub(r'[^A-Za-z0-9_]', '_', request.endpoint or 'unknown')
+    name = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{endpoint}_{uuid.uuid4().hex[:8]}{PROFILE_EXT}"
+
+    try:
+        path = _profile_dir()
+        profiler.dump_stats(os.path.join(path, name))
+        _enforce_retention(path)
+    except OSError as e:
+        logging.error(f"Gagal menyimpan hasil profiling: {e}")
+        return response
+
+    logging.info(f"Profil {request.path} disimpan sebagai {name} ({elapsed_ms:.1f} ms)")
+    response.headers['X-Profile-Id'] = name
+    response.headers['X-Profile-Duration-Ms'] = f"{elapsed_ms:.1f}"
+    return response
+
+
+@app.teardown_request
+def discard_profiler(exc):
+    """
+    Pastikan profiler dimatikan jika request gagal sebelum after_request
+    """
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+
+
+@app.route('/admin/profiles')
+@admin_required
+def view_profiles():
+    """
+    Halaman daftar hasil profiling - hanya admin yang dapat mengakses
+    """
+    return render_template('profiles.html',
+                           profiles=list_profiles(),
+                           max_files=app.config['PROFILE_MAX_FILES'],
+                           title='Profiling Request')
+
+
+@app.route('/admin/profiles/<name>')
+@admin_required
+def download_profile(name):
+    """
+    Mengunduh file profil (pstats) atau ringkasannya dalam bentuk teks (?format=txt)
+    """
+    if not PROFILE_NAME_RE.match(name):
+        abort(404)
+    path = _profile_dir()
+    if not os.path.exists(os.path.join(path, name)):
+        abort(404)
+
+    if request.args.get('format') == 'txt':
+        output = io.StringIO()
+        stats = pstats.Stats(os.path.join(path, name), stream=output)
+        stats.strip_dirs().sort_stats('cumulative').print_stats(80)
+        stats.print_callers(30)
+        response = make_response(output.getvalue())
+        response.headers['Content-Type'] = 'text/plain; charset=utf-8'
+        return response
+
+    return send_from_directory(path, name, as_attachment=True)
@@ -0,0 +1,217 @@
+"""
+Buku piutang sewa (receivables).
+
+Setiap catatan hunian yang terisi memiliki satu baris piutang dengan sisa tagihan
+(outstanding). Baris ini diperbarui setiap kali hunian dicatat atau status
+pembayarannya diubah, sehingga laporan tunggakan semua properti cukup dibaca
+dengan satu query.
+
+Jalankan `python receivables.py` untuk membangun ulang piutang dari data hunian yang ada.
+"""
+import logging
+from datetime import date, datetime, timedelta
+
+from app import app, db
+from models import Property, Room, OccupancyRecord, Receivable, Tenant
+from room_rates import rates_for
+
+# Kelompok umur piutang (dalam hari setelah jatuh tempo)
+AGING_BUCKETS = ['current', '0_30', '31_60', '60_plus']
+
+# Jumlah baris per INSERT saat membangun ulang piutang
+REBUILD_BATCH_SIZE = 1000
+
+
+def _default_due_date(occupancy):
+    # Tanpa jatuh tempo, tagihan dianggap jatuh tempo pada awal bulan hunian
+    year, month_index = divmod(occupancy.month_ordinal, 12)
+    return date(year, month_index + 1, 1)
+
+
+def sync_receivable(occupancy, room, rate=None):
+    """
+    Membuat atau memperbarui baris piutang untuk satu catatan hunian.
+    Panggil setelah occupancy di-flush (id sudah tersedia) dan sebelum commit.
+    rate: tarif yang berlaku di bulan hunian (lihat room_rates.rates_for);
+    bawaan tarif kamar saat ini.
+    """
+    receivable = Receivable.query.filter_by(occupancy_id=occupancy.id).first()
+
+    # Data lama dengan bulan tidak valid tidak punya cakupan bulan, jadi tidak dihitung piutangnya
+    if not occupancy.is_occupied or occupancy.month_ordinal is None:
+        if receivable:
+            db.session.delete(receivable)
+        return None
+
+    if not receivable:
+        receivable = Receivable(occupancy_id=occupancy.id)
+        db.session.add(receivable)
+
+    if rate is None:
+        rate = room.monthly_rate or 0
+    for field, value in _receivable_row(occupancy, room, rate).items():
+        setattr(receivable, field, value)
+    return receivable
+
+
+def remove_receivable(occupancy):
+    """
+    Menghapus piutang milik catatan hunian yang akan dihapus
+    """
+    Receivable.query.filter_by(occupancy_id=occupancy.id).delete()
+
+
+def _aging_columns(today):
+    # Batas umur dihitung di Python agar ekspresi CASE sama untuk SQLite dan MySQL
+    cutoff_30 = today - timedelta(days=30)
+    cutoff_60 = today - timedelta(days=60)
+    outstanding = Receivable.outstanding
+    return [
+        db.func.sum(db.case((Receivable.due_date >= today, outstanding), else_=0)),
+        db.func.sum(db.case(((Receivable.due_date < today) & (Receivable.due_date >= cutoff_30), outstanding), else_=0)),
+        db.func.sum(db.case(((Receivable.due_date < cutoff_30) & (Receivable.due_date >= cutoff_60), outstanding), else_=0)),
+        db.func.sum(db.case((Receivable.due_date < cutoff_60, outstanding), else_=0)),
+        db.func.sum(outstanding),
+        db.func.count(Receivable.id)
+    ]
+
+
+def _aging_row(values):
+    *buckets, total, count = values
+    row = {bucket: int(amount or 0) for bucket, amount in zip(AGING_BUCKETS, buckets)}
+    row['total'] = int(total or 0)
+    row['count'] = count
+    return row
+
+
+def arrears_report(property_ids, today=None):
+    """
+    Laporan tunggakan per properti dengan kelompok umur, dalam satu query
+    """
+    if not property_ids:
+        return []
+    today = today or date.today()
+
+    rows = db.session.query(
+        Property.id,
+        Property.name,
+        *_aging_columns(today)
+    ).join(
+        Receivable, Receivable.property_id == Property.id
+    ).filter(
+        Receivable.property_id.in_(property_ids),
+        Receivable.outstanding > 0
+    ).group_by(Property.id, Property.name).order_by(Property.name).all()
+
+    report = []
+    for property_id, property_name, *values in rows:
+        row = _aging_row(values)
+        row.update({'property_id': property_id, 'property_name': property_name})
+        report.append(row)
+    return report
+
+
+def outstanding_by_tenant(property_ids, today=None):
+    """
+    Sisa tagihan per penyewa dan kamar, diurutkan dari yang terbesar.
+    Penyewa dikelompokkan menurut tenant_id; nama hanya dipakai untuk data lama
+    yang belum terhubung ke tabel penyewa.
+    """
+    if not property_ids:
+        return []
+    today = today or date.today()
+
+    # Nama dari catatan hunian hanya menjadi kunci kelompok jika tenant_id kosong
+    legacy_name = db.case((OccupancyRecord.tenant_id.is_(None), Receivable.tenant_name), else_=None)
+
+    rows = db.session.query(
+        OccupancyRecord.tenant_id,
+        db.func.coalesce(Tenant.name, legacy_name),
+        Room.number,
+        Property.name,
+        db.func.min(Receivable.due_date),
+        *_aging_columns(today)
+    ).join(
+        OccupancyRecord, Receivable.occupancy_id == OccupancyRecord.id
+    ).outerjoin(
+        Tenant, OccupancyRecord.tenant_id == Tenant.id
+    ).join(
+        Room, Receivable.room_id == Room.id
+    ).join(
+        Property, Receivable.property_id == Property.id
+    ).filter(
+        Receivable.property_id.in_(property_ids),
+        Receivable.outstanding > 0
+    ).group_by(
+        OccupancyRecord.tenant_id, Tenant.name, legacy_name, Room.id, Room.number, Property.name
+    ).order_by(db.func.sum(Receivable.outstanding).desc()).all()
+
+    result = []
+    for tenant_id, tenant_name, room_number, property_name, oldest_due_date, *values in rows:
+        row = _aging_row(values)
+        row.update({
+            'tenant_id': tenant_id,
+            'tenant_name': tenant_name,
+            'room_number': room_number,
+            'property_name': property_name,
+            'oldest_due_date': oldest_due_date
+        })
+        result.append(row)
+    return result
+
+
+def _receivable_row(occupancy, room, rate):
+    # Kolom piutang untuk satu catatan hunian, sama dengan yang diisi sync_receivable
+    amount_due = rate * (occupancy.payment_months or 1)
+    amount_paid = amount_due if occupancy.payment_status == 'paid' else 0
+    return {
+        'occupancy_id': occupancy.id,
+        'property_id': room.property_id,
+        'room_id': room.id,
+        'tenant_name': occupancy.tenant_name,
+        'month': occupancy.month,
+        'due_date': occupancy.payment_due_date or _default_due_date(occupancy),
+        'amount_due': amount_due,
+        'amount_paid': amount_paid,
+        'outstanding': amount_due - amount_paid
+    }
+
+
+def rebuild_receivables():
+    """
+    Membangun ulang seluruh piutang dari catatan hunian yang ada.
+    Tabel dikosongkan lalu diisi dengan satu INSERT banyak baris per kelompok,
+    tanpa query per catatan hunian.
+    """
+    Receivable.query.delete()
+    rows = db.session.query(OccupancyRecord, Room).join(
+        Room, OccupancyRecord.room_id == Room.id
+    ).filter(OccupancyRecord.is_occupied == True, OccupancyRecord.coverage_start.isnot(None)).all()
+    rates = rates_for((room.id, occupancy.month_ordinal) for occupancy, room in rows)
+    now = datetime.utcnow()
+    values = []
+    for occupancy, room in rows:
+        rate = rates.get((room.id, occupancy.month_ordinal))
+        if rate is None:
+            rate = room.monthly_rate or 0
+        values.append(dict(_receivable_row(occupancy, room, rate), updated_at=now))
+    for start in range(0, len(values), REBUILD_BATCH_SIZE):
+        db.session.execute(Receivable.__table__.insert(), values[start:start + REBUILD_BATCH_SIZE])
+    db.session.commit()
+    logging.info(f"Piutang dibangun ulang untuk {len(values)} catatan hunian")
+    return len(values)
+
+
+def backfill_receivables():
+    """
+    Mengisi piutang satu kali untuk database lama yang belum memiliki data piutang
+    """
+    if Receivable.query.first() is None and OccupancyRecord.query.first() is not None:
+        rebuild_receivables()
+
+
+if __name__ == '__main__':
+    with app.app_context():
+        db.create_all()
+        total = rebuild_receivables()
+        print(f'Piutang dibangun ulang untuk {total} catatan hunian')
@@ -0,0 +1,280 @@
+"""
+Arsip laporan PDF akhir bulan.
+
+Setelah bulan ditutup, laporan standar (statistik kamar bulanan dan statistik
+keuangan tahunan) untuk setiap properti dibuat sekali dan disimpan sebagai file
+di REPORT_ARCHIVE_DIR, dicatat di tabel report_archives. Route ekspor PDF
+mengirim file arsip ini jika ada, sehingga lonjakan unduhan di awal bulan cukup
+membaca file, bukan merender ulang laporan yang sama berkali-kali.
+
+Arsip dihapus otomatis jika data yang mendasarinya berubah. Pembuatan arsip bisa
+dijalankan lewat cron:
+
+    python report_archive.py            # bulan lalu
+    python report_archive.py 2025-05    # bulan tertentu
+    python report_archive.py 2025-05 --force
+
+atau di dalam proses aplikasi dengan REPORT_SCHEDULER=true. Pembuatan arsip
+memakai kunci file di REPORT_ARCHIVE_DIR, sehingga dari beberapa worker (dan
+cron) hanya satu proses yang merender laporan pada satu waktu.
+"""
+import os
+import sys
+import time
+import fcntl
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+
+from sqlalchemy import event, inspect
+from sqlalchemy.exc import IntegrityError
+
+from app import app, db
+from models import (Property, Room, OccupancyRecord, FinancialRecord, NationalHoliday, ReportArchive,
+                    month_to_ordinal)
+from report_data import room_stats_data, financial_stats_data
+from pdf_generator import render_pdf_bytes, room_stats_context, financial_stats_context
+
+REPORT_ROOM_STATS = 'room_stats'
+REPORT_FINANCIAL_STATS = 'financial_stats'
+
+# Interval pengecekan scheduler dalam proses (detik)
+SCHEDULER_INTERVAL = int(os.environ.get('REPORT_SCHEDULER_INTERVAL', 3600))
+
+
+def _archive_dir():
+    return app.config['REPORT_ARCHIVE_DIR']
+
+
+def archive_file_path(report):
+    return os.path.join(_archive_dir(), report.filename)
+
+
+@contextmanager
+def archive_lock(blocking=False):
+    """
+    Kunci file pembuatan arsip. Menghasilkan True jika kunci didapat, False jika
+    sedang dipegang proses lain (hanya jika blocking=False).
+    """
+    os.makedirs(_archive_dir(), exist_ok=True)
+    with open(os.path.join(_archive_dir(), '.generate.lock'), 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def get_archived_report(report_type, property_id, period):
+    """
+    Mendapatkan laporan arsip jika ada dan filenya masih tersedia
+    """
+    report = ReportArchive.query.filter_by(
+        report_type=report_type, property_id=property_id, period=period
+    ).first()
+    if report and not os.path.exists(archive_file_path(report)):
+        return None
+    return report
+
+
+def store_report(report_type, property_id, period, pdf_bytes):
+    """
+    Menyimpan file PDF ke arsip dan mencatatnya di database
+    """
+    filename = f'{report_type}_{property_id}_{period}.pdf'
+    os.makedirs(_archive_dir(), exist_ok=True)
+    path = os.path.join(_archive_dir(), filename)
+
+    # Tulis ke file sementara lalu ganti, agar unduhan yang sedang berjalan tidak membaca file setengah jadi
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(pdf_bytes)
+    os.replace(temp_path, path)
+
+    report = ReportArchive.query.filter_by(
+        report_type=report_type, property_id=property_id, period=period
+    ).first()
+    if not report:
+        report = ReportArchive(report_type=report_type, property_id=property_id, period=period)
+        db.session.add(report)
+    report.filename = filename
+    report.size = len(pdf_bytes)
+    report.generated_at = datetime.utcnow()
+    db.session.commit()
+    return report
+
+
+def generate_month_end_reports(year, month, force=False):
+    """
+    Membuat laporan standar untuk bulan yang sudah ditutup:
+    statistik kamar bulan tersebut dan statistik keuangan tahunnya, untuk setiap
+    properti ditambah statistik keuangan semua properti.
+    Laporan yang sudah ada di arsip dilewati kecuali force=True.
+    """
+    month_key = f'{year:04d}-{month:02d}'
+    year_key = f'{year:04d}'
+    month_ordinal = month_to_ordinal(month_key)
+
+    existing = set()
+    if not force:
+        existing = set(db.session.query(
+            ReportArchive.report_type, ReportArchive.property_id, ReportArchive.period
+        ).filter(ReportArchive.period.in_([month_key, year_key])).all())
+
+    jobs = []
+    for prop in Property.query.order_by(Property.id).all():
+        jobs.append((REPORT_ROOM_STATS, prop.id, prop.name, month_key))
+        jobs.append((REPORT_FINANCIAL_STATS, prop.id, prop.name, year_key))
+    jobs.append((REPORT_FINANCIAL_STATS, 0, 'Semua Properti', year_key))
+
+    generated = 0
+    for report_type, property_id, property_name, period in jobs:
+        if (report_type, property_id, period) in existing:
+            continue
+        try:
+            if report_type == REPORT_ROOM_STATS:
+                stats_data = room_stats_data(property_id, month_ordinal)
+                pdf_bytes = render_pdf_bytes('pdf/room_stats_report.html', room_stats_context(
+                    property_id, period, stats_data, property_name))
+            else:
+                stats_data = financial_stats_data(property_id, year)
+                pdf_bytes = render_pdf_bytes('pdf/financial_stats_report.html', financial_stats_context(
+                    property_id, period, stats_data, property_name))
+            store_report(report_type, property_id, period, pdf_bytes)
+            generated += 1
+        except IntegrityError:
+            # Proses lain (worker/cron) sudah menyimpan laporan yang sama
+            db.session.rollback()
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Gagal membuat arsip {report_type} {property_id} {period}: {e}")
+
+    logging.info(f"Arsip laporan {month_key}: {generated} laporan dibuat")
+    return generated
+
+
+def previous_month(today=None):
+    today = today or date.today()
+    if today.month == 1:
+        return today.year - 1, 12
+    return today.year, today.month - 1
+
+
+def _delete_archives(connection, report_type, property_ids, period=None):
+    # property_ids None: semua properti, period None: semua periode
+    statement = ReportArchive.__table__.delete().where(ReportArchive.report_type == report_type)
+    if property_ids is not None:
+        statement = statement.where(ReportArchive.property_id.in_(property_ids))
+    if period is not None:
+        statement = statement.where(ReportArchive.period == period)
+    connection.execute(statement)
+
+
+def _history_values(target, field):
+    # Nilai sekarang dan nilai lama (jika berubah) dari sebuah atribut
+    history = inspect(target).attrs[field].history
+    values = {getattr(target, field)}
+    values.update(history.deleted or ())
+    return {value for value in values if value is not None}
+
+
+@event.listens_for(FinancialRecord, 'after_insert')
+@event.listens_for(FinancialRecord, 'after_update')
+@event.listens_for(FinancialRecord, 'after_delete')
+def _invalidate_financial_archives(mapper, connection, target):
+    property_ids = {int(value) for value in _history_values(target, 'property_id')} | {0}
+    for transaction_date in _history_values(target, 'transaction_date'):
+        _delete_archives(connection, REPORT_FINANCIAL_STATS, property_ids, f'{transaction_date.year:04d}')
+
+
+@event.listens_for(OccupancyRecord, 'after_insert')
+@event.listens_for(OccupancyRecord, 'after_update')
+@event.listens_for(OccupancyRecord, 'after_delete')
+def _invalidate_room_archives(mapper, connection, target):
+    property_ids = set(connection.execute(
+        db.select(Room.property_id).where(Room.id.in_(_history_values(target, 'room_id')))
+    ).scalars())
+    for month in _history_values(target, 'month'):
+        _delete_archives(connection, REPORT_ROOM_STATS, property_ids, month)
+
+
+# Kolom kamar yang tampil di statistik kamar
+ROOM_REPORT_FIELDS = ('number', 'room_type', 'status', 'monthly_rate', 'property_id')
+
+
+@event.listens_for(Room, 'after_insert')
+@event.listens_for(Room, 'after_delete')
+def _invalidate_archives_for_room(mapper, connection, target):
+    # Statistik kamar memuat daftar kamar, status dan tarifnya: arsip semua bulan properti ini usang
+    invalidate_room_archives(connection, {int(value) for value in _history_values(target, 'property_id')})
+
+
+@event.listens_for(Room, 'after_update')
+def _invalidate_archives_for_room_update(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in ROOM_REPORT_FIELDS):
+        _invalidate_archives_for_room(mapper, connection, target)
+
+
+@event.listens_for(NationalHoliday, 'after_insert')
+@event.listens_for(NationalHoliday, 'after_update')
+@event.listens_for(NationalHoliday, 'after_delete')
+def _invalidate_archives_for_holiday(mapper, connection, target):
+    # Hari libur menggeser jatuh tempo efektif, sehingga jumlah terlambat/menunggak
+    # di statistik kamar bisa berubah untuk properti dan bulan mana pun
+    _delete_archives(connection, REPORT_ROOM_STATS, None)
+
+
+def invalidate_room_archives(connection, property_ids):
+    """
+    Menghapus arsip statistik kamar properti ini untuk semua bulan. Dipanggil
+    juga oleh perubahan kamar lewat UPDATE langsung (room_rates.change_rates),
+    yang tidak melewati event mapper.
+    """
+    if property_ids:
+        _delete_archives(connection, REPORT_ROOM_STATS, property_ids)
+
+
+def _scheduler_loop():
+    while True:
+        try:
+            with app.app_context(), archive_lock() as acquired:
+                # Worker lain sedang membuat arsip; laporan yang dibuatnya dilewati di putaran berikutnya
+                if acquired:
+                    generate_month_end_reports(*previous_month())
+        except Exception as e:
+            logging.error(f"Scheduler arsip laporan gagal: {e}")
+        time.sleep(SCHEDULER_INTERVAL)
+
+
+def start_report_scheduler():
+    """
+    Menjalankan pembuatan arsip bulan lalu secara berkala di thread latar belakang
+    jika REPORT_SCHEDULER=true. Aman dijalankan di beberapa worker sekaligus:
+    worker yang tidak mendapat archive_lock melewati putaran tersebut.
+    """
+    if os.environ.get('REPORT_SCHEDULER', 'false').lower() != 'true':
+        return None
+    thread = threading.Thread(target=_scheduler_loop, name='report-scheduler', daemon=True)
+    thread.start()
+    logging.info("Scheduler arsip laporan berjalan")
+    return thread
+
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    with app.app_context():
+        db.create_all()
+        if args:
+            target_year, target_month = map(int, args[0].split('-'))
+        else:
+            target_year, target_month = previous_month()
+        # Tunggu worker yang sedang membuat arsip selesai, lalu lewati laporan yang sudah ada
+        with archive_lock(blocking=True):
+            count = generate_month_end_reports(target_year, target_month, force='--force' in sys.argv)
+        print(f'{count} laporan diarsipkan untuk {target_year:04d}-{target_month:02d}')
@@ -0,0 +1,245 @@
+"""
+Data untuk laporan statistik kamar dan keuangan.
+
+Dipakai oleh route ekspor PDF dan oleh arsip laporan (report_archive.py) agar
+laporan yang dibuat terjadwal identik dengan yang dibuat saat diminta.
+"""
+from datetime import date, timedelta
+
+from app import db
+from models import Room, OccupancyRecord, FinancialRecord, month_to_ordinal
+from due_dates import late_payments_for_month, overdue_ids
+
+
+def payment_status_as_of(month_ordinal, today=None):
+    """
+    Tanggal acuan status terlambat/menunggak untuk laporan satu bulan: hari
+    terakhir bulan tersebut jika bulannya sudah lewat, selain itu hari ini.
+    Dengan begitu laporan bulan yang sudah ditutup (termasuk arsipnya) tidak
+    berubah hanya karena waktu berjalan.
+    """
+    today = today or date.today()
+    if month_ordinal >= month_to_ordinal(today.strftime('%Y-%m')):
+        return today
+    year, month_index = divmod(month_ordinal + 1, 12)
+    return date(year, month_index + 1, 1) - timedelta(days=1)
+
+
+def room_stats_data(property_id, month_ordinal):
+    """
+    Statistik kamar satu properti untuk satu bulan (nomor urut bulan)
+    """
+    # Ambil data kamar dan hunian
+    rooms = Room.query.filter(Room.property_id == property_id).all()
+    total_rooms = len(rooms)
+    occupied_rooms = sum(1 for room in rooms if room.status == 'occupied')
+    vacant_rooms = total_rooms - occupied_rooms
+    occupancy_rate = (occupied_rooms / total_rooms * 100) if total_rooms > 0 else 0
+
+    # Nama penyewa bulan ini untuk semua kamar dalam satu query
+    tenant_names = {}
+    for room_id, tenant_name in db.session.query(
+        OccupancyRecord.room_id, OccupancyRecord.tenant_name
+    ).join(Room).filter(
+        Room.property_id == property_id,
+        OccupancyRecord.month_ordinal == month_ordinal
+    ).order_by(OccupancyRecord.id.desc()).all():
+        tenant_names.setdefault(room_id, tenant_name)
+
+    # Get room details with tenant information
+    room_details = []
+    room_types = {}
+
+    for room in rooms:
+        # Count room types
+        if room.room_type in room_types:
+            room_types[room.room_type] += 1
+        else:
+            room_types[room.room_type] = 1
+
+        # Get tenant name if room is occupied
+        tenant_name = tenant_names.get(room.id) if room.status == 'occupied' else None
+
+        room_details.append({
+            'id': room.id,
+            'number': room.number,
+            'room_type': room.room_type,
+            'monthly_rate': room.monthly_rate,
+            'status': room.status,
+            'tenant_name': tenant_name
+        })
+
+    # Get payment status statistics
+    payment_status = {
+        'paid': 0,
+        'unpaid': 0,
+        'late': 0,
+        'overdue': 0
+    }
+
+    occupancy_records = OccupancyRecord.query.join(Room).filter(
+        Room.property_id == property_id,
+        OccupancyRecord.month_ordinal == month_ordinal,
+        OccupancyRecord.is_occupied == True
+    ).all()
+
+    # Catatan belum bayar yang sudah lewat jatuh tempo efektif dihitung sebagai terlambat
+    as_of = payment_status_as_of(month_ordinal)
+    late_records = late_payments_for_month(month_ordinal, [property_id], today=as_of)
+    overdue = overdue_ids(late_records)
+
+    for record in occupancy_records:
+        record_status = record.payment_status
+        if record_status == 'unpaid' and record.id in late_records:
+            record_status = 'late'
+        if record_status in payment_status:
+            payment_status[record_status] += 1
+        if record_status != 'paid' and record.id in overdue:
+            payment_status['overdue'] += 1
+
+    stats_data = {
+        'total_rooms': total_rooms,
+        'occupied_rooms': occupied_rooms,
+        'vacant_rooms': vacant_rooms,
+        'occupancy_rate': occupancy_rate,
+        'room_details': room_details,
+        'room_types': room_types,
+        'payment_status': payment_status,
+        'payment_status_as_of': as_of
+    }
+
+    return stats_data
+
+
+def financial_stats_data(property_id, year):
+    """
+    Statistik keuangan satu tahun. property_id 0 berarti semua properti.
+    """
+    # Tentukan properti yang akan dilihat
+    if property_id:
+        property_filter = FinancialRecord.property_id == property_id
+    else:
+        property_filter = FinancialRecord.id > 0  # All properties
+
+    # Define the date range for the year
+    start_date = date(int(year), 1, 1)
+    end_date = date(int(year), 12, 31)
+
+    # Calculate yearly summary
+    yearly_income = db.session.query(db.func.sum(FinancialRecord.amount)).filter(
+        property_filter,
+        FinancialRecord.transaction_type == 'income',
+        FinancialRecord.transaction_date >= start_date,
+        FinancialRecord.transaction_date <= end_date
+    ).scalar() or 0
+
+    yearly_expense = db.session.query(db.func.sum(FinancialRecord.amount)).filter(
+        property_filter,
+        FinancialRecord.transaction_type == 'expense',
+        FinancialRecord.transaction_date >= start_date,
+        FinancialRecord.transaction_date <= end_date
+    ).scalar() or 0
+
+    yearly_profit = yearly_income - yearly_expense
+
+    # Calculate monthly breakdown
+    monthly_data = []
+    month_names = ['Januari', 'Februari', 'Maret', 'April', 'Mei', 'Juni',
+                  'Juli', 'Agustus', 'September', 'Oktober', 'November', 'Desember']
+
+    highest_income_month = ""
+    highest_income_amount = 0
+    highest_expense_month = ""
+    highest_expense_amount = 0
+    highest_profit_month = ""
+    highest_profit_amount = 0
+
+    for month_num in range(1, 13):
+        month_start = date(int(year), month_num, 1)
+        if month_num == 12:
+            month_end = date(int(year), month_num, 31)
+        else:
+            month_end = date(int(year), month_num + 1, 1) - timedelta(days=1)
+
+        month_income = db.session.query(db.func.sum(FinancialRecord.amount)).filter(
+            property_filter,
+            FinancialRecord.transaction_type == 'income',
+            FinancialRecord.transaction_date >= month_start,
+            FinancialRecord.transaction_date <= month_end
+        ).scalar() or 0
+
+        month_expense = db.session.query(db.func.sum(FinancialRecord.amount)).filter(
+            property_filter,
+            FinancialRecord.transaction_type == 'expense',
+            FinancialRecord.transaction_date >= month_start,
+            FinancialRecord.transaction_date <= month_end
+        ).scalar() or 0
+
+        month_profit = month_income - month_expense
+
+        # Update highest values
+        if month_income > highest_income_amount:
+            highest_income_amount = month_income
+            highest_income_month = month_names[month_num - 1]
+
+        if month_expense > highest_expense_amount:
+            highest_expense_amount = month_expense
+            highest_expense_month = month_names[month_num - 1]
+
+        if month_profit > highest_profit_amount:
+            highest_profit_amount = month_profit
+            highest_profit_month = month_names[month_num - 1]
+
+        monthly_data.append({
+            'month_num': month_num,
+            'month_name': month_names[month_num - 1],
+            'income': month_income,
+            'expense': month_expense,
+            'profit': month_profit
+        })
+
+    # Get income and expense by category
+    income_by_category = db.session.query(
+        FinancialRecord.category,
+        db.func.sum(FinancialRecord.amount)
+    ).filter(
+        property_filter,
+        FinancialRecord.transaction_type == 'income',
+        FinancialRecord.transaction_date >= start_date,
+        FinancialRecord.transaction_date <= end_date
+    ).group_by(FinancialRecord.category).all()
+
+    expense_by_category = db.session.query(
+        FinancialRecord.category,
+        db.func.sum(FinancialRecord.amount)
+    ).filter(
+        property_filter,
+        FinancialRecord.transaction_type == 'expense',
+        FinancialRecord.transaction_date >= start_date,
+        FinancialRecord.transaction_date <= end_date
+    ).group_by(FinancialRecord.category).all()
+
+    # Convert query results to dict
+    income_by_category_dict = {cat: amount for cat, amount in income_by_category}
+    expense_by_category_dict = {cat: amount for cat, amount in expense_by_category}
+
+    stats_data = {
+        'yearly_summary': {
+            'total_income': yearly_income,
+            'total_expense': yearly_expense,
+            'net_profit': yearly_profit
+        },
+        'monthly_data': monthly_data,
+        'income_by_category': income_by_category_dict,
+        'expense_by_category': expense_by_category_dict,
+        'trends': {
+            'highest_income_month': highest_income_month,
+            'highest_income_amount': highest_income_amount,
+            'highest_expense_month': highest_expense_month,
+            'highest_expense_amount': highest_expense_amount,
+            'highest_profit_month': highest_profit_month,
+            'highest_profit_amount': highest_profit_amount
+        }
+    }
+
+    return stats_data
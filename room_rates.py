@@ -0,0 +1,299 @@
+"""
+Perubahan tarif kamar secara massal.
+
+Tarif beberapa kamar (satu properti, satu tipe kamar atau daftar kamar
+tertentu) diubah dengan satu pernyataan UPDATE di dalam satu transaksi,
+lalu riwayatnya dicatat di room_rates. Setiap kamar memiliki kolom version:
+UPDATE hanya mengenai baris yang versinya masih sama dengan yang dibaca
+(atau dikirim) klien. Jika ada kamar yang sudah diubah orang lain, seluruh
+perubahan dibatalkan dan RateConflict berisi versi terbaru dikembalikan.
+
+Riwayat tarif (room_rates, berlaku mulai effective_from) dipakai untuk
+menghitung pendapatan pada tarif yang berlaku di bulan tersebut, bukan tarif
+kamar saat ini: rates_for() menjawab banyak pasangan (kamar, bulan) dengan
+satu query. Room.monthly_rate menyimpan tarif yang berlaku saat ini: perubahan
+yang dijadwalkan untuk bulan depan atau lebih baru hanya dicatat di room_rates.
+"""
+from bisect import bisect_right
+from datetime import datetime
+
+from sqlalchemy import case, func, select
+
+from app import db
+from models import Room, RoomRate, bump_data_versions, month_to_ordinal
+
+
+class RateChangeError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+class RateConflict(RateChangeError):
+    def __init__(self, conflicts):
+        super().__init__('Tarif sebagian kamar sudah diubah pengguna lain. Muat ulang data lalu coba lagi.', 409)
+        self.conflicts = conflicts
+
+
+def parse_rate(value):
+    """
+    Mengubah nilai rupiah ('Rp 1.500.000', '1500000' atau angka) menjadi integer
+    """
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        return int(str(value).replace('.', '').replace('Rp', '').strip())
+    except ValueError:
+        raise RateChangeError(f'Tarif tidak valid: {value}')
+
+
+def _new_rate(current, rate=None, percent=None, amount=None, round_to=1):
+    if rate is not None:
+        new_rate = rate
+    elif percent is not None:
+        new_rate = current * (100 + percent) / 100
+    else:
+        new_rate = current + amount
+    return int(round(new_rate / round_to)) * round_to
+
+
+def _current_month():
+    return month_to_ordinal(datetime.now().strftime('%Y-%m'))
+
+
+def _latest_effective(room_ids):
+    """
+    {room_id: effective_from riwayat tarif terbaru yang sudah berlaku} untuk
+    kamar yang punya riwayat (perubahan terjadwal tidak dihitung)
+    """
+    if not room_ids:
+        return {}
+    return dict(db.session.execute(
+        select(RoomRate.room_id, func.max(RoomRate.effective_from))
+        .where(RoomRate.room_id.in_(room_ids), RoomRate.effective_from <= _current_month())
+        .group_by(RoomRate.room_id)
+    ).all())
+
+
+def _applies_now(effective_from, latest_effective):
+    # Tarif kamar saat ini hanya diganti oleh perubahan yang sudah berlaku dan
+    # tidak lebih lama dari riwayat terbaru yang berlaku bulan ini
+    return (effective_from <= _current_month()
+            and (latest_effective is None or effective_from >= latest_effective))
+
+
+def change_rates(property_ids, *, property_id=None, room_type=None, room_ids=None,
+                 rate=None, percent=None, amount=None, round_to=1,
+                 versions=None, effective_from=None, user_id=None):
+    """
+    Mengubah tarif kamar yang dipilih (property_id, room_type dan/atau room_ids)
+    di dalam properti yang dapat diakses (property_ids).
+
+    Tarif baru: rate (nilai tetap), percent (kenaikan persen) atau amount
+    (kenaikan rupiah), dibulatkan ke kelipatan round_to. versions berisi
+    {room_id: version} yang dilihat klien; tanpa versions dipakai versi yang
+    dibaca di transaksi ini. effective_from ('YYYY-MM') dicatat di riwayat,
+    bawaan bulan ini; perubahan yang berlaku mulai bulan depan tidak mengubah
+    Room.monthly_rate.
+
+    Mengembalikan daftar perubahan per kamar. Tidak melakukan commit.
+    """
+    if room_ids is not None and not isinstance(room_ids, (list, tuple)):
+        raise RateChangeError('room_ids harus berupa daftar id kamar')
+    try:
+        property_id = int(property_id) if property_id is not None else None
+        room_ids = [int(room_id) for room_id in room_ids or ()]
+        percent = float(percent) if percent is not None else None
+        versions = {int(room_id): int(version) for room_id, version in (versions or {}).items()}
+        round_to = int(round_to) if round_to is not None else 1
+    except (TypeError, ValueError, AttributeError):
+        raise RateChangeError('property_id, room_ids, percent, round_to dan versions harus berupa angka')
+    if round_to < 1:
+        raise RateChangeError('round_to minimal 1')
+    if sum(value is not None for value in (rate, percent, amount)) != 1:
+        raise RateChangeError('Isi salah satu: rate, percent atau amount')
+    if property_id is None and room_type is None and not room_ids:
+        raise RateChangeError('Pilih kamar berdasarkan property_id, room_type atau room_ids')
+    if property_id is not None and property_id not in property_ids:
+        raise RateChangeError('Anda tidak memiliki akses ke properti ini', 403)
+
+    try:
+        effective_from = month_to_ordinal(effective_from or datetime.now().strftime('%Y-%m'))
+    except ValueError:
+        raise RateChangeError('Format bulan tidak valid. Gunakan format YYYY-MM.')
+
+    query = select(Room.id, Room.number, Room.property_id, Room.monthly_rate, Room.version)
+    if room_type is not None and not room_ids:
+        # Pilihan berdasarkan tipe kamar hanya mencakup properti yang dapat diakses
+        query = query.where(Room.property_id.in_(property_ids))
+    if property_id is not None:
+        query = query.where(Room.property_id == property_id)
+    if room_type is not None:
+        query = query.where(Room.room_type == room_type)
+    if room_ids:
+        query = query.where(Room.id.in_(room_ids))
+    rooms = db.session.execute(query.order_by(Room.id)).all()
+
+    if any(room.property_id not in property_ids for room in rooms):
+        raise RateChangeError('Anda tidak memiliki akses ke sebagian kamar yang dipilih', 403)
+    if room_ids and len(rooms) != len(set(room_ids)):
+        missing = sorted(set(room_ids) - {room.id for room in rooms})
+        raise RateChangeError(f'Kamar tidak ditemukan: {missing}', 404)
+    if not rooms:
+        raise RateChangeError('Tidak ada kamar yang cocok', 404)
+
+    # Tarif lama = tarif yang berlaku di bulan effective_from (termasuk perubahan terjadwal)
+    effective_rates = rates_for((room.id, effective_from) for room in rooms)
+    latest = _latest_effective([room.id for room in rooms])
+    changes = []
+    for room in rooms:
+        old_rate = effective_rates.get((room.id, effective_from), room.monthly_rate) or 0
+        new_rate = _new_rate(old_rate, rate, percent, amount, round_to)
+        if new_rate < 0:
+            raise RateChangeError(f'Tarif kamar {room.number} menjadi negatif')
+        changes.append({
+            'room_id': room.id,
+            'number': room.number,
+            'property_id': room.property_id,
+            'old_rate': old_rate,
+            'new_rate': new_rate,
+            'expected_version': versions.get(room.id, room.version),
+            'applies_now': _applies_now(effective_from, latest.get(room.id)),
+        })
+
+    # Satu UPDATE untuk semua kamar: tarif per kamar lewat CASE, dan hanya baris
+    # yang versinya masih sama dengan yang diharapkan yang ikut berubah.
+    # Perubahan terjadwal hanya menaikkan versi; tarifnya dicatat di riwayat.
+    table = Room.__table__
+    values = {'version': table.c.version + 1}
+    current_rates = {change['room_id']: change['new_rate'] for change in changes if change['applies_now']}
+    if current_rates:
+        values['monthly_rate'] = case(current_rates, value=table.c.id, else_=table.c.monthly_rate)
+    result = db.session.execute(
+        table.update()
+        .where(table.c.id.in_([change['room_id'] for change in changes]))
+        .where(table.c.version == case(
+            {change['room_id']: change['expected_version'] for change in changes}, value=table.c.id))
+        .values(**values)
+    )
+    if result.rowcount != len(changes):
+        db.session.rollback()
+        current = dict(db.session.execute(
+            select(Room.id, Room.version).where(Room.id.in_([change['room_id'] for change in changes]))
+        ).all())
+        raise RateConflict([
+            {'room_id': change['room_id'], 'expected_version': change['expected_version'],
+             'version': current.get(change['room_id'])}
+            for change in changes if current.get(change['room_id']) != change['expected_version']
+        ])
+
+    now = datetime.utcnow()
+    db.session.execute(RoomRate.__table__.insert(), [{
+        'room_id': change['room_id'],
+        'rate': change['new_rate'],
+        'previous_rate': change['old_rate'],
+        'effective_from': effective_from,
+        'changed_by': user_id,
+        'changed_at': now,
+    } for change in changes])
+    # UPDATE langsung tidak melewati hook after_flush, jadi versi data properti dinaikkan di sini
+    bump_data_versions(db.session.connection(), {change['property_id'] for change in changes})
+    from report_archive import invalidate_room_archives
+    invalidate_room_archives(db.session.connection(), {change['property_id'] for change in changes})
+
+    for change in changes:
+        change['version'] = change.pop('expected_version') + 1
+        change.pop('applies_now')
+    return changes
+
+
+def record_rate(room, rate, effective_from, user_id=None):
+    """
+    Mengubah tarif satu kamar (objek ORM) mulai bulan effective_from (nomor urut
+    bulan) dan mencatat riwayatnya. Room.monthly_rate hanya diganti jika
+    perubahan ini yang berlaku bulan ini (bukan data mundur atau terjadwal).
+    Tidak melakukan apa pun jika tarif yang berlaku di bulan itu sudah sama.
+    Tidak melakukan commit.
+    """
+    previous_rate = rate_for(room.id, effective_from) if room.id else None
+    if previous_rate == rate:
+        return None
+    latest = _latest_effective([room.id]).get(room.id) if room.id else None
+    if _applies_now(effective_from, latest):
+        room.monthly_rate = rate
+    room.version = (room.version or 0) + 1
+    history = RoomRate(
+        room=room,
+        rate=rate,
+        previous_rate=previous_rate,
+        effective_from=effective_from,
+        changed_by=user_id,
+        changed_at=datetime.utcnow()
+    )
+    db.session.add(history)
+    return history
+
+
+def rates_for(pairs):
+    """
+    Tarif yang berlaku untuk setiap pasangan (room_id, nomor urut bulan), dalam
+    satu query (indeks idx_room_rates_room_effective). Mengembalikan
+    {(room_id, bulan): tarif}.
+
+    Sebelum riwayat pertama kamar berlaku previous_rate riwayat itu; kamar tanpa
+    riwayat memakai Room.monthly_rate. Pasangan dengan kamar yang tidak ada
+    tidak dimasukkan ke hasil.
+    """
+    pairs = set(pairs)
+    if not pairs:
+        return {}
+    room_ids = {room_id for room_id, _ in pairs}
+
+    rows = db.session.execute(
+        select(Room.id, Room.monthly_rate, RoomRate.effective_from, RoomRate.rate, RoomRate.previous_rate)
+        .outerjoin(RoomRate, RoomRate.room_id == Room.id)
+        .where(Room.id.in_(room_ids))
+        .order_by(Room.id, RoomRate.effective_from, RoomRate.id)
+    ).all()
+
+    # {room_id: [tarif sebelum riwayat pertama, [effective_from...], [tarif...]]}
+    timelines = {}
+    for room_id, monthly_rate, effective_from, rate, previous_rate in rows:
+        timeline = timelines.setdefault(room_id, [monthly_rate or 0, [], []])
+        if effective_from is None:
+            continue
+        months, rates = timeline[1], timeline[2]
+        if not months:
+            timeline[0] = previous_rate if previous_rate is not None else rate
+        # Beberapa perubahan di bulan yang sama: yang terakhir dicatat berlaku
+        if months and months[-1] == effective_from:
+            rates[-1] = rate
+        else:
+            months.append(effective_from)
+            rates.append(rate)
+
+    resolved = {}
+    for room_id, month in pairs:
+        if room_id not in timelines:
+            continue
+        base, months, rates = timelines[room_id]
+        position = bisect_right(months, month)
+        resolved[(room_id, month)] = rates[position - 1] if position else base
+    return resolved
+
+
+def rate_for(room_id, month_ordinal):
+    """
+    Tarif yang berlaku untuk satu kamar di satu bulan (nomor urut bulan)
+    """
+    return rates_for([(room_id, month_ordinal)]).get((room_id, month_ordinal))
+
+
+def rate_history(room_id):
+    """
+    Riwayat tarif satu kamar, dari yang terbaru
+    """
+    return RoomRate.query.filter_by(room_id=room_id).order_by(
+        RoomRate.effective_from.desc(), RoomRate.id.desc()
+    ).all()
@@ -0,0 +1,109 @@
+"""
+Pencarian kamar dan pemberian nomor kamar baru.
+
+Kamar dicari berdasarkan id (primary key) atau nomor kamar di properti
+tersebut (indeks unik uq_rooms_property_number), bukan "kamar pertama dengan
+tipe ini".
+
+Nomor kamar baru berbentuk '<3 huruf properti>-<3 huruf tipe>-<urut>', mis.
+'ANT-Sta-12'. Nomor urutnya diambil dari tabel room_number_sequences dengan
+UPDATE ... SET next_value = next_value + 1: baris urutan terkunci sampai
+transaksi selesai, jadi dua request bersamaan tidak pernah mendapat nomor
+yang sama, dan tidak perlu menghitung seluruh tabel kamar.
+"""
+import re
+
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from models import Room, RoomNumberSequence
+
+
+def find_room(property_id, room_id=None, number=None):
+    """
+    Kamar di properti ini berdasarkan id atau nomor kamar; None jika tidak ada
+    """
+    if room_id is not None:
+        room = db.session.get(Room, room_id)
+        return room if room is not None and room.property_id == property_id else None
+    if number:
+        return Room.query.filter_by(property_id=property_id, number=number.strip()).first()
+    return None
+
+
+def room_number_prefix(property_name, room_type):
+    return f"{property_name[:3]}-{room_type[:3]}"
+
+
+def _highest_suffix(property_id, prefix):
+    # Nomor urut terbesar yang sudah dipakai (untuk kamar yang dibuat sebelum ada tabel urutan)
+    numbers = db.session.execute(
+        select(Room.number).where(Room.property_id == property_id, Room.number.like(f'{prefix}-%'))
+    ).scalars()
+    pattern = re.compile(rf'^{re.escape(prefix)}-(\d+)$')
+    return max((int(match.group(1)) for match in map(pattern.match, numbers) if match), default=0)
+
+
+def allocate_room_number(property_obj, room_type):
+    """
+    Mengambil nomor kamar berikutnya untuk properti dan tipe kamar ini.
+    Harus dipanggil di dalam transaksi yang juga menyimpan kamar barunya.
+    """
+    prefix = room_number_prefix(property_obj.name, room_type)
+    table = RoomNumberSequence.__table__
+    condition = (table.c.property_id == property_obj.id) & (table.c.prefix == prefix)
+
+    for _ in range(2):
+        if db.session.execute(table.update().where(condition).values(next_value=table.c.next_value + 1)).rowcount:
+            value = db.session.execute(select(table.c.next_value - 1).where(condition)).scalar_one()
+            return f'{prefix}-{value}'
+
+        # Urutan pertama untuk awalan ini: mulai setelah nomor terbesar yang sudah ada
+        value = _highest_suffix(property_obj.id, prefix) + 1
+        try:
+            with db.session.begin_nested():
+                db.session.execute(table.insert().values(property_id=property_obj.id, prefix=prefix, next_value=value + 1))
+            return f'{prefix}-{value}'
+        except IntegrityError:
+            # Request lain membuat baris urutan lebih dulu; ambil nomor lewat UPDATE
+            continue
+    raise RuntimeError(f'Gagal mengambil nomor kamar untuk {prefix}')
+
+
+def create_room(property_obj, room_type, monthly_rate=0, status='available'):
+    """
+    Membuat kamar baru dengan nomor dari allocate_room_number (di-flush, belum di-commit)
+    """
+    room = Room(
+        number=allocate_room_number(property_obj, room_type),
+        property_id=property_obj.id,
+        room_type=room_type,
+        status=status,
+        monthly_rate=monthly_rate
+    )
+    db.session.add(room)
+    db.session.flush()
+    return room
+
+
+def deduplicate_room_numbers():
+    """
+    Mengganti nomor kamar ganda dalam satu properti (sebelum indeks unik dibuat):
+    kamar tertua mempertahankan nomornya, yang lain diberi akhiran '-<id>'
+    """
+    duplicates = db.session.execute(
+        select(Room.property_id, Room.number)
+        .group_by(Room.property_id, Room.number)
+        .having(func.count(Room.id) > 1)
+    ).all()
+    renamed = 0
+    for property_id, number in duplicates:
+        rooms = Room.query.filter_by(property_id=property_id, number=number).order_by(Room.id).all()
+        for room in rooms[1:]:
+            room.number = f'{number}-{room.id}'
+            renamed += 1
+    # Selalu diakhiri: transaksi baca yang terbuka di SQLite WAL tidak bisa menulis
+    # setelah create_missing_indexes menulis lewat koneksi lain
+    db.session.commit()
+    return renamed
@@ -3,8 +3,7 @@ import base64
 import calendar
 import logging
 from datetime import datetime, date, timedelta
-from collections import defaultdict
-from functools import wraps
+from functools import wraps, lru_cache
 
 import matplotlib
 matplotlib.use('Agg')  # Use non-interactive backend
@@ -14,12 +13,31 @@ from matplotlib.ticker import FuncFormatter
 from flask import render_template, request, redirect, url_for, flash, session, jsonify, g
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash
+from sqlalchemy.exc import IntegrityError
 
 from app import app, db
-from models import User, Property, Room, OccupancyRecord, FinancialRecord, NationalHoliday
+from models import (User, Property, Room, OccupancyRecord, FinancialRecord, NationalHoliday,
+                    month_to_ordinal, ordinal_to_month, date_to_ordinal)
 from auth_helpers import role_required, admin_required, manager_required, staff_required, property_access_required, get_user_properties
 from pdf_generator import (generate_occupancy_pdf, generate_finance_pdf, 
                           generate_room_stats_pdf, generate_financial_stats_pdf)
+from calendar_service import get_daily_totals, get_day_transactions, month_range
+from holiday_service import holidays_in_month
+from due_dates import late_payments_for_month, overdue_ids, OVERDUE_AFTER_DAYS
+from receivables import remove_receivable, arrears_report, outstanding_by_tenant
+from coverage import paid_coverage_for_month
+from tenants import get_or_create_tenant, search_tenants, get_tenant, tenant_history, tenant_balance
+from search import search as search_records, load_search_results, KIND_CODES
+from data_version import version_token, get_data_versions
+import fragment_cache  # noqa: F401  (mendaftarkan tag {% cache %} di Jinja)
+from cache_backend import cache
+from http_cache import etag_cached
+from database import read_replica, retry_on_locked, pool_stats
+from forecasting import forecast_revenue, DEFAULT_MONTHS, MAX_MONTHS
+from payments import (update_payment, settle_payment, processed_request, remember_request, idempotency_key_from,
+                      PaymentError, ACTION_NEW_OCCUPANCY)
+from rooms import find_room, create_room
+from room_rates import change_rates, parse_rate, record_rate, rates_for, rate_history, RateChangeError, RateConflict
 
 # Setup Login Manager
 login_manager = LoginManager()
@@ -31,6 +49,9 @@ def load_user(user_id):
     return db.session.get(User, int(user_id))
 
 # Format rupiah function
+# Nominal yang sama (tarif kamar, total) muncul berulang di setiap baris tabel,
+# jadi hasil format disimpan agar tidak diformat ulang setiap kali
+@lru_cache(maxsize=4096)
 def format_rupiah(value):
     return f"Rp {value:,.0f}".replace(",", ".")
 
@@ -42,6 +63,10 @@ app.jinja_env.filters['rupiah'] = format_rupiah
 def inject_now():
     return {'now': datetime.now()}
 
+# Nama bulan dalam Bahasa Indonesia
+MONTH_NAMES_ID = ['Januari', 'Februari', 'Maret', 'April', 'Mei', 'Juni',
+                  'Juli', 'Agustus', 'September', 'Oktober', 'November', 'Desember']
+
 # Formatter for matplotlib
 def rupiah_formatter(x, pos):
     return f'Rp{x/1000:.0f}K'
@@ -248,21 +273,9 @@ def dashboard():
     property_count = len(accessible_properties)
     
     # Get current month for filtering
-    current_month = datetime.now().strftime('%Y-%m')
-    start_date = datetime.strptime(f'{current_month}-01', '%Y-%m-%d').date()
-    
-    # Get next month to calculate end date
-    year = int(current_month.split('-')[0])
-    month = int(current_month.split('-')[1])
-    
-    if month == 12:
-        next_year = year + 1
-        next_month = 1
-    else:
-        next_year = year
-        next_month = month + 1
-        
-    end_date = datetime.strptime(f'{next_year}-{next_month:02d}-01', '%Y-%m-%d').date()
+    today = date.today()
+    current_month_ordinal = date_to_ordinal(today)
+    start_date, end_date = month_range(today.year, today.month)
     
     # Filter data berdasarkan properti yang dapat diakses pengguna
     if current_user.is_admin:
@@ -317,6 +330,11 @@ def dashboard():
     else:
         occupancy_rate = (occupied_rooms / total_rooms * 100)
     
+    # Jumlah pembayaran terlambat bulan ini (memperhitungkan akhir pekan dan hari libur)
+    late_records = late_payments_for_month(current_month_ordinal, accessible_property_ids)
+    late_payment_count = len(late_records)
+    overdue_payment_count = len(overdue_ids(late_records))
+    
     return render_template(
         'dashboard.html',
         properties=accessible_properties,
@@ -325,11 +343,16 @@ def dashboard():
         income=income,
         expense=expense,
         profit=income-expense,
-        occupancy_rate=occupancy_rate
+        occupancy_rate=occupancy_rate,
+        late_payment_count=late_payment_count,
+        overdue_payment_count=overdue_payment_count,
+        overdue_after_days=OVERDUE_AFTER_DAYS,
+        data_version=version_token(accessible_property_ids)
     )
 
 # Room management routes
 @app.route('/input_occupancy', methods=['GET', 'POST'])
+@retry_on_locked
 @login_required
 @staff_required  # Hanya Admin, Manager, dan Staff yang dapat mengakses
 def input_occupancy():
@@ -346,8 +369,24 @@ def input_occupancy():
                 flash('Anda tidak memiliki akses untuk properti ini', 'danger')
                 return redirect(url_for('dashboard'))
         
+        # Form yang sama terkirim dua kali (klik ganda, kirim ulang): jangan simpan lagi
+        idempotency_key = idempotency_key_from(request)
+        try:
+            replayed = processed_request(idempotency_key, current_user.id, ACTION_NEW_OCCUPANCY)
+        except PaymentError as e:
+            # Kunci yang sama dipakai untuk data lain (klien API)
+            return jsonify({'success': False, 'message': e.message}), e.status
+        if replayed:
+            flash('Data hunian ini sudah disimpan sebelumnya', 'info')
+            return redirect(url_for('input_occupancy'))
+        
         room_type = request.form.get('room_type')
-        month = request.form.get('month')
+        month = (request.form.get('month') or '').strip()
+        try:
+            month_ordinal = month_to_ordinal(month)
+        except ValueError:
+            flash('Format bulan tidak valid. Gunakan format YYYY-MM.', 'danger')
+            return redirect(url_for('input_occupancy'))
         is_occupied = 'is_occupied' in request.form
         tenant_name = request.form.get('tenant_name', '')
         notes = request.form.get('notes', '')
@@ -358,30 +397,33 @@ def input_occupancy():
         except ValueError:
             monthly_rate = 0
         
-        # Get or create the room
-        room = Room.query.filter_by(property_id=property_id, room_type=room_type).first()
+        # Kamar dipilih dengan id (atau nomor kamar); 'new' membuat kamar baru bernomor urut
+        property_obj = db.session.get(Property, int(property_id)) if (property_id or '').isdigit() else None
+        if not property_obj:
+            flash('Property tidak ditemukan', 'danger')
+            return redirect(url_for('input_occupancy'))
         
-        if not room:
-            # Create a new room
-            property_obj = Property.query.get(property_id)
-            if property_obj:
-                room_number = f"{property_obj.name[:3]}-{room_type[:3]}-{Room.query.count() + 1}"
-                room = Room(
-                    number=room_number,
-                    property_id=property_id,
-                    room_type=room_type,
-                    status='occupied' if is_occupied else 'available',
-                    monthly_rate=monthly_rate
-                )
-                db.session.add(room)
-                db.session.flush()  # To get the room.id
-            else:
-                flash('Property tidak ditemukan', 'danger')
+        room_id = request.form.get('room_id', '').strip()
+        room_number = request.form.get('room_number', '').strip()
+        if room_id == 'new':
+            if not room_type:
+                flash('Pilih tipe kamar untuk kamar baru', 'danger')
                 return redirect(url_for('input_occupancy'))
-        else:
-            # Update existing room status and rate
+            room = create_room(property_obj, room_type, monthly_rate,
+                               status='occupied' if is_occupied else 'available')
+        elif room_id or room_number:
+            room = find_room(property_obj.id,
+                             room_id=int(room_id) if room_id.isdigit() else None,
+                             number=room_number)
+            if not room:
+                flash('Kamar tidak ditemukan di properti ini', 'danger')
+                return redirect(url_for('input_occupancy'))
+            # Update existing room status and rate (tarif dicatat di riwayat mulai bulan ini)
             room.status = 'occupied' if is_occupied else 'available'
-            room.monthly_rate = monthly_rate
+            record_rate(room, monthly_rate, month_ordinal, current_user.id)
+        else:
+            flash('Pilih kamar atau pilih "Kamar baru"', 'danger')
+            return redirect(url_for('input_occupancy'))
         
         # Get payment status fields if room is occupied
         payment_status = 'unpaid'
@@ -408,12 +450,16 @@ def input_occupancy():
             except ValueError:
                 payment_months = 1
         
+        # Hubungkan ke data penyewa (dibuat otomatis jika belum ada)
+        tenant = get_or_create_tenant(tenant_name) if is_occupied else None
+        
         # Create occupancy record
         occupancy = OccupancyRecord(
             room_id=room.id,
             month=month,
             is_occupied=is_occupied,
             tenant_name=tenant_name,
+            tenant_id=tenant.id if tenant else None,
             notes=notes,
             payment_status=payment_status,
             payment_due_date=payment_due_date,
@@ -422,35 +468,30 @@ def input_occupancy():
         )
         
         db.session.add(occupancy)
+        db.session.flush()  # To get the occupancy.id
         
-        # Jika status pembayaran adalah 'paid', tambahkan catatan finansial
-        if is_occupied and payment_status == 'paid':
-            # Dapatkan data kamar dan properti
-            amount = monthly_rate * payment_months
-            payment_date = datetime.now().date()
-            
-            # Pastikan property_id tersedia
-            if hasattr(room, 'property_id') and room.property_id:
-                property_id_for_record = room.property_id
-            else:
-                property_id_for_record = property_id
-                
-            # Buat catatan finansial untuk pembayaran sewa
-            financial_record = FinancialRecord(
-                property_id=property_id_for_record,
-                transaction_date=payment_date,
-                amount=amount,
-                transaction_type='income',
-                category='Sewa',
-                description=f'Pembayaran sewa kamar {room.number} ({room.room_type}) oleh {tenant_name} untuk {payment_months} bulan',
-                created_by=current_user.id
-            )
-            
-            db.session.add(financial_record)
-            flash(f'Catatan keuangan untuk pembayaran sewa telah dibuat: Rp {amount:,}', 'success')
+        # Catatan keuangan (jika sudah dibayar) dan piutang untuk hunian ini
+        income = settle_payment(occupancy, room, None, current_user.id)
+        remember_request(idempotency_key, ACTION_NEW_OCCUPANCY, occupancy, income, current_user.id)
+        income_amount = income.amount if income is not None else None
         
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Kunci idempotensi yang sama sudah di-commit oleh request lain
+            db.session.rollback()
+            try:
+                replayed = processed_request(idempotency_key, current_user.id, ACTION_NEW_OCCUPANCY)
+            except PaymentError as e:
+                return jsonify({'success': False, 'message': e.message}), e.status
+            if not replayed:
+                raise
+            flash('Data hunian ini sudah disimpan sebelumnya', 'info')
+            return redirect(url_for('input_occupancy'))
         
+        # Pesan dikirim setelah commit agar tidak dobel jika transaksi diulang (@retry_on_locked)
+        if income_amount is not None:
+            flash(f'Catatan keuangan untuk pembayaran sewa telah dibuat: Rp {income_amount:,}', 'success')
         flash('Data hunian berhasil disimpan', 'success')
         return redirect(url_for('input_occupancy'))
     
@@ -475,9 +516,9 @@ def manage_occupancy():
         ).join(
             Property, Room.property_id == Property.id
         ).order_by(
-            OccupancyRecord.month.desc(), 
+            OccupancyRecord.month_ordinal.desc(), 
             Property.name
-        ).all()
+        )
     else:
         # Filter data berdasarkan properti yang dapat diakses
         records = db.session.query(
@@ -489,13 +530,16 @@ def manage_occupancy():
         ).filter(
             Property.id.in_(accessible_property_ids)
         ).order_by(
-            OccupancyRecord.month.desc(), 
+            OccupancyRecord.month_ordinal.desc(), 
             Property.name
-        ).all()
+        )
     
-    return render_template('manage_occupancy.html', records=records, properties=accessible_properties)
+    # Query baru dijalankan saat tabel dirender, sehingga tidak dijalankan jika tabel diambil dari cache
+    return render_template('manage_occupancy.html', records=records, properties=accessible_properties,
+                           data_version=version_token(accessible_property_ids))
 
 @app.route('/delete_occupancy/<int:record_id>', methods=['POST'])
+@retry_on_locked
 @login_required
 @manager_required  # Hanya Admin dan Manager yang dapat menghapus data
 def delete_occupancy(record_id):
@@ -521,6 +565,9 @@ def delete_occupancy(record_id):
         flash('Anda tidak memiliki izin untuk menghapus data ini', 'danger')
         return redirect(url_for('manage_occupancy'))
     
+    remove_receivable(record)
+    # Pemasukan sewa tetap tercatat, hanya tautannya ke hunian yang dilepas
+    FinancialRecord.query.filter_by(occupancy_id=record.id).update({'occupancy_id': None})
     db.session.delete(record)
     db.session.commit()
     
@@ -529,6 +576,7 @@ def delete_occupancy(record_id):
 
 # Financial management routes
 @app.route('/input_finance', methods=['GET', 'POST'])
+@retry_on_locked
 @login_required
 @staff_required  # Hanya Admin, Manager, dan Staff yang dapat mengakses
 def input_finance():
@@ -603,6 +651,7 @@ def manage_finance():
     return render_template('manage_finance.html', records=records, properties=accessible_properties)
 
 @app.route('/delete_finance/<int:record_id>', methods=['POST'])
+@retry_on_locked
 @login_required
 def delete_finance(record_id):
     record = FinancialRecord.query.get_or_404(record_id)
@@ -633,15 +682,12 @@ def delete_finance(record_id):
 def reports():
     return render_template('reports.html')
 
-@app.route('/room_stats')
-@login_required
-def room_stats():
-    # Dapatkan properti yang dapat diakses oleh pengguna
-    accessible_properties = get_user_properties()
-    accessible_property_ids = [prop.id for prop in accessible_properties]
-    
+def _build_room_stats(accessible_property_ids, is_admin, current_year):
+    """
+    Menghitung data dan grafik statistik kamar (disimpan di cache bersama)
+    """
     # Filter room berdasarkan properti yang dapat diakses
-    if current_user.is_admin:
+    if is_admin:
         # Get room stats by type (all properties)
         room_types = db.session.query(Room.room_type, db.func.count(Room.id)).group_by(Room.room_type).all()
     else:
@@ -649,38 +695,30 @@ def room_stats():
         room_types = db.session.query(Room.room_type, db.func.count(Room.id)).filter(
             Room.property_id.in_(accessible_property_ids)
         ).group_by(Room.room_type).all()
+    room_types = [tuple(rt) for rt in room_types]
+    
+    # Get occupancy rate by month and room type (satu query GROUP BY untuk seluruh tahun)
+    months = [f"{i:02d}" for i in range(1, 13)]
+    year_start = current_year * 12
+    
+    occupancy_query = db.session.query(
+        Room.room_type,
+        OccupancyRecord.month_ordinal,
+        db.func.count(OccupancyRecord.id),
+        db.func.sum(db.case((OccupancyRecord.is_occupied == True, 1), else_=0))
+    ).join(Room).filter(
+        OccupancyRecord.month_ordinal >= year_start,
+        OccupancyRecord.month_ordinal < year_start + 12
+    )
+    if not is_admin:
+        occupancy_query = occupancy_query.filter(Room.property_id.in_(accessible_property_ids))
     
-    # Get occupancy rate by month and room type
-    current_year = datetime.now().year
-    months = []
-    for i in range(1, 13):
-        month_str = f"{current_year}-{i:02d}"
-        months.append(month_str)
-    
-    occupancy_data = {}
     room_types_list = [rt[0] for rt in room_types]
+    occupancy_data = {room_type: [0] * 12 for room_type in room_types_list}
     
-    for room_type in room_types_list:
-        occupancy_data[room_type] = []
-        for month in months:
-            # Get occupancy records for this month and room type
-            if current_user.is_admin:
-                records = db.session.query(OccupancyRecord).join(Room).filter(
-                    Room.room_type == room_type,
-                    OccupancyRecord.month == month
-                ).all()
-            else:
-                records = db.session.query(OccupancyRecord).join(Room).filter(
-                    Room.room_type == room_type,
-                    OccupancyRecord.month == month,
-                    Room.property_id.in_(accessible_property_ids)
-                ).all()
-            
-            occupied = sum(1 for r in records if r.is_occupied)
-            total = len(records) if records else 0
-            
-            occupancy_rate = (occupied / total * 100) if total > 0 else 0
-            occupancy_data[room_type].append(occupancy_rate)
+    for room_type, month_ordinal, total, occupied in occupancy_query.group_by(Room.room_type, OccupancyRecord.month_ordinal).all():
+        if room_type in occupancy_data and total:
+            occupancy_data[room_type][month_ordinal - year_start] = (occupied or 0) / total * 100
     
     # Generate room stats chart
     plt.figure(figsize=(10, 6))
@@ -700,7 +738,7 @@ def room_stats():
     plt.figure(figsize=(12, 6))
     for i, room_type in enumerate(room_types_list):
         plt.plot(
-            [m.split('-')[1] for m in months],  # Just show month number
+            months,  # Just show month number
             occupancy_data[room_type],
             marker='o',
             label=room_type
@@ -719,24 +757,36 @@ def room_stats():
     occupancy_plot = base64.b64encode(occupancy_img.getvalue()).decode()
     plt.close()
     
-    return render_template(
-        'room_stats.html',
+    return dict(
         room_stats_plot=room_stats_plot,
         occupancy_plot=occupancy_plot,
         room_types=room_types,
         occupancy_data=occupancy_data,
-        months=[m.split('-')[1] for m in months]
+        months=months
     )
 
-@app.route('/financial_stats')
+@app.route('/room_stats')
 @login_required
-def financial_stats():
+@read_replica
+@etag_cached()
+def room_stats():
     # Dapatkan properti yang dapat diakses oleh pengguna
     accessible_properties = get_user_properties()
     accessible_property_ids = [prop.id for prop in accessible_properties]
     
-    # Get income and expense by month
+    # Grafik matplotlib mahal dibuat; hasilnya dipakai ulang sampai data properti berubah
     current_year = datetime.now().year
+    scope = 'all' if current_user.is_admin else 'own'
+    key = f'room-stats:{current_year}:{scope}:{version_token(accessible_property_ids)}'
+    stats = cache.get_or_set(key, lambda: _build_room_stats(accessible_property_ids, current_user.is_admin, current_year))
+    
+    return render_template('room_stats.html', **stats)
+
+def _build_financial_stats(accessible_property_ids, is_admin, current_year):
+    """
+    Menghitung data dan grafik statistik keuangan (disimpan di cache bersama)
+    """
+    # Get income and expense by month
     months = []
     income_by_month = []
     expense_by_month = []
@@ -752,7 +802,7 @@ def financial_stats():
             end_date = datetime.strptime(f'{current_year}-{i+1:02d}-01', '%Y-%m-%d').date()
         
         # Query income and expense for this month
-        if current_user.is_admin:
+        if is_admin:
             # Admin melihat data semua properti
             income = db.session.query(db.func.sum(FinancialRecord.amount)).filter(
                 FinancialRecord.transaction_type == 'income',
@@ -806,7 +856,7 @@ def financial_stats():
     plt.close()
     
     # Get income and expense by category
-    if current_user.is_admin:
+    if is_admin:
         # Admin melihat semua data
         income_by_category = db.session.query(
             FinancialRecord.category,
@@ -881,8 +931,7 @@ def financial_stats():
     expense_category_plot = base64.b64encode(expense_category_img.getvalue()).decode()
     plt.close()
     
-    return render_template(
-        'financial_stats.html',
+    return dict(
         income_expense_plot=income_expense_plot,
         income_category_plot=income_category_plot,
         expense_category_plot=expense_category_plot,
@@ -891,8 +940,76 @@ def financial_stats():
         expense_by_month=expense_by_month
     )
 
+@app.route('/financial_stats')
+@login_required
+@read_replica
+@etag_cached()
+def financial_stats():
+    # Dapatkan properti yang dapat diakses oleh pengguna
+    accessible_properties = get_user_properties()
+    accessible_property_ids = [prop.id for prop in accessible_properties]
+    
+    current_year = datetime.now().year
+    scope = 'all' if current_user.is_admin else 'own'
+    key = f'financial-stats:{current_year}:{scope}:{version_token(accessible_property_ids)}'
+    stats = cache.get_or_set(key, lambda: _build_financial_stats(accessible_property_ids, current_user.is_admin, current_year))
+    
+    return render_template('financial_stats.html', **stats)
+
+@app.route('/receivables')
+@login_required
+def receivables_report():
+    """
+    Laporan tunggakan sewa semua properti yang dapat diakses, dengan kelompok umur piutang
+    """
+    accessible_property_ids = [prop.id for prop in get_user_properties()]
+    report = arrears_report(accessible_property_ids)
+    
+    totals = {key: sum(row[key] for row in report) for key in ('current', '0_30', '31_60', '60_plus', 'total', 'count')}
+    
+    return render_template(
+        'receivables.html',
+        report=report,
+        totals=totals,
+        tenants=outstanding_by_tenant(accessible_property_ids),
+        title='Laporan Tunggakan Sewa'
+    )
+
+@app.route('/api/receivables')
+@login_required
+def api_receivables():
+    accessible_property_ids = [prop.id for prop in get_user_properties()]
+    return jsonify(arrears_report(accessible_property_ids))
+
+@app.route('/forecast')
+@login_required
+@read_replica
+def revenue_forecast():
+    """
+    Proyeksi pendapatan sewa beberapa bulan ke depan per properti
+    """
+    accessible_property_ids = [prop.id for prop in get_user_properties()]
+    months = request.args.get('months', DEFAULT_MONTHS, type=int)
+    property_id = request.args.get('property_id', type=int)
+    if property_id is not None and property_id not in accessible_property_ids:
+        flash('Anda tidak memiliki akses ke properti ini', 'danger')
+        return redirect(url_for('revenue_forecast'))
+    
+    forecast = forecast_revenue([property_id] if property_id else accessible_property_ids, months)
+    return render_template(
+        'forecast.html',
+        forecast=forecast,
+        properties=get_user_properties(),
+        selected_property_id=property_id,
+        selected_months=max(1, min(months, MAX_MONTHS)),
+        max_months=MAX_MONTHS,
+        title='Proyeksi Pendapatan'
+    )
+
 @app.route('/calendar')
 @login_required
+@read_replica
+@etag_cached()
 def view_calendar():
     # Get current year and month
     year = request.args.get('year', type=int) or datetime.now().year
@@ -901,32 +1018,12 @@ def view_calendar():
     # Get calendar for this month
     cal = calendar.monthcalendar(year, month)
     
-    # Get national holidays for this month
-    holidays = {}
-    for holiday in NationalHoliday.query.filter(
-        db.extract('year', NationalHoliday.date) == year,
-        db.extract('month', NationalHoliday.date) == month
-    ).all():
-        day = holiday.date.day
-        holidays[day] = holiday.name
-    
-    # Get financial records for this month
-    start_date = date(year, month, 1)
-    if month == 12:
-        end_date = date(year + 1, 1, 1)
-    else:
-        end_date = date(year, month + 1, 1)
-    
-    financial_records = FinancialRecord.query.filter(
-        FinancialRecord.transaction_date >= start_date,
-        FinancialRecord.transaction_date < end_date
-    ).order_by(FinancialRecord.transaction_date).all()
+    # Get national holidays for this month (dari indeks hari libur di memori)
+    holidays = holidays_in_month(year, month)
     
-    # Organize records by day
-    records_by_day = defaultdict(list)
-    for record in financial_records:
-        day = record.transaction_date.day
-        records_by_day[day].append(record)
+    # Total pendapatan/pengeluaran per hari, hanya untuk properti yang dapat diakses
+    accessible_property_ids = [prop.id for prop in get_user_properties()]
+    totals_by_day = get_daily_totals(accessible_property_ids, year, month)
     
     # Generate calendar data
     month_name = calendar.month_name[month]
@@ -942,7 +1039,7 @@ def view_calendar():
         year=year,
         month_name=month_name,
         holidays=holidays,
-        records_by_day=records_by_day,
+        totals_by_day=totals_by_day,
         prev_month=prev_month,
         prev_year=prev_year,
         next_month=next_month,
@@ -950,27 +1047,251 @@ def view_calendar():
     )
 
 # API endpoints for AJAX calls
+@app.route('/api/calendar/<int:year>/<int:month>/<int:day>')
+@login_required
+@read_replica
+def calendar_day_transactions(year, month, day):
+    """
+    Detail transaksi untuk satu tanggal, dimuat saat modal kalender dibuka
+    """
+    try:
+        day_date = date(year, month, day)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Tanggal tidak valid'}), 400
+    
+    accessible_property_ids = [prop.id for prop in get_user_properties()]
+    return jsonify(get_day_transactions(accessible_property_ids, day_date))
+
 @app.route('/api/rooms_by_property/<int:property_id>')
 @login_required
 def rooms_by_property(property_id):
-    rooms = Room.query.filter_by(property_id=property_id).all()
-    return jsonify([{'id': r.id, 'number': r.number, 'type': r.room_type} for r in rooms])
+    # Akses diperiksa sebelum ETag, agar pengguna lain tidak mendapat 304 untuk properti ini
+    if property_id not in [prop.id for prop in get_user_properties()]:
+        return jsonify({'success': False, 'message': 'Anda tidak memiliki akses ke properti ini'}), 403
+    return _rooms_by_property(property_id=property_id)
+
+@etag_cached(lambda property_id: [property_id])
+def _rooms_by_property(property_id):
+    rooms = Room.query.filter_by(property_id=property_id).order_by(Room.number).all()
+    return jsonify([{'id': r.id, 'number': r.number, 'type': r.room_type,
+                     'monthly_rate': r.monthly_rate, 'status': r.status} for r in rooms])
+
+@app.route('/api/tenants')
+@login_required
+def api_search_tenants():
+    """
+    Mencari penyewa berdasarkan awalan nama: /api/tenants?q=budi&page=1
+    """
+    term = request.args.get('q', '')
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+    property_ids = None if current_user.is_admin else [prop.id for prop in get_user_properties()]
+    
+    tenants = search_tenants(term, property_ids, limit=per_page, offset=(page - 1) * per_page)
+    return jsonify([tenant.to_dict() for tenant in tenants])
+
+@app.route('/api/tenants/<int:tenant_id>')
+@login_required
+def api_tenant_detail(tenant_id):
+    """
+    Detail penyewa beserta riwayat hunian dan sisa tagihan
+    """
+    property_ids = None if current_user.is_admin else [prop.id for prop in get_user_properties()]
+    tenant = get_tenant(tenant_id, property_ids)
+    if not tenant:
+        return jsonify({'success': False, 'message': 'Penyewa tidak ditemukan'}), 404
+    
+    history = [{
+        'occupancy_id': occupancy.id,
+        'month': occupancy.month,
+        'room_number': room.number,
+        'property_id': room.property_id,
+        'payment_status': occupancy.payment_status,
+        'payment_months': occupancy.payment_months
+    } for occupancy, room in tenant_history(tenant_id, property_ids)]
+    
+    result = tenant.to_dict()
+    result.update({
+        'history': history,
+        'outstanding': tenant_balance(tenant_id, property_ids)
+    })
+    return jsonify(result)
+
+@app.route('/search')
+@login_required
+def search_page():
+    """
+    Pencarian teks penuh di catatan hunian dan keuangan
+    """
+    term = request.args.get('q', '').strip()
+    kind = request.args.get('kind') if request.args.get('kind') in KIND_CODES else None
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = 20
+    property_ids = [prop.id for prop in get_user_properties()]
+    
+    found = search_records(term, property_ids, kind=kind, page=page, per_page=per_page)
+    results = load_search_results(found['results'])
+    total_pages = (found['total'] + per_page - 1) // per_page
+    
+    return render_template('search.html', term=term, kind=kind, page=page,
+                           total=found['total'], total_pages=total_pages, results=results)
+
+@app.route('/api/search')
+@login_required
+def api_search():
+    """
+    Pencarian teks penuh dalam format JSON: /api/search?q=budi&kind=occupancy&page=1
+    """
+    term = request.args.get('q', '')
+    kind = request.args.get('kind') if request.args.get('kind') in KIND_CODES else None
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+    property_ids = [prop.id for prop in get_user_properties()]
+    
+    found = search_records(term, property_ids, kind=kind, page=page, per_page=per_page)
+    return jsonify({
+        'total': found['total'],
+        'page': page,
+        'per_page': per_page,
+        'results': load_search_results(found['results'])
+    })
+
+@app.route('/api/cache_stats')
+@admin_required
+def api_cache_stats():
+    """
+    Statistik cache bersama (hit/miss/hitung ulang) untuk worker yang menjawab request ini
+    """
+    return jsonify(cache.stats())
+
+@app.route('/api/db_stats')
+@admin_required
+def api_db_stats():
+    """
+    Statistik pool koneksi database (utama dan replika) untuk worker yang menjawab request ini
+    """
+    return jsonify(pool_stats())
 
 @app.route('/api/update_room_rate', methods=['POST'])
+@retry_on_locked
 @login_required
 def update_room_rate():
-    room_id = request.form.get('room_id')
-    new_rate = request.form.get('rate')
-    
+    """
+    Mengubah tarif satu kamar (form: room_id, rate, version opsional)
+    """
+    room_id = request.form.get('room_id', type=int)
+    version = request.form.get('version', type=int)
+    property_ids = [prop.id for prop in get_user_properties()]
+
     try:
-        room = Room.query.get(room_id)
-        if room:
-            room.monthly_rate = int(new_rate.replace('.', '').replace('Rp', '').strip())
-            db.session.commit()
-            return jsonify({'success': True})
-        return jsonify({'success': False, 'message': 'Room not found'})
-    except Exception as e:
-        return jsonify({'success': False, 'message': str(e)})
+        changes = change_rates(
+            property_ids,
+            room_ids=[room_id] if room_id else None,
+            rate=parse_rate(request.form.get('rate', '')),
+            versions={room_id: version} if version is not None else None,
+            user_id=current_user.id
+        )
+        db.session.commit()
+        return jsonify({'success': True, 'version': changes[0]['version']})
+    except RateConflict as e:
+        return jsonify({'success': False, 'message': e.message, 'conflicts': e.conflicts}), e.status
+    except RateChangeError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': e.message}), e.status
+
+@app.route('/api/room_rates', methods=['POST'])
+@retry_on_locked
+@manager_required
+def update_room_rates():
+    """
+    Mengubah tarif banyak kamar sekaligus (JSON), misalnya kenaikan tarif tahunan:
+
+        {"property_id": 1, "room_type": "Standard", "percent": 5, "round_to": 1000,
+         "effective_from": "2026-01", "versions": {"12": 3, "13": 3}}
+
+    Kamar dipilih dengan property_id, room_type dan/atau room_ids; tarif baru
+    dengan rate, percent atau amount. Semua kamar berubah dalam satu transaksi,
+    atau tidak sama sekali (409 jika ada versi kamar yang sudah usang).
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'message': 'Body request harus berupa JSON'}), 400
+    property_ids = [prop.id for prop in get_user_properties()]
+
+    try:
+        changes = change_rates(
+            property_ids,
+            property_id=data.get('property_id'),
+            room_type=data.get('room_type'),
+            room_ids=data.get('room_ids'),
+            rate=parse_rate(data['rate']) if data.get('rate') is not None else None,
+            percent=data.get('percent'),
+            amount=parse_rate(data['amount']) if data.get('amount') is not None else None,
+            round_to=data.get('round_to', 1),
+            versions=data.get('versions'),
+            effective_from=data.get('effective_from'),
+            user_id=current_user.id
+        )
+        db.session.commit()
+    except RateConflict as e:
+        return jsonify({'success': False, 'message': e.message, 'conflicts': e.conflicts}), e.status
+    except RateChangeError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': e.message}), e.status
+
+    return jsonify({'success': True, 'updated': len(changes), 'rooms': changes})
+
+@app.route('/api/rooms/<int:room_id>/rates')
+@login_required
+def room_rate_history(room_id):
+    """
+    Riwayat tarif satu kamar, dari yang terbaru
+    """
+    room = Room.query.get_or_404(room_id)
+    if room.property_id not in [prop.id for prop in get_user_properties()]:
+        return jsonify({'success': False, 'message': 'Anda tidak memiliki akses ke kamar ini'}), 403
+    return jsonify({
+        'success': True,
+        'room_id': room.id,
+        'monthly_rate': room.monthly_rate or 0,
+        'version': room.version,
+        'history': [{
+            'rate': entry.rate,
+            'previous_rate': entry.previous_rate,
+            'effective_from': ordinal_to_month(entry.effective_from),
+            'changed_by': entry.changed_by,
+            'changed_at': entry.changed_at.isoformat() if entry.changed_at else None
+        } for entry in rate_history(room.id)]
+    })
+
+@app.route('/api/room_rates/resolve', methods=['POST'])
+@login_required
+def resolve_room_rates():
+    """
+    Tarif yang berlaku untuk banyak pasangan kamar dan bulan sekaligus (JSON):
+
+        {"items": [{"room_id": 12, "month": "2025-05"}, {"room_id": 12, "month": "2026-01"}]}
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        pairs = [(int(item['room_id']), month_to_ordinal(item['month'])) for item in data.get('items', [])]
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return jsonify({'success': False, 'message': 'Setiap item harus berisi room_id dan month (YYYY-MM)'}), 400
+
+    room_ids = {room_id for room_id, _ in pairs}
+    property_ids = [prop.id for prop in get_user_properties()]
+    if room_ids and Room.query.filter(Room.id.in_(room_ids), Room.property_id.notin_(property_ids)).first():
+        return jsonify({'success': False, 'message': 'Anda tidak memiliki akses ke sebagian kamar yang diminta'}), 403
+
+    rates = rates_for(pairs)
+    return jsonify({
+        'success': True,
+        'rates': [{
+            'room_id': room_id,
+            'month': ordinal_to_month(month),
+            'rate': rates.get((room_id, month))
+        } for room_id, month in pairs]
+    })
 
 # -------------------- User Management Routes --------------------
 
@@ -1057,7 +1378,13 @@ def payment_status():
     year = request.args.get('year', str(year))
     month = request.args.get('month', str(month).zfill(2))
     status = request.args.get('status', 'all')
-    month_key = f"{year}-{month}"
+    
+    try:
+        month_ordinal = month_to_ordinal(f"{year}-{month}")
+    except ValueError:
+        flash('Format bulan tidak valid', 'danger')
+        year, month = str(datetime.now().year), str(datetime.now().month).zfill(2)
+        month_ordinal = date_to_ordinal(datetime.now())
     
     # Get properties based on user role
     properties = get_user_properties()
@@ -1069,6 +1396,22 @@ def payment_status():
     paid_payments = 0
     total_rooms = 0
     
+    # Ambil seluruh catatan hunian bulan ini sekaligus, lalu hitung keterlambatan dalam satu kali proses
+    property_ids = [prop.id for prop in properties]
+    occupancy_by_room = {}
+    if property_ids:
+        for occupancy in OccupancyRecord.query.join(Room).filter(
+            Room.property_id.in_(property_ids),
+            OccupancyRecord.month_ordinal == month_ordinal
+        ).order_by(OccupancyRecord.id).all():
+            occupancy_by_room.setdefault(occupancy.room_id, occupancy)
+    late_records = late_payments_for_month(month_ordinal, property_ids)
+    overdue_records = overdue_ids(late_records)
+    overdue_payments = 0
+    
+    # Kamar yang tercakup pembayaran beberapa bulan dari bulan sebelumnya
+    paid_coverage = paid_coverage_for_month(month_ordinal, property_ids)
+    
     for prop in properties:
         # Get all rooms for the property
         rooms = Room.query.filter_by(property_id=prop.id).all()
@@ -1077,34 +1420,33 @@ def payment_status():
         # Initialize property data
         if prop.name not in property_data:
             property_data[prop.name] = {
+                'id': prop.id,
                 'rooms': [],
                 'late': 0,
+                'overdue': 0,
                 'unpaid': 0,
                 'paid': 0,
+                'prepaid': 0,
                 'total': 0
             }
         
         # Process each room
         for room in rooms:
             # Get occupancy record for the month if exists
-            occupancy = OccupancyRecord.query.filter_by(
-                room_id=room.id,
-                month=month_key
-            ).first()
+            occupancy = occupancy_by_room.get(room.id)
+            
+            if not occupancy and room.id in paid_coverage:
+                property_data[prop.name]['prepaid'] += 1
             
             if occupancy and occupancy.is_occupied:
+                is_late = occupancy.id in late_records
+                is_overdue = occupancy.payment_status != 'paid' and occupancy.id in overdue_records
+                
                 # Format the paid until date nicely if it exists
                 paid_until = None
-                if occupancy.payment_status == 'paid' and occupancy.payment_months > 1:
-                    paid_until_raw = occupancy.get_paid_until()
-                    if paid_until_raw:
-                        year_until, month_until = paid_until_raw.split('-')
-                        month_names = {
-                            '01': 'Januari', '02': 'Februari', '03': 'Maret', '04': 'April',
-                            '05': 'Mei', '06': 'Juni', '07': 'Juli', '08': 'Agustus',
-                            '09': 'September', '10': 'Oktober', '11': 'November', '12': 'Desember'
-                        }
-                        paid_until = f"{month_names[month_until]} {year_until}"
+                if occupancy.payment_status == 'paid' and occupancy.payment_months > 1 and occupancy.payment_date:
+                    year_until, month_index = divmod(occupancy.coverage_end, 12)
+                    paid_until = f"{MONTH_NAMES_ID[month_index]} {year_until}"
                 
                 payment_info = {
                     'room': room,
@@ -1113,7 +1455,9 @@ def payment_status():
                     'status': occupancy.payment_status,
                     'due_date': occupancy.payment_due_date,
                     'payment_date': occupancy.payment_date,
-                    'is_late': occupancy.is_late(),
+                    'is_late': is_late,
+                    'is_overdue': is_overdue,
+                    'days_late': late_records.get(occupancy.id),
                     'paid_until': paid_until
                 }
                 
@@ -1125,9 +1469,12 @@ def payment_status():
                 if occupancy.payment_status == 'paid':
                     property_data[prop.name]['paid'] += 1
                     paid_payments += 1
-                elif occupancy.payment_status == 'late' or occupancy.is_late():
+                elif occupancy.payment_status == 'late' or is_late:
                     property_data[prop.name]['late'] += 1
                     late_payments += 1
+                    if is_overdue:
+                        property_data[prop.name]['overdue'] += 1
+                        overdue_payments += 1
                 else:
                     property_data[prop.name]['unpaid'] += 1
                     unpaid_payments += 1
@@ -1160,16 +1507,21 @@ def payment_status():
         selected_year=year,
         selected_status=status,
         late_payments=late_payments,
+        overdue_payments=overdue_payments,
+        overdue_after_days=OVERDUE_AFTER_DAYS,
         unpaid_payments=unpaid_payments,
         paid_payments=paid_payments,
         late_percent=late_percent,
         unpaid_percent=unpaid_percent,
         paid_percent=paid_percent,
         total_payments=total_payments,
+        data_versions=get_data_versions(property_ids),
+        today=date.today(),
         title='Status Pembayaran Sewa'
     )
 
 @app.route('/update_payment_status/<int:record_id>', methods=['POST'])
+@retry_on_locked
 @login_required
 def update_payment_status(record_id):
     """
@@ -1186,69 +1538,41 @@ def update_payment_status(record_id):
         return redirect(url_for('payment_status'))
     
     try:
-        # Get the record
-        record = OccupancyRecord.query.get_or_404(record_id)
-        
-        # Check if user has access to this property
-        room = Room.query.get(record.room_id)
-        if not current_user.is_admin and current_user.location != room.property.name:
-            flash('Anda tidak memiliki akses untuk mengubah data ini', 'danger')
-            return redirect(url_for('payment_status'))
-        
-        # Update payment status
-        record.payment_status = status
-        
-        # Update payment months
-        try:
-            payment_months = int(payment_months_str)
-            if payment_months < 1:
-                payment_months = 1
-            record.payment_months = payment_months
-        except (ValueError, TypeError):
-            record.payment_months = 1
-        
-        # Simpan status lama untuk perbandingan
-        old_status = record.payment_status
-        
-        # Update payment date if provided
-        if payment_date_str:
-            record.payment_date = datetime.strptime(payment_date_str, '%Y-%m-%d').date()
-        else:
-            record.payment_date = datetime.now().date() if status == 'paid' else None
-        
-        # Update due date if provided
-        if due_date_str:
-            record.payment_due_date = datetime.strptime(due_date_str, '%Y-%m-%d').date()
-        
-        # Jika status berubah dari unpaid/late menjadi paid, tambahkan catatan finansial
-        if status == 'paid' and old_status != 'paid':
-            # Dapatkan data kamar dan properti
-            room = Room.query.get(record.room_id)
-            if room and hasattr(room, 'property_id') and room.property_id:
-                property_id = room.property_id
-                amount = room.monthly_rate * record.payment_months
-                payment_date = record.payment_date or datetime.now().date()
-                
-                # Buat catatan finansial untuk pembayaran sewa
-                financial_record = FinancialRecord(
-                    property_id=property_id,
-                    transaction_date=payment_date,
-                    amount=amount,
-                    transaction_type='income',
-                    category='Sewa',
-                    description=f'Pembayaran sewa kamar {room.number} ({room.room_type}) oleh {record.tenant_name} untuk {record.payment_months} bulan',
-                    created_by=current_user.id
-                )
-                
-                db.session.add(financial_record)
-                flash(f'Catatan keuangan untuk pembayaran sewa telah dibuat: Rp {amount:,}', 'success')
-        
-        db.session.commit()
-        flash('Status pembayaran berhasil diperbarui', 'success')
+        payment_months = int(payment_months_str)
+    except (ValueError, TypeError):
+        payment_months = 1
+    
+    try:
+        payment_date = datetime.strptime(payment_date_str, '%Y-%m-%d').date() if payment_date_str else None
+        due_date = datetime.strptime(due_date_str, '%Y-%m-%d').date() if due_date_str else None
         
-    except Exception as e:
+        record, income, replayed = update_payment(
+            record_id,
+            [prop.id for prop in get_user_properties()],
+            current_user.id,
+            status,
+            payment_months=payment_months,
+            payment_date=payment_date,
+            due_date=due_date,
+            idempotency_key=idempotency_key_from(request)
+        )
+    except PaymentError as e:
+        db.session.rollback()
+        if e.status == 422:
+            # Kunci idempotensi yang sama dipakai untuk data lain (klien API)
+            return jsonify({'success': False, 'message': e.message}), e.status
+        flash(e.message, 'danger')
+        return redirect(url_for('payment_status'))
+    except ValueError as e:
         db.session.rollback()
         flash(f'Terjadi kesalahan: {str(e)}', 'danger')
+        return redirect(url_for('payment_status'))
     
+    if replayed:
+        flash('Perubahan ini sudah disimpan sebelumnya', 'info')
+    else:
+        if income is not None:
+            flash(f'Catatan keuangan untuk pembayaran sewa: Rp {income.amount:,}', 'success')
+        flash('Status pembayaran berhasil diperbarui', 'success')
     return redirect(url_for('payment_status'))
 # ============= PDF EXPORT ROUTES =============
@@ -0,0 +1,290 @@
+"""
+Pencarian teks penuh untuk catatan hunian (nama penyewa, catatan) dan catatan
+keuangan (deskripsi, kategori).
+
+Indeks disimpan di tabel search_documents:
+- SQLite: tabel virtual FTS5, peringkat memakai bm25()
+- MySQL: tabel InnoDB dengan indeks FULLTEXT, peringkat memakai MATCH ... AGAINST
+- Database lain: tabel biasa dengan pencarian LIKE (tanpa peringkat)
+
+Indeks diperbarui otomatis setiap kali OccupancyRecord/FinancialRecord ditambah,
+diubah atau dihapus, di dalam transaksi yang sama.
+"""
+import re
+import logging
+
+from sqlalchemy import event, inspect, text, bindparam
+
+from app import app, db
+from models import Property, Room, OccupancyRecord, FinancialRecord
+
+SEARCH_TABLE = 'search_documents'
+KIND_OCCUPANCY = 'occupancy'
+KIND_FINANCE = 'finance'
+KIND_CODES = {KIND_OCCUPANCY: 0, KIND_FINANCE: 1}
+
+
+def _dialect(bind=None):
+    return (bind or db.engine).dialect.name
+
+
+def _doc_rowid(kind, record_id):
+    # rowid unik per dokumen agar update/hapus di FTS5 memakai primary key, bukan pemindaian
+    return record_id * len(KIND_CODES) + KIND_CODES[kind]
+
+
+def ensure_search_index():
+    """
+    Membuat tabel indeks pencarian jika belum ada, lalu mengisinya dari data yang ada
+    """
+    if SEARCH_TABLE in inspect(db.engine).get_table_names():
+        return False
+
+    dialect = _dialect()
+    with db.engine.begin() as connection:
+        if dialect == 'sqlite':
+            connection.execute(text(
+                f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+                "kind UNINDEXED, record_id UNINDEXED, property_id UNINDEXED, body, "
+                "tokenize='unicode61 remove_diacritics 2')"
+            ))
+        elif dialect == 'mysql':
+            connection.execute(text(
+                f"CREATE TABLE {SEARCH_TABLE} ("
+                "id INT AUTO_INCREMENT PRIMARY KEY, "
+                "kind VARCHAR(20) NOT NULL, "
+                "record_id INT NOT NULL, "
+                "property_id INT NOT NULL, "
+                "body TEXT, "
+                "UNIQUE KEY uq_search_documents_record (kind, record_id), "
+                "KEY idx_search_documents_property (property_id), "
+                "FULLTEXT KEY ft_search_documents_body (body)"
+                ") ENGINE=InnoDB"
+            ))
+        else:
+            connection.execute(text(
+                f"CREATE TABLE {SEARCH_TABLE} ("
+                "kind VARCHAR(20) NOT NULL, "
+                "record_id INTEGER NOT NULL, "
+                "property_id INTEGER NOT NULL, "
+                "body TEXT, "
+                "PRIMARY KEY (kind, record_id))"
+            ))
+    logging.info(f"Tabel pencarian {SEARCH_TABLE} dibuat ({dialect})")
+    rebuild_search_index()
+    return True
+
+
+def _occupancy_body(tenant_name, notes):
+    return ' '.join(part for part in (tenant_name, notes) if part)
+
+
+def _finance_body(category, description):
+    return ' '.join(part for part in (category, description) if part)
+
+
+def _delete_document(connection, kind, record_id):
+    if _dialect(connection) == 'sqlite':
+        connection.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = :rowid"),
+                           {'rowid': _doc_rowid(kind, record_id)})
+    else:
+        connection.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE kind = :kind AND record_id = :record_id"),
+                           {'kind': kind, 'record_id': record_id})
+
+
+def _index_document(connection, kind, record_id, property_id, body):
+    _delete_document(connection, kind, record_id)
+    if not body:
+        return
+    # Kolom FTS5 tidak memiliki afinitas tipe: simpan sebagai integer agar cocok dengan filter IN
+    params = {'kind': kind, 'record_id': int(record_id), 'property_id': int(property_id), 'body': body}
+    if _dialect(connection) == 'sqlite':
+        params['rowid'] = _doc_rowid(kind, record_id)
+        connection.execute(text(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, kind, record_id, property_id, body) "
+            "VALUES (:rowid, :kind, :record_id, :property_id, :body)"
+        ), params)
+    else:
+        connection.execute(text(
+            f"INSERT INTO {SEARCH_TABLE} (kind, record_id, property_id, body) "
+            "VALUES (:kind, :record_id, :property_id, :body)"
+        ), params)
+
+
+def rebuild_search_index():
+    """
+    Membangun ulang seluruh indeks pencarian dari data hunian dan keuangan
+    """
+    count = 0
+    with db.engine.begin() as connection:
+        connection.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+        occupancy_rows = connection.execute(
+            db.select(OccupancyRecord.id, Room.property_id, OccupancyRecord.tenant_name, OccupancyRecord.notes)
+            .join(Room, OccupancyRecord.room_id == Room.id)
+        ).all()
+        for record_id, property_id, tenant_name, notes in occupancy_rows:
+            _index_document(connection, KIND_OCCUPANCY, record_id, property_id, _occupancy_body(tenant_name, notes))
+            count += 1
+        finance_rows = connection.execute(
+            db.select(FinancialRecord.id, FinancialRecord.property_id, FinancialRecord.category, FinancialRecord.description)
+        ).all()
+        for record_id, property_id, category, description in finance_rows:
+            _index_document(connection, KIND_FINANCE, record_id, property_id, _finance_body(category, description))
+            count += 1
+    logging.info(f"Indeks pencarian dibangun ulang untuk {count} catatan")
+    return count
+
+
+def _search_fields_changed(target, fields):
+    state = inspect(target)
+    return any(state.attrs[field].history.has_changes() for field in fields)
+
+
+def _reindex_occupancy(connection, target):
+    property_id = connection.execute(
+        db.select(Room.property_id).where(Room.id == target.room_id)
+    ).scalar()
+    _index_document(connection, KIND_OCCUPANCY, target.id, property_id,
+                    _occupancy_body(target.tenant_name, target.notes))
+
+
+@event.listens_for(OccupancyRecord, 'after_insert')
+def _index_new_occupancy(mapper, connection, target):
+    _reindex_occupancy(connection, target)
+
+
+@event.listens_for(OccupancyRecord, 'after_update')
+def _index_updated_occupancy(mapper, connection, target):
+    # Perubahan status pembayaran tidak perlu mengubah indeks
+    if _search_fields_changed(target, ('tenant_name', 'notes', 'room_id')):
+        _reindex_occupancy(connection, target)
+
+
+@event.listens_for(FinancialRecord, 'after_insert')
+@event.listens_for(FinancialRecord, 'after_update')
+def _index_finance(mapper, connection, target):
+    _index_document(connection, KIND_FINANCE, target.id, target.property_id,
+                    _finance_body(target.category, target.description))
+
+
+@event.listens_for(OccupancyRecord, 'after_delete')
+def _unindex_occupancy(mapper, connection, target):
+    _delete_document(connection, KIND_OCCUPANCY, target.id)
+
+
+@event.listens_for(FinancialRecord, 'after_delete')
+def _unindex_finance(mapper, connection, target):
+    _delete_document(connection, KIND_FINANCE, target.id)
+
+
+def _build_match(dialect, words):
+    if dialect == 'sqlite':
+        # Setiap kata sebagai awalan: "budi"* "sewa"*
+        return ' '.join(f'"{word}"*' for word in words)
+    # MySQL BOOLEAN MODE: semua kata wajib ada, sebagai awalan
+    return ' '.join(f'+{word}*' for word in words)
+
+
+def search(term, property_ids, kind=None, page=1, per_page=20):
+    """
+    Mencari catatan hunian dan keuangan. Hasil diurutkan berdasarkan relevansi.
+    Mengembalikan {'total': int, 'results': [{'kind', 'record_id', 'property_id', 'score'}]}
+    """
+    words = re.findall(r'\w+', term or '', re.UNICODE)
+    if not words or not property_ids:
+        return {'total': 0, 'results': []}
+
+    dialect = _dialect()
+    params = {'property_ids': list(property_ids), 'limit': per_page, 'offset': (page - 1) * per_page}
+    conditions = ['property_id IN :property_ids']
+    if kind in KIND_CODES:
+        conditions.append('kind = :kind')
+        params['kind'] = kind
+
+    if dialect == 'sqlite':
+        conditions.append(f'{SEARCH_TABLE} MATCH :match')
+        params['match'] = _build_match(dialect, words)
+        score = f'bm25({SEARCH_TABLE})'
+        order = 'score'
+    elif dialect == 'mysql':
+        conditions.append('MATCH(body) AGAINST (:match IN BOOLEAN MODE)')
+        params['match'] = _build_match(dialect, words)
+        score = 'MATCH(body) AGAINST (:match IN BOOLEAN MODE)'
+        order = 'score DESC'
+    else:
+        for index, word in enumerate(words):
+            conditions.append(f'LOWER(body) LIKE :word{index}')
+            params[f'word{index}'] = f'%{word.lower()}%'
+        score = '0'
+        order = 'record_id DESC'
+
+    where = ' AND '.join(conditions)
+    expanding = bindparam('property_ids', expanding=True)
+
+    total = db.session.execute(
+        text(f"SELECT COUNT(*) FROM {SEARCH_TABLE} WHERE {where}").bindparams(expanding),
+        {k: v for k, v in params.items() if k not in ('limit', 'offset')}
+    ).scalar()
+
+    rows = db.session.execute(
+        text(
+            f"SELECT kind, record_id, property_id, {score} AS score FROM {SEARCH_TABLE} "
+            f"WHERE {where} ORDER BY {order} LIMIT :limit OFFSET :offset"
+        ).bindparams(expanding),
+        params
+    ).all()
+
+    return {
+        'total': total,
+        'results': [
+            {'kind': row.kind, 'record_id': int(row.record_id), 'property_id': int(row.property_id), 'score': row.score}
+            for row in rows
+        ]
+    }
+
+
+def load_search_results(results):
+    """
+    Memuat data lengkap untuk hasil pencarian (satu query per jenis catatan), urutan tetap sesuai peringkat
+    """
+    occupancy_ids = [r['record_id'] for r in results if r['kind'] == KIND_OCCUPANCY]
+    finance_ids = [r['record_id'] for r in results if r['kind'] == KIND_FINANCE]
+
+    occupancies = {}
+    if occupancy_ids:
+        for occupancy, room, prop in db.session.query(OccupancyRecord, Room, Property).join(
+            Room, OccupancyRecord.room_id == Room.id
+        ).join(Property, Room.property_id == Property.id).filter(OccupancyRecord.id.in_(occupancy_ids)).all():
+            occupancies[occupancy.id] = {
+                'title': f'{occupancy.tenant_name or "-"} - {room.number}',
+                'subtitle': f'Hunian {occupancy.month}',
+                'text': occupancy.notes or '',
+                'property_name': prop.name
+            }
+
+    finances = {}
+    if finance_ids:
+        for record, prop in db.session.query(FinancialRecord, Property).join(
+            Property, FinancialRecord.property_id == Property.id
+        ).filter(FinancialRecord.id.in_(finance_ids)).all():
+            finances[record.id] = {
+                'title': f'{record.category or "-"} - Rp {record.amount:,.0f}'.replace(',', '.'),
+                'subtitle': f'{"Pendapatan" if record.transaction_type == "income" else "Pengeluaran"} {record.transaction_date.strftime("%d-%m-%Y")}',
+                'text': record.description or '',
+                'property_name': prop.name
+            }
+
+    items = []
+    for result in results:
+        source = occupancies if result['kind'] == KIND_OCCUPANCY else finances
+        detail = source.get(result['record_id'])
+        if detail:
+            items.append(dict(result, **detail))
+    return items
+
+
+if __name__ == '__main__':
+    with app.app_context():
+        if not ensure_search_index():
+            rebuild_search_index()
+        print('Indeks pencarian siap')
@@ -27,8 +27,7 @@ function initializeCalendar() {
     document.querySelectorAll('.calendar-day[data-has-transactions="true"]').forEach(day => {
         day.addEventListener('click', function() {
             const dayNum = this.dataset.day;
-            const transactions = JSON.parse(this.dataset.transactions || '[]');
-            showTransactionDetails(dayNum, transactions);
+            loadTransactionDetails(calendarYear, calendarMonth, dayNum);
         });
     });
     
@@ -46,6 +45,14 @@ function initializeCalendar() {
     });
 }
 
+function loadTransactionDetails(year, month, day) {
+    // Detail transaksi dimuat saat modal dibuka agar halaman kalender tetap ringan
+    fetch(`/api/calendar/${year}/${month}/${day}`)
+        .then(response => response.json())
+        .then(transactions => showTransactionDetails(day, transactions))
+        .catch(error => console.error('Gagal memuat transaksi:', error));
+}
+
 function showTransactionDetails(day, transactions) {
     const modal = new bootstrap.Modal(document.getElementById('transactionModal'));
     const modalTitle = document.getElementById('transactionModalLabel');
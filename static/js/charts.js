@@ -12,6 +12,14 @@ document.addEventListener('DOMContentLoaded', function() {
         renderOccupancyRateChart(occupancyRateCanvas);
     }
     
+    // Kunci idempotensi per form: kiriman ganda dari halaman yang sama tidak diproses dua kali.
+    // Dibuat di browser karena isi halaman bisa berasal dari cache fragmen.
+    document.querySelectorAll('input[data-idempotency-key]').forEach(function(input) {
+        input.value = window.crypto && crypto.randomUUID
+            ? crypto.randomUUID()
+            : Date.now().toString(36) + '-' + Math.random().toString(36).slice(2);
+    });
+    
     // Format all currency inputs
     document.querySelectorAll('.currency-input').forEach(function(input) {
         input.addEventListener('input', formatCurrency);
@@ -0,0 +1,68 @@
+"""
+URL file static dengan sidik isi (fingerprint).
+
+url_for('static', filename='css/custom.css') otomatis menjadi
+/static/css/custom.css?v=<hash isi file>. Karena URL berubah setiap kali isi
+file berubah, file dengan parameter v boleh disimpan browser selama setahun
+(Cache-Control immutable) tanpa risiko memakai versi lama setelah deploy.
+"""
+import os
+import hashlib
+import threading
+
+from flask import request
+
+from app import app
+
+STATIC_MAX_AGE = 365 * 24 * 3600
+
+# filename -> (mtime, hash); dihitung ulang hanya jika file berubah
+_hashes = {}
+_hashes_lock = threading.Lock()
+
+
+def asset_hash(filename):
+    """
+    Hash pendek isi file static, None jika file tidak ada
+    """
+    path = os.path.join(app.static_folder, filename)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    cached = _hashes.get(filename)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(65536), b''):
+            digest.update(block)
+    value = digest.hexdigest()[:12]
+    with _hashes_lock:
+        _hashes[filename] = (mtime, value)
+    return value
+
+
+@app.url_defaults
+def fingerprint_static_url(endpoint, values):
+    if endpoint != 'static' or 'v' in values:
+        return
+    filename = values.get('filename')
+    # File PDF hasil generate ditulis ulang dengan nama yang sama, jangan diberi cache panjang
+    if not filename or filename.startswith('pdf/'):
+        return
+    value = asset_hash(filename)
+    if value:
+        values['v'] = value
+
+
+@app.after_request
+def cache_fingerprinted_static(response):
+    """
+    File static yang diminta dengan sidik isi disimpan browser selama setahun
+    """
+    if request.endpoint == 'static' and request.args.get('v') and response.status_code == 200:
+        response.headers['Cache-Control'] = f'public, max-age={STATIC_MAX_AGE}, immutable'
+    return response
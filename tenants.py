@@ -0,0 +1,89 @@
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from models import Room, OccupancyRecord, Receivable, Tenant, normalize_tenant_name
+
+
+def get_or_create_tenant(name):
+    """
+    Mendapatkan penyewa berdasarkan nama (tanpa membedakan huruf besar/kecil dan spasi),
+    atau membuatnya jika belum ada. Mengembalikan None untuk nama kosong.
+    """
+    normalized_name = normalize_tenant_name(name)
+    if not normalized_name:
+        return None
+
+    tenant = Tenant.query.filter_by(normalized_name=normalized_name).first()
+    if tenant:
+        return tenant
+    try:
+        with db.session.begin_nested():
+            tenant = Tenant(name=' '.join(name.split()), normalized_name=normalized_name)
+            db.session.add(tenant)
+    except IntegrityError:
+        # Request lain membuat penyewa yang sama lebih dulu; dibaca dengan kunci
+        # agar MySQL (REPEATABLE READ) melihat baris yang baru di-commit
+        tenant = Tenant.query.filter_by(normalized_name=normalized_name).with_for_update().one()
+    return tenant
+
+
+def _scoped(query, property_ids):
+    # Hanya penyewa yang pernah menghuni properti yang dapat diakses
+    if property_ids is None:
+        return query
+    return query.filter(
+        db.session.query(OccupancyRecord.id).join(Room).filter(
+            OccupancyRecord.tenant_id == Tenant.id,
+            Room.property_id.in_(property_ids)
+        ).exists()
+    )
+
+
+def search_tenants(term, property_ids=None, limit=20, offset=0):
+    """
+    Mencari penyewa berdasarkan awalan nama. Awalan diubah menjadi rentang
+    normalized_name >= 'abc' AND normalized_name < 'abd' sehingga pencarian memakai
+    indeks unik di SQLite maupun MySQL, tanpa memindai seluruh tabel.
+    property_ids=None berarti tanpa pembatasan properti (admin).
+    """
+    normalized_term = normalize_tenant_name(term)
+    if not normalized_term:
+        return []
+    upper_bound = normalized_term[:-1] + chr(ord(normalized_term[-1]) + 1)
+
+    query = Tenant.query.filter(
+        Tenant.normalized_name >= normalized_term,
+        Tenant.normalized_name < upper_bound
+    )
+    return _scoped(query, property_ids).order_by(Tenant.normalized_name).offset(offset).limit(limit).all()
+
+
+def get_tenant(tenant_id, property_ids=None):
+    """
+    Mendapatkan penyewa jika dapat diakses oleh pengguna
+    """
+    return _scoped(Tenant.query.filter(Tenant.id == tenant_id), property_ids).first()
+
+
+def tenant_history(tenant_id, property_ids=None):
+    """
+    Riwayat hunian penyewa, terbaru lebih dulu
+    """
+    query = db.session.query(OccupancyRecord, Room).join(
+        Room, OccupancyRecord.room_id == Room.id
+    ).filter(OccupancyRecord.tenant_id == tenant_id)
+    if property_ids is not None:
+        query = query.filter(Room.property_id.in_(property_ids))
+    return query.order_by(OccupancyRecord.month_ordinal.desc()).all()
+
+
+def tenant_balance(tenant_id, property_ids=None):
+    """
+    Total sisa tagihan sewa penyewa dari buku piutang
+    """
+    query = db.session.query(db.func.sum(Receivable.outstanding)).join(
+        OccupancyRecord, Receivable.occupancy_id == OccupancyRecord.id
+    ).filter(OccupancyRecord.tenant_id == tenant_id)
+    if property_ids is not None:
+        query = query.filter(Receivable.property_id.in_(property_ids))
+    return int(query.scalar() or 0)
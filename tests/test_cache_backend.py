@@ -0,0 +1,139 @@
+"""
+Uji RedisCache terhadap server RESP palsu di proses yang sama, tanpa server Redis.
+
+Jalankan dari root proyek: python -m pytest tests
+"""
+import time
+import threading
+import socketserver
+import unittest
+from unittest import mock
+
+import cache_backend
+from cache_backend import RedisCache
+
+
+class _FakeRedisHandler(socketserver.StreamRequestHandler):
+    # Cukup untuk perintah yang dipakai RedisCache: GET, SET [NX] [PX], DEL, SELECT, AUTH
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    @staticmethod
+    def _bulk(value):
+        return b'$-1\r\n' if value is None else b'$%d\r\n%s\r\n' % (len(value), value)
+
+    def handle(self):
+        server = self.server
+        while True:
+            args = self._read_command()
+            if args is None:
+                return
+            command = args[0].upper()
+            with server.lock:
+                now = time.time()
+                for key in [key for key, (_, expires_at) in server.data.items() if expires_at and expires_at <= now]:
+                    del server.data[key]
+                if command in (b'SELECT', b'AUTH'):
+                    reply = b'+OK\r\n'
+                elif command == b'GET':
+                    reply = self._bulk(server.data.get(args[1], (None, None))[0])
+                elif command == b'SET':
+                    options = [arg.upper() for arg in args[3:]]
+                    expires_at = None
+                    if b'PX' in options:
+                        expires_at = now + int(args[3 + options.index(b'PX') + 1]) / 1000
+                    if b'NX' in options and args[1] in server.data:
+                        reply = b'$-1\r\n'
+                    else:
+                        server.data[args[1]] = (args[2], expires_at)
+                        reply = b'+OK\r\n'
+                elif command == b'DEL':
+                    deleted = sum(1 for key in args[1:] if server.data.pop(key, None) is not None)
+                    reply = b':%d\r\n' % deleted
+                else:
+                    reply = b'-ERR unknown command\r\n'
+            self.wfile.write(reply)
+
+
+class _FakeRedisServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _FakeRedisHandler)
+        self.data = {}
+        self.lock = threading.Lock()
+
+
+class RedisCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = _FakeRedisServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        host, port = self.server.server_address
+        self.cache = RedisCache(f'redis://{host}:{port}/1', default_ttl=60, secret='rahasia')
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_get_set_delete(self):
+        self.assertIsNone(self.cache.get('kamar'))
+        self.cache.set('kamar', {'nomor': 'A-1', 'tarif': 500000})
+        self.assertEqual(self.cache.get('kamar'), {'nomor': 'A-1', 'tarif': 500000})
+        self.cache.delete('kamar')
+        self.assertEqual(self.cache.get('kamar', 'kosong'), 'kosong')
+        self.assertEqual(self.cache.stats()['errors'], 0)
+
+    def test_set_ttl_expires(self):
+        self.cache.set('sebentar', 1, ttl=0.05)
+        self.assertEqual(self.cache.get('sebentar'), 1)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('sebentar'))
+
+    def test_add_only_when_missing(self):
+        self.assertTrue(self.cache._add('lock:laporan', 1, 60))
+        self.assertFalse(self.cache._add('lock:laporan', 2, 60))
+        self.assertEqual(self.cache.get('lock:laporan'), 1)
+
+    def test_lock_expires(self):
+        self.assertTrue(self.cache._add('lock:laporan', 1, 0.05))
+        time.sleep(0.1)
+        self.assertTrue(self.cache._add('lock:laporan', 2, 60))
+
+    def test_get_or_set_waits_for_expired_lock(self):
+        # Worker lain memegang lock lalu mati: setelah lock kedaluwarsa nilai dihitung sendiri
+        with mock.patch.object(cache_backend, 'LOCK_TIMEOUT', 0.2), \
+                mock.patch.object(cache_backend, 'LOCK_POLL_INTERVAL', 0.01):
+            self.cache._add('lock:grafik', 'worker-lain', 0.1)
+            started = time.monotonic()
+            self.assertEqual(self.cache.get_or_set('grafik', lambda: 'png'), 'png')
+            self.assertGreaterEqual(time.monotonic() - started, 0.1)
+        self.assertEqual(self.cache.get('grafik'), 'png')
+        self.assertIsNone(self.cache.get('lock:grafik'))
+
+    def test_unsigned_value_is_not_unpickled(self):
+        payload = b'cos\nsystem\n(S"echo diserang"\ntR.'
+        self.server.data[b'kos:palsu'] = (payload, None)
+        with mock.patch('pickle.loads') as loads:
+            self.assertIsNone(self.cache.get('palsu'))
+            loads.assert_not_called()
+        self.assertEqual(self.cache.stats()['errors'], 1)
+
+    def test_value_signed_with_other_secret_is_rejected(self):
+        host, port = self.server.server_address
+        other = RedisCache(f'redis://{host}:{port}/1', secret='kunci-lain')
+        other.set('laporan', 'isi')
+        self.assertIsNone(self.cache.get('laporan'))
+
+
+if __name__ == '__main__':
+    unittest.main()